@@ -0,0 +1,497 @@
+"""Сквозной нагрузочный тест сервисов `line-provider` и `bet-maker`.
+
+Поднимает локальный стенд (`stand.py`) или использует уже запущенные
+сервисы, генерирует линию событий и в течение заданного времени выполняет
+смесь запросов с заданной конкурентностью. Для каждой операции считает
+пропускную способность и задержки p50/p95/p99 и сохраняет их в JSON,
+который можно сравнить с результатом другого коммита.
+
+Операции:
+
+    bet      POST bet-maker /bet на открытое событие
+    bets     GET bet-maker /bets со страницей ставок, иногда по событию
+    events   GET bet-maker /events
+    updated  POST bet-maker /updated с пачкой завершенных событий
+    update   PUT line-provider /event/update: новый коэффициент или завершение
+    new      GET line-provider /event/new со страницей событий
+
+Запуск из корня репозитория (нужны зависимости обоих сервисов):
+
+    python benchmarks/load.py --duration 30 --concurrency 32 \\
+        --mix bet=40,events=20,bets=10,update=10,updated=10,new=10 \\
+        --output results.json --compare baseline.json
+
+Чтение линии несколькими рабочими процессами `line-provider` замеряется
+с хранилищем событий в разделяемой памяти:
+
+    python benchmarks/load.py --mix new=100 --store-backend shared --workers 4
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import httpx
+
+import stand
+
+
+BET_MAKER_OPERATIONS = {"bet", "bets", "events", "updated"}
+
+DEFAULT_MIX = "bet=40,events=20,bets=10,update=10,updated=10,new=10"
+
+# Доля обновлений события, которые его завершают
+FINISH_RATIO = 0.1
+
+PERCENTILES = (50, 95, 99)
+
+
+class Line:
+    """Общее для воркеров состояние линии событий."""
+
+    def __init__(self, event_ids: list[int], batch_size: int):
+        """Инициализация.
+
+        Args:
+            event_ids: ID открытых событий.
+            batch_size: Количество событий в пачке `/updated`.
+        """
+        self.open = event_ids
+        self.finished: list[dict] = []
+        self.batch_size = batch_size
+        # ID, заведомо отсутствующие в линии, для `/updated` до первых завершений
+        self.unknown_id = max(event_ids, default=0) + 1
+
+    def finish(self, rnd: random.Random) -> dict | None:
+        """Выбирает открытое событие для завершения и исключает его из линии.
+
+        Args:
+            rnd: Генератор случайных чисел воркера.
+
+        Returns:
+            Завершенное событие или None, если открытых событий не осталось.
+        """
+        # Последнее открытое событие не завершается, чтобы не кончились ставки
+        if len(self.open) < 2:
+            return None
+        index = rnd.randrange(len(self.open))
+        self.open[index], self.open[-1] = self.open[-1], self.open[index]
+        event = {"event_id": self.open.pop(), "state": rnd.choice((2, 3))}
+        self.finished.append(event)
+        return event
+
+
+async def op_bet(
+    client: httpx.AsyncClient, urls: dict, line: Line, rnd: random.Random
+) -> int:
+    """Делает ставку на открытое событие."""
+    response = await client.post(
+        f"{urls['bet-maker']}bet",
+        json={
+            "event_id": rnd.choice(line.open),
+            "amount": round(rnd.uniform(1, 1000), 2),
+        },
+    )
+    return response.status_code
+
+
+async def op_bets(
+    client: httpx.AsyncClient, urls: dict, line: Line, rnd: random.Random
+) -> int:
+    """Получает страницу ставок, в половине случаев — по событию."""
+    params = {"limit": 100}
+    if rnd.random() < 0.5:
+        params["event_id"] = rnd.choice(line.open)
+    response = await client.get(f"{urls['bet-maker']}bets", params=params)
+    return response.status_code
+
+
+async def op_events(
+    client: httpx.AsyncClient, urls: dict, line: Line, rnd: random.Random
+) -> int:
+    """Получает список событий через `bet-maker`."""
+    response = await client.get(f"{urls['bet-maker']}events")
+    return response.status_code
+
+
+async def op_updated(
+    client: httpx.AsyncClient, urls: dict, line: Line, rnd: random.Random
+) -> int:
+    """Отправляет пачку завершенных событий, как это делает `line-provider`."""
+    if line.finished:
+        events = rnd.sample(line.finished, min(line.batch_size, len(line.finished)))
+    else:
+        events = [{"event_id": line.unknown_id, "state": 2}]
+    response = await client.post(
+        f"{urls['bet-maker']}updated",
+        json={
+            "events": [
+                event | {"coefficient": "1.50", "deadline": None} for event in events
+            ]
+        },
+    )
+    return response.status_code
+
+
+async def op_update(
+    client: httpx.AsyncClient, urls: dict, line: Line, rnd: random.Random
+) -> int:
+    """Меняет коэффициент события или завершает его."""
+    event = line.finish(rnd) if rnd.random() < FINISH_RATIO else None
+    if event is None:
+        event = {"event_id": rnd.choice(line.open), "state": 1}
+    response = await client.put(
+        f"{urls['line-provider']}event/update",
+        json=event | {"coefficient": f"{rnd.uniform(1.01, 10):.2f}"},
+    )
+    return response.status_code
+
+
+async def op_new(
+    client: httpx.AsyncClient, urls: dict, line: Line, rnd: random.Random
+) -> int:
+    """Получает страницу открытых событий из `line-provider`."""
+    response = await client.get(
+        f"{urls['line-provider']}event/new", params={"limit": 100}
+    )
+    return response.status_code
+
+
+OPERATIONS: dict[str, Callable[..., Awaitable[int]]] = {
+    "bet": op_bet,
+    "bets": op_bets,
+    "events": op_events,
+    "updated": op_updated,
+    "update": op_update,
+    "new": op_new,
+}
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """Разбирает смесь операций вида `bet=40,events=20`.
+
+    Args:
+        value: Строка со смесью.
+
+    Raises:
+        argparse.ArgumentTypeError: Если смесь некорректна.
+
+    Returns:
+        Веса операций.
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight: {item}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("The mix has no operations")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """Возвращает перцентиль отсортированной выборки по ближайшему рангу.
+
+    Args:
+        samples: Отсортированная выборка.
+        percent: Перцентиль, %.
+
+    Returns:
+        Значение перцентиля.
+    """
+    rank = max(1, math.ceil(percent / 100 * len(samples)))
+    return samples[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, duration: float) -> dict:
+    """Считает метрики операции.
+
+    Args:
+        latencies: Задержки запросов, сек.
+        errors: Количество ответов с ошибкой.
+        duration: Длительность прогона, сек.
+
+    Returns:
+        Количество запросов и ошибок, пропускная способность, запросов/сек,
+        и задержки, мс.
+    """
+    samples = sorted(latency * 1000 for latency in latencies)
+    result = {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput": len(samples) / duration,
+    }
+    if samples:
+        result["mean_ms"] = sum(samples) / len(samples)
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = percentile(samples, percent)
+        result["max_ms"] = samples[-1]
+    return result
+
+
+async def run_workers(
+    urls: dict[str, str],
+    line: Line,
+    mix: dict[str, int],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> tuple[dict[str, list[float]], dict[str, int], float]:
+    """Выполняет смесь операций заданное время.
+
+    Args:
+        urls: Базовые адреса сервисов.
+        line: Линия событий.
+        mix: Веса операций.
+        concurrency: Количество одновременно работающих воркеров.
+        duration: Длительность, сек.
+        seed: Зерно генераторов воркеров.
+
+    Returns:
+        Задержки и количество ошибок по операциям и фактическая длительность.
+    """
+    names, weights = list(mix), list(mix.values())
+    latencies: dict[str, list[float]] = {name: [] for name in names}
+    errors = dict.fromkeys(names, 0)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=None)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        started_at = time.perf_counter()
+        stop_at = started_at + duration
+
+        async def worker(rnd: random.Random) -> None:
+            while time.perf_counter() < stop_at:
+                name = rnd.choices(names, weights)[0]
+                request_started_at = time.perf_counter()
+                try:
+                    status_code = await OPERATIONS[name](client, urls, line, rnd)
+                except httpx.HTTPError:
+                    status_code = None
+                latencies[name].append(time.perf_counter() - request_started_at)
+                if status_code is None or status_code >= 400:
+                    errors[name] += 1
+
+        await asyncio.gather(
+            *(worker(random.Random(seed + i)) for i in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started_at
+
+    return latencies, errors, elapsed
+
+
+def prepare_line(urls: dict[str, str], size: int, seed: int, batch_size: int) -> Line:
+    """Генерирует линию событий, открытых на все время прогона.
+
+    Args:
+        urls: Базовые адреса сервисов.
+        size: Количество событий.
+        seed: Зерно генератора событий.
+        batch_size: Количество событий в пачке `/updated`.
+
+    Returns:
+        Линия событий.
+    """
+    response = httpx.post(
+        f"{urls['line-provider']}event/generate/{size}",
+        params={
+            "seed": seed,
+            "min_deadline_offset": 3600,
+            "max_deadline_offset": 7200,
+        },
+        timeout=600,
+    )
+    response.raise_for_status()
+    return Line([event["event_id"] for event in response.json()], batch_size)
+
+
+def git_revision() -> dict[str, str | bool | None]:
+    """Возвращает коммит, на котором выполнен прогон."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=stand.ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=stand.ROOT,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def compare(result: dict, baseline: dict) -> None:
+    """Печатает изменение метрик относительно базового прогона.
+
+    Args:
+        result: Результат текущего прогона.
+        baseline: Результат базового прогона.
+    """
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'}:")
+    print(f"{'operation':<10} {'throughput':>12} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, current in result["operations"].items():
+        previous = baseline.get("operations", {}).get(name)
+        if not previous or not current["requests"] or not previous["requests"]:
+            continue
+        changes = [
+            (current[key] - previous[key]) / previous[key] * 100 if previous[key] else 0
+            for key in ("throughput", "p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(
+            f"{name:<10} {changes[0]:>+11.1f}% "
+            + " ".join(f"{change:>+9.1f}%" for change in changes[1:])
+        )
+
+
+def print_result(result: dict) -> None:
+    """Печатает метрики прогона.
+
+    Args:
+        result: Результат прогона.
+    """
+    print(
+        f"{'operation':<10} {'requests':>9} {'errors':>7} {'rps':>9} "
+        f"{'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}"
+    )
+    for name, metrics in [*result["operations"].items(), ("total", result["total"])]:
+        if not metrics["requests"]:
+            continue
+        print(
+            f"{name:<10} {metrics['requests']:>9} {metrics['errors']:>7} "
+            f"{metrics['throughput']:>9.1f} {metrics['p50_ms']:>9.2f} "
+            f"{metrics['p95_ms']:>9.2f} {metrics['p99_ms']:>9.2f}"
+        )
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--store-backend",
+        default="dict",
+        help="EVENT_STORE_BACKEND of the line-provider started by the suite",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="uvicorn workers of the line-provider started by the suite; "
+        "more than one requires --store-backend shared",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="existing bet-maker database; a temporary PostgreSQL is started otherwise",
+    )
+    parser.add_argument(
+        "--line-provider-url", help="use a running line-provider instead of booting"
+    )
+    parser.add_argument(
+        "--bet-maker-url", help="use a running bet-maker instead of booting"
+    )
+    parser.add_argument("--output", type=Path, default=Path("load-results.json"))
+    parser.add_argument("--compare", type=Path, help="results file to compare with")
+    args = parser.parse_args()
+
+    # Хранилища в памяти процесса у каждого рабочего процесса были бы свои
+    if args.workers > 1 and args.store_backend != "shared":
+        parser.error("--workers above 1 requires --store-backend shared")
+
+    with_bet_maker = bool(BET_MAKER_OPERATIONS & set(args.mix))
+    if args.line_provider_url:
+        urls = {"line-provider": args.line_provider_url.rstrip("/") + "/"}
+        if with_bet_maker:
+            if not args.bet_maker_url:
+                parser.error("--bet-maker-url is required with --line-provider-url")
+            urls["bet-maker"] = args.bet_maker_url.rstrip("/") + "/"
+        context = contextlib.nullcontext(urls)
+    else:
+        context = stand.stand(
+            with_bet_maker=with_bet_maker,
+            database_url=args.database_url,
+            line_provider_env={"EVENT_STORE_BACKEND": args.store_backend},
+            line_provider_workers=args.workers,
+        )
+
+    # Стенд не поднимается, например, без установленного PostgreSQL
+    try:
+        with context as urls:
+            line = prepare_line(urls, args.events, args.seed, args.batch_size)
+
+            if args.warmup:
+                asyncio.run(
+                    run_workers(
+                        urls, line, args.mix, args.concurrency, args.warmup, args.seed
+                    )
+                )
+            latencies, errors, elapsed = asyncio.run(
+                run_workers(
+                    urls, line, args.mix, args.concurrency, args.duration, args.seed
+                )
+            )
+    except (RuntimeError, subprocess.CalledProcessError) as error:
+        parser.exit(1, f"{parser.prog}: error: {error}\n")
+
+    result = git_revision() | {
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "events": args.events,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+            "store_backend": None if args.line_provider_url else args.store_backend,
+            "workers": None if args.line_provider_url else args.workers,
+        },
+        "duration": elapsed,
+        "operations": {
+            name: summarize(latencies[name], errors[name], elapsed) for name in args.mix
+        },
+        "total": summarize(
+            [latency for samples in latencies.values() for latency in samples],
+            sum(errors.values()),
+            elapsed,
+        ),
+    }
+
+    args.output.write_text(json.dumps(result, indent=2) + "\n")
+    print_result(result)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        compare(result, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
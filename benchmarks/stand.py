@@ -0,0 +1,264 @@
+"""Локальный стенд для нагрузочных тестов.
+
+Поднимает сервисы `line-provider` и `bet-maker` отдельными процессами
+uvicorn и, если не передан адрес существующей бд, временный кластер
+PostgreSQL в каталоге во временной папке. Кластер создается `initdb`
+из каталога `PG_BIN` или найденного в `PATH` и запускается без fsync:
+его данные не нужны после прогона.
+"""
+
+import contextlib
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import httpx
+
+
+ROOT = Path(__file__).resolve().parent.parent
+# Модули, общие для обоих сервисов
+COMMON = ROOT / "common"
+
+# Каталоги, в которых обычно лежат бинарные файлы PostgreSQL
+PG_BIN_GLOBS = ("/usr/lib/postgresql/*/bin", "/usr/local/pgsql/bin")
+
+
+def free_port() -> int:
+    """Возвращает свободный TCP-порт."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def find_pg_bin() -> Path | None:
+    """Ищет каталог с бинарными файлами PostgreSQL.
+
+    Returns:
+        Каталог с `initdb` и `pg_ctl` или None, если PostgreSQL не установлен.
+    """
+    if os.getenv("PG_BIN"):
+        return Path(os.environ["PG_BIN"])
+
+    initdb = shutil.which("initdb")
+    if initdb:
+        return Path(initdb).parent
+
+    for pattern in PG_BIN_GLOBS:
+        candidates = sorted(Path("/").glob(pattern.lstrip("/")), reverse=True)
+        for candidate in candidates:
+            if (candidate / "initdb").exists():
+                return candidate
+    return None
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    """Ждет, пока сервис начнет отвечать на запросы.
+
+    Args:
+        url: Адрес, отвечающий после запуска сервиса.
+        process: Процесс сервиса.
+        timeout: Максимальное время ожидания, сек.
+
+    Raises:
+        RuntimeError: Если процесс завершился или не ответил вовремя.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1).raise_for_status()
+        except httpx.HTTPError:
+            time.sleep(0.1)
+        else:
+            return
+    raise RuntimeError(f"{url} did not start in {timeout} s")
+
+
+def stop_process(process: subprocess.Popen, timeout: float = 10) -> None:
+    """Останавливает процесс, при необходимости принудительно.
+
+    Args:
+        process: Процесс.
+        timeout: Время на штатное завершение, сек.
+    """
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+@contextlib.contextmanager
+def postgres(pg_bin: Path | None = None) -> Iterator[str]:
+    """Запускает временный кластер PostgreSQL.
+
+    Args:
+        pg_bin: Каталог с бинарными файлами PostgreSQL.
+
+    Raises:
+        RuntimeError: Если PostgreSQL не установлен.
+
+    Yields:
+        Адрес бд для SQLAlchemy.
+    """
+    pg_bin = pg_bin or find_pg_bin()
+    if pg_bin is None:
+        raise RuntimeError(
+            "PostgreSQL binaries not found: set PG_BIN or pass --database-url"
+        )
+
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="bench-pg-") as directory:
+        data = Path(directory) / "data"
+        subprocess.run(
+            [pg_bin / "initdb", "-D", data, "-U", "postgres", "-A", "trust", "-N"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            [
+                pg_bin / "pg_ctl",
+                "-D",
+                data,
+                "-l",
+                Path(directory) / "postgres.log",
+                "-o",
+                f"-p {port} -h 127.0.0.1 -k {directory} -F",
+                "-w",
+                "start",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+        finally:
+            subprocess.run(
+                [pg_bin / "pg_ctl", "-D", data, "-m", "fast", "-w", "stop"],
+                stdout=subprocess.DEVNULL,
+            )
+
+
+@contextlib.contextmanager
+def service(
+    name: str, port: int, env: dict[str, str], timeout: float = 60, workers: int = 1
+) -> Iterator[str]:
+    """Запускает сервис процессом uvicorn.
+
+    Args:
+        name: Каталог сервиса.
+        port: Порт сервиса.
+        env: Дополнительные переменные окружения.
+        timeout: Максимальное время запуска, сек.
+        workers: Количество рабочих процессов uvicorn.
+
+    Yields:
+        Базовый адрес сервиса.
+    """
+    url = f"http://127.0.0.1:{port}/"
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+            "--timeout-graceful-shutdown",
+            "5",
+            "--workers",
+            str(workers),
+        ],
+        cwd=ROOT / name / "src",
+        env=os.environ | {"PYTHONPATH": str(COMMON)} | env,
+    )
+    try:
+        wait_ready(url, process, timeout)
+        yield url
+    finally:
+        stop_process(process)
+
+
+@contextlib.contextmanager
+def stand(
+    with_bet_maker: bool = True,
+    database_url: str | None = None,
+    line_provider_env: dict[str, str] | None = None,
+    bet_maker_env: dict[str, str] | None = None,
+    line_provider_workers: int = 1,
+) -> Iterator[dict[str, str]]:
+    """Поднимает стенд из сервисов и бд.
+
+    Без `bet-maker` уведомления `line-provider` отключаются, а бд не нужна.
+    Хранилище событий "shared" получает таблицу во временном каталоге, чтобы
+    события прошлых прогонов не попали в замер.
+
+    Args:
+        with_bet_maker: Запускать ли `bet-maker` и бд.
+        database_url: Адрес существующей бд; без него запускается временная.
+        line_provider_env: Переменные окружения `line-provider`.
+        bet_maker_env: Переменные окружения `bet-maker`.
+        line_provider_workers: Количество рабочих процессов `line-provider`.
+
+    Yields:
+        Базовые адреса запущенных сервисов по их названиям.
+    """
+    line_provider_port, bet_maker_port = free_port(), free_port()
+    line_provider_url = f"http://127.0.0.1:{line_provider_port}/"
+    bet_maker_url = f"http://127.0.0.1:{bet_maker_port}/"
+
+    with contextlib.ExitStack() as stack:
+        line_provider_env = dict(line_provider_env or {})
+        if line_provider_env.get("EVENT_STORE_BACKEND") == "shared":
+            shm_dir = stack.enter_context(
+                tempfile.TemporaryDirectory(
+                    dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+                )
+            )
+            line_provider_env.setdefault("EVENT_SHM_PATH", f"{shm_dir}/events")
+
+        urls = {
+            "line-provider": stack.enter_context(
+                service(
+                    "line-provider",
+                    line_provider_port,
+                    {
+                        "BET_MAKER_URL": bet_maker_url,
+                        "NOTIFY_ENABLED": str(with_bet_maker).lower(),
+                    }
+                    | line_provider_env,
+                    workers=line_provider_workers,
+                )
+            )
+        }
+
+        if with_bet_maker:
+            if database_url is None:
+                database_url = stack.enter_context(postgres())
+            urls["bet-maker"] = stack.enter_context(
+                service(
+                    "bet-maker",
+                    bet_maker_port,
+                    {
+                        "LINE_PROVIDER_URL": line_provider_url,
+                        "DATABASE_URL": database_url,
+                    }
+                    | (bet_maker_env or {}),
+                )
+            )
+
+        yield urls
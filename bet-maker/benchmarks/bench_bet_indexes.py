@@ -0,0 +1,145 @@
+"""Бенчмарк запросов к таблице ставок с индексами и без них.
+
+Заполняет отдельную таблицу `bet_bench` заданным количеством ставок,
+измеряет типовые запросы (урегулирование события, выборка и подсчет ставок
+по событию и статусу) без индексов, затем создает индексы из миграций
+и повторяет измерения. Нужен доступный PostgreSQL из `DATABASE_URL`.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_bet_indexes.py --rows 5000000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+import config
+
+
+TABLE = "bet_bench"
+
+QUERIES = {
+    "settle event": (
+        f"UPDATE {TABLE} SET state = 2 WHERE event_id = :event_id",
+        True,
+    ),
+    "bets by event and state": (
+        f"SELECT * FROM {TABLE} WHERE event_id = :event_id AND state = 1 "
+        "ORDER BY bet_id LIMIT 1000",
+        False,
+    ),
+    "count by event": (
+        f"SELECT count(*) FROM {TABLE} WHERE event_id = :event_id",
+        False,
+    ),
+    "count by state": (
+        f"SELECT count(*) FROM {TABLE} WHERE state = 3",
+        False,
+    ),
+}
+
+INDEXES = (
+    f"CREATE INDEX ON {TABLE} (event_id, state)",
+    f"CREATE INDEX ON {TABLE} (state)",
+    f"CREATE INDEX ON {TABLE} (event_id) WHERE state = 1",
+)
+
+
+async def fill(conn: AsyncConnection, rows: int, events: int) -> None:
+    """Создает и заполняет таблицу ставок.
+
+    Args:
+        conn: Соединение с бд.
+        rows: Количество ставок.
+        events: Количество событий, по которым распределяются ставки.
+    """
+    await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    await conn.execute(
+        text(
+            f"CREATE TABLE {TABLE} ("
+            "bet_id SERIAL PRIMARY KEY, event_id INTEGER NOT NULL, "
+            "amount FLOAT NOT NULL, state INTEGER NOT NULL)"
+        )
+    )
+    await conn.execute(
+        text(
+            f"INSERT INTO {TABLE} (event_id, amount, state) "
+            "SELECT (random() * :events)::int, round((random() * 100)::numeric, 2), "
+            "CASE WHEN random() < 0.2 THEN 1 ELSE 2 + (random() > 0.5)::int END "
+            "FROM generate_series(1, :rows)"
+        ),
+        {"rows": rows, "events": events},
+    )
+    await conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+async def measure(conn: AsyncConnection, events: int, repeat: int) -> dict[str, float]:
+    """Измеряет медианное время выполнения запросов.
+
+    Args:
+        conn: Соединение с бд.
+        events: Количество событий.
+        repeat: Количество повторов каждого запроса.
+
+    Returns:
+        Медианное время запросов в миллисекундах.
+    """
+    timings = {}
+    for name, (query, is_write) in QUERIES.items():
+        samples = []
+        for i in range(repeat):
+            params = {"event_id": (i * 7919) % events}
+            transaction = await conn.begin_nested() if is_write else None
+
+            started_at = time.perf_counter()
+            await conn.execute(text(query), params)
+            samples.append((time.perf_counter() - started_at) * 1000)
+
+            if transaction is not None:
+                await transaction.rollback()
+
+        timings[name] = statistics.median(samples)
+    return timings
+
+
+async def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_async_engine(config.DATABASE_URL)
+    async with engine.connect() as conn:
+        async with conn.begin():
+            await fill(conn, args.rows, args.events)
+
+        async with conn.begin():
+            before = await measure(conn, args.events, args.repeat)
+
+        async with conn.begin():
+            for statement in INDEXES:
+                await conn.execute(text(statement))
+            await conn.execute(text(f"ANALYZE {TABLE}"))
+
+        async with conn.begin():
+            after = await measure(conn, args.events, args.repeat)
+
+        async with conn.begin():
+            await conn.execute(text(f"DROP TABLE {TABLE}"))
+    await engine.dispose()
+
+    print(f"rows: {args.rows}, events: {args.events}")
+    print(f"{'query':<26} {'no index, ms':>14} {'indexed, ms':>14}")
+    for name in QUERIES:
+        print(f"{name:<26} {before[name]:>14.2f} {after[name]:>14.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""Бенчмарк записи ставок: коммит на каждый запрос против очереди.
+
+Заданное количество ставок записывается конкурентными задачами сначала
+по одной через `BetDAL.create`, как в `/bet` без очереди, затем через
+`BetWriter` с разными размерами пачки. Для каждого варианта выводятся
+пропускная способность, задержки записи ставки и количество коммитов.
+Ставки пишутся в таблицу `bet` на несуществующее событие и удаляются
+после прогона. Нужен доступный PostgreSQL из `DATABASE_URL`.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_bet_ingest.py --bets 20000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy import delete
+
+import db
+import ingest
+
+
+# ID события, на которое пишутся ставки бенчмарка
+EVENT_ID = -1
+
+
+async def run(
+    place: Callable[[float], Awaitable[object]], bets: int, concurrency: int
+) -> tuple[float, list[float]]:
+    """Записывает ставки конкурентными задачами.
+
+    Args:
+        place: Функция записи одной ставки по ее сумме.
+        bets: Количество ставок.
+        concurrency: Количество конкурентных задач.
+
+    Returns:
+        Общее время, сек, и задержки записи каждой ставки, мс.
+    """
+    latencies = []
+    remaining = iter(range(bets))
+
+    async def worker() -> None:
+        for index in remaining:
+            started_at = time.perf_counter()
+            await place(1 + index % 100)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started_at, latencies
+
+
+async def per_request(amount: float) -> None:
+    """Записывает ставку отдельной транзакцией.
+
+    Args:
+        amount: Сумма ставки.
+    """
+    async with db.async_session_maker() as db_session:
+        await db.BetDAL(db_session).create(EVENT_ID, amount)
+
+
+async def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bets", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument(
+        "--batch-sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[1, 10, 100, 500],
+    )
+    parser.add_argument("--window", type=float, default=0.002)
+    args = parser.parse_args()
+
+    await db.init_db()
+
+    results = {}
+    elapsed, latencies = await run(per_request, args.bets, args.concurrency)
+    results["per request"] = (elapsed, latencies, args.bets)
+
+    for batch_size in args.batch_sizes:
+        writer = ingest.BetWriter(
+            max_batch=batch_size, window=args.window, max_size=args.concurrency
+        )
+        writer.start()
+        elapsed, latencies = await run(
+            lambda amount: writer.submit(EVENT_ID, amount, None),
+            args.bets,
+            args.concurrency,
+        )
+        await writer.stop()
+        results[f"queue, batch {batch_size}"] = (elapsed, latencies, writer.batches)
+
+    async with db.async_session_maker() as db_session:
+        await db_session.execute(delete(db.Bet).where(db.Bet.event_id == EVENT_ID))
+        await db_session.commit()
+    await db.engine.dispose()
+
+    print(
+        f"bets: {args.bets}, concurrency: {args.concurrency}, "
+        f"window: {args.window * 1000:g} ms, pool: {db.engine.pool.size()}"
+    )
+    print(f"{'mode':<20} {'bets/s':>10} {'p50, ms':>9} {'p99, ms':>9} {'commits':>9}")
+    for name, (elapsed, latencies, commits) in results.items():
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:<20} {args.bets / elapsed:>10.0f} "
+            f"{quantiles[49]:>9.2f} {quantiles[98]:>9.2f} {commits:>9}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
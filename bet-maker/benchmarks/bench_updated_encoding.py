@@ -0,0 +1,139 @@
+"""Бенчмарк кодирования и разбора пачек `/updated`.
+
+Сравнивает прежний формат (JSON-строка внутри JSON, разбор через `Json`
+и валидацию каждого события) с типизированной пачкой в JSON и MessagePack.
+Кодирование повторяет то, что делает `line-provider`, разбор — то, что
+делает `bet-maker`.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_updated_encoding.py --size 10000
+"""
+
+import argparse
+import decimal
+import json
+import random
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+import msgpack
+
+import schemas
+import serialization
+
+
+def make_events(size: int, seed: int = 0) -> list[schemas.EventShow]:
+    """Создает события для пачки.
+
+    Args:
+        size: Количество событий.
+        seed: Зерно генератора случайных чисел.
+
+    Returns:
+        События.
+    """
+    rnd = random.Random(seed)
+    return [
+        schemas.EventShow(
+            event_id=event_id,
+            coefficient=decimal.Decimal(rnd.randint(101, 1000)).scaleb(-2),
+            deadline=1_700_000_000 + rnd.randint(0, 3600),
+            state=rnd.choice((2, 3)),
+        )
+        for event_id in range(1, size + 1)
+    ]
+
+
+def dump_event(event: schemas.EventShow) -> dict[str, Any]:
+    """Преобразует событие так же, как `serialization.dump_event` в `line-provider`.
+
+    Args:
+        event: Объект события.
+
+    Returns:
+        Словарь с полями события.
+    """
+    return {
+        "event_id": event.event_id,
+        "coefficient": None if event.coefficient is None else str(event.coefficient),
+        "deadline": event.deadline,
+        "state": int(event.state),
+    }
+
+
+def encode_legacy(events: list[schemas.EventShow]) -> bytes:
+    """Кодирует пачку в прежнем формате."""
+    payload = json.dumps(
+        {event.event_id: event.model_dump() for event in events}, default=float
+    )
+    return json.dumps(payload).encode()
+
+
+def decode_legacy(content: bytes) -> list[schemas.EventShow]:
+    """Разбирает пачку в прежнем формате."""
+    events = json.loads(json.loads(content))
+    return [schemas.EventShow.model_validate(event) for event in events.values()]
+
+
+def encode_batch(events: list[schemas.EventShow], media_type: str) -> bytes:
+    """Кодирует типизированную пачку."""
+    data = {"events": [dump_event(event) for event in events]}
+    if media_type == serialization.MSGPACK:
+        return msgpack.packb(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """Измеряет медианное время вызова в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started_at) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    events = make_events(args.size)
+    formats = {
+        "legacy json": (
+            lambda: encode_legacy(events),
+            decode_legacy,
+        ),
+        "json": (
+            lambda: encode_batch(events, serialization.JSON),
+            lambda content: serialization.validate(
+                schemas.EventBatch, content, serialization.JSON
+            ),
+        ),
+        "msgpack": (
+            lambda: encode_batch(events, serialization.MSGPACK),
+            lambda content: serialization.validate(
+                schemas.EventBatch, content, serialization.MSGPACK
+            ),
+        ),
+    }
+
+    print(f"events per batch: {args.size}")
+    print(f"{'format':<12} {'size, KB':>10} {'encode, ms':>12} {'decode, ms':>12}")
+    for name, (encode, decode) in formats.items():
+        content = encode()
+        encode_time = measure(encode, args.repeat)
+        decode_time = measure(lambda: decode(content), args.repeat)
+        print(
+            f"{name:<12} {len(content) / 1024:>10.1f} "
+            f"{encode_time:>12.2f} {decode_time:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
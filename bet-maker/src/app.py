@@ -2,14 +2,23 @@
 
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from http import HTTPStatus
+from typing import Any
 
 import asyncpg
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
 
+import config
 import db
+import metrics
+import profiling
 import router
+from cache import event_cache
 from client import http_client
+from exposure import exposure
+from ingest import bet_writer
+from stream import event_stream
 
 
 @asynccontextmanager
@@ -28,8 +37,27 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         else:
             break
 
+    # Восстанавливаем счетчики нагрузки по событиям
+    await exposure.start()
+
+    # Запускаем запись ставок пачками
+    if bet_writer.enabled:
+        bet_writer.start()
+
+    # Прогреваем локальную реплику событий
+    await event_cache.start(http_client())
+
+    # Подписываемся на поток изменений событий
+    if config.EVENT_STREAM_ENABLED:
+        event_stream.start(http_client())
+
     yield
 
+    await event_stream.stop()
+    await bet_writer.stop()
+    await event_cache.stop()
+    await exposure.stop()
+
     # Закрываем клиентскую сессию
     await http_client.stop()
 
@@ -39,6 +67,85 @@ app = FastAPI(title="bet-maker", lifespan=lifespan)
 app.include_router(router.bet_router)
 app.include_router(router.event_router)
 
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if config.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+metrics.Callback(
+    "db_pool_checked_out",
+    "Database connections currently checked out",
+    lambda: db.engine.pool.checkedout(),
+)
+metrics.Callback(
+    "db_pool_overflow",
+    "Database connections open beyond the pool size",
+    lambda: max(db.engine.pool.overflow(), 0),
+)
+metrics.Callback(
+    "db_pool_checkouts_total",
+    "Database connection checkouts",
+    lambda: db.engine.pool.checkouts,
+    kind="counter",
+)
+metrics.Callback(
+    "db_pool_timeouts_total",
+    "Database connection checkouts that timed out",
+    lambda: db.engine.pool.timeouts,
+    kind="counter",
+)
+metrics.Callback(
+    "db_pool_wait_seconds_total",
+    "Total time spent waiting for a database connection",
+    lambda: db.engine.pool.wait_total,
+    kind="counter",
+)
+metrics.Callback(
+    "event_cache_size", "Events in the local replica", lambda: len(event_cache.events)
+)
+metrics.Callback(
+    "event_cache_age_seconds", "Age of the local event replica", lambda: event_cache.age
+)
+metrics.Callback(
+    "event_cache_hits_total",
+    "Lookups served by the local event replica",
+    lambda: event_cache.hits,
+    kind="counter",
+)
+metrics.Callback(
+    "event_cache_misses_total",
+    "Lookups not served by the local event replica",
+    lambda: event_cache.misses,
+    kind="counter",
+)
+metrics.Callback(
+    "event_stream_changes_total",
+    "Event changes received from the line-provider stream",
+    lambda: event_stream.changes,
+    kind="counter",
+)
+metrics.Callback(
+    "bet_queue_depth", "Bets waiting in the ingestion queue", bet_writer.queue.qsize
+)
+metrics.Callback(
+    "bet_queue_batches_total",
+    "Bet batches committed by the ingestion queue",
+    lambda: bet_writer.batches,
+    kind="counter",
+)
+metrics.Callback(
+    "exposure_events",
+    "Events with bets in exposure counters",
+    lambda: len(exposure.events),
+)
+metrics.Callback(
+    "exposure_mismatches_total",
+    "Events whose exposure counters differed from the database",
+    lambda: exposure.mismatches,
+    kind="counter",
+)
+
 
 @app.get("/")
 async def index() -> dict[str, str]:
@@ -46,5 +153,33 @@ async def index() -> dict[str, str]:
     return {"message": "This is index page!"}
 
 
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """Возвращает метрики сервиса в текстовом формате Prometheus."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/db/pool")
+async def get_db_pool_stats() -> dict[str, int | float | None]:
+    """Возвращает статистику пула соединений с бд."""
+    return db.engine.pool.stats()
+
+
+@app.get("/debug/requests")
+async def get_slow_requests() -> dict[str, Any]:
+    """Возвращает медленные запросы с разбивкой времени по видам работы.
+
+    Время делится на запросы к бд, запросы к `line-provider` и код обработчика.
+
+    Raises:
+        HTTPException: Если профилирование выключено.
+    """
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="Profiling is disabled"
+        )
+    return profiling.slow_requests.stats()
+
+
 if __name__ == "__main__":
     uvicorn.run(app)
@@ -0,0 +1,206 @@
+"""Модуль с локальной репликой событий сервиса `line-provider`."""
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Iterable
+
+import httpx
+
+import config
+import ext
+import schemas
+
+
+class EventCache:
+    """Локальная реплика событий, на которые можно совершить ставку.
+
+    Прогревается при запуске приложения, поддерживается в актуальном состоянии
+    уведомлениями от `line-provider` и периодически обновляется в фоне.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = config.EVENT_CACHE_REFRESH_INTERVAL,
+        max_staleness: float = config.EVENT_CACHE_MAX_STALENESS,
+        miss_refresh_interval: float = config.EVENT_CACHE_MISS_REFRESH_INTERVAL,
+    ):
+        """Инициализация.
+
+        Args:
+            refresh_interval: Период фонового обновления, сек.
+            max_staleness: Возраст реплики, после которого она обновляется
+                перед проверкой ставки, сек.
+            miss_refresh_interval: Минимальный интервал между обновлениями
+                из-за промахов, сек.
+        """
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self.events: dict[int, schemas.EventShow] = {}
+        self.refreshed_at: float | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def age(self) -> float | None:
+        """Возраст реплики, сек, или None, если она ещё не загружена."""
+        if self.refreshed_at is None:
+            return None
+        return time.monotonic() - self.refreshed_at
+
+    def replace(self, events: Iterable[schemas.EventShow]) -> None:
+        """Полностью заменяет содержимое реплики.
+
+        Args:
+            events: Актуальный список событий.
+        """
+        self.events = {event.event_id: event for event in events}
+        self.refreshed_at = time.monotonic()
+
+    def apply(self, events: Iterable[schemas.EventShow]) -> None:
+        """Применяет к реплике изменения событий.
+
+        Args:
+            events: Изменившиеся события.
+        """
+        for event in events:
+            self.events[event.event_id] = event
+
+    async def refresh(self, client_session: httpx.AsyncClient) -> None:
+        """Загружает актуальный список событий из `line-provider`.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        started_at = time.monotonic()
+
+        async with self._lock:
+            # Пока ждали блокировку, реплику мог обновить другой запрос
+            if self.refreshed_at is not None and self.refreshed_at >= started_at:
+                return
+
+            try:
+                events = await ext.get_events_from_line_provider(client_session)
+            except httpx.HTTPError:
+                self.refresh_errors += 1
+                raise
+
+            self.replace(schemas.EventShow.model_validate(event) for event in events)
+            self.refreshes += 1
+
+    async def get_open(
+        self, event_id: int, client_session: httpx.AsyncClient
+    ) -> schemas.EventShow | None:
+        """Возвращает событие, на которое можно совершить ставку.
+
+        Args:
+            event_id: ID события.
+            client_session: Клиентская сессия.
+
+        Raises:
+            httpx.HTTPError: Если обновить устаревшую реплику не удалось.
+
+        Returns:
+            Объект события или None, если ставка на него невозможна.
+        """
+        return (await self.get_open_many([event_id], client_session)).get(event_id)
+
+    async def get_open_many(
+        self, event_ids: Iterable[int], client_session: httpx.AsyncClient
+    ) -> dict[int, schemas.EventShow]:
+        """Возвращает события, на которые можно совершить ставку.
+
+        Реплика обновляется синхронно не более одного раза: только если она
+        устарела или какое-то из событий не найдено, а с последнего обновления
+        прошло достаточно времени.
+
+        Args:
+            event_ids: ID событий.
+            client_session: Клиентская сессия.
+
+        Raises:
+            httpx.HTTPError: Если обновить устаревшую реплику не удалось.
+
+        Returns:
+            Объекты событий, на которые можно совершить ставку, по их ID.
+        """
+        event_ids = set(event_ids)
+
+        age = self.age
+        if age is None or age > self.max_staleness:
+            await self.refresh(client_session)
+        elif age > self.miss_refresh_interval and not event_ids <= self.events.keys():
+            with contextlib.suppress(httpx.HTTPError):
+                await self.refresh(client_session)
+
+        now = int(time.time())
+        open_events = {}
+
+        for event_id in event_ids:
+            event = self.events.get(event_id)
+            if event is None:
+                self.misses += 1
+                continue
+
+            self.hits += 1
+            if event.state is not schemas.EventState.NEW:
+                continue
+            if not event.deadline or now >= event.deadline:
+                continue
+
+            open_events[event_id] = event
+
+        return open_events
+
+    async def _run(self, client_session: httpx.AsyncClient) -> None:
+        """Периодически обновляет реплику.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            with contextlib.suppress(httpx.HTTPError):
+                await self.refresh(client_session)
+
+    async def start(self, client_session: httpx.AsyncClient) -> None:
+        """Прогревает реплику и запускает её фоновое обновление.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        with contextlib.suppress(httpx.HTTPError):
+            await self.refresh(client_session)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(client_session))
+
+    async def stop(self) -> None:
+        """Останавливает фоновое обновление реплики."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Возвращает статистику реплики."""
+        return {
+            "size": len(self.events),
+            "age": self.age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+event_cache = EventCache()
@@ -2,6 +2,8 @@
 
 import httpx
 
+import metrics
+
 
 class HttpClient:
     """Клиентская модель для взаимодействия с внешними сервисами."""
@@ -10,7 +12,9 @@ class HttpClient:
 
     def start(self) -> None:
         """Открывает клиентскую сессию."""
-        self.session = httpx.AsyncClient()
+        self.session = httpx.AsyncClient(
+            transport=metrics.InstrumentedTransport(peer="line-provider")
+        )
 
     async def stop(self) -> None:
         """Закрывает клиентскую сессию."""
@@ -1,18 +1,114 @@
 """Модуль работы с бд и моделями."""
 
-from collections.abc import AsyncGenerator
+import decimal
+import json
+import time
+from collections.abc import AsyncGenerator, Callable
 
-from sqlalchemy import orm, select, update
+from sqlalchemy import (
+    Index,
+    Integer,
+    Numeric,
+    Select,
+    bindparam,
+    case,
+    cast,
+    func,
+    insert,
+    or_,
+    orm,
+    select,
+    update,
+)
+from sqlalchemy import Executable, Result, exc
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
 
 import config
+import metrics
+import migrations
+import profiling
 import schemas
 
 
-engine = create_async_engine(config.DATABASE_URL)
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, собирающий статистику выдачи соединений."""
+
+    def __init__(self, *args, **kwargs):
+        """Инициализация."""
+        super().__init__(*args, **kwargs)
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_events = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def connect(self) -> PoolProxiedConnection:
+        """Выдает соединение из пула, замеряя время ожидания."""
+        overflow = self.overflow()
+        started_at = time.perf_counter()
+
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+
+        wait = time.perf_counter() - started_at
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+        # Соединение создано сверх размера пула
+        if self.overflow() > max(overflow, 0):
+            self.overflow_events += 1
+
+        return connection
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Возвращает статистику пула."""
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "overflow_events": self.overflow_events,
+            "wait_avg": self.wait_total / self.checkouts if self.checkouts else None,
+            "wait_max": self.wait_max,
+        }
+
+
+connect_args: dict = {"prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE}
+if config.DB_STATEMENT_TIMEOUT:
+    connect_args["server_settings"] = {
+        "statement_timeout": str(config.DB_STATEMENT_TIMEOUT)
+    }
+
+engine = create_async_engine(
+    config.DATABASE_URL,
+    poolclass=InstrumentedPool,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    pool_pre_ping=config.DB_POOL_PRE_PING,
+    connect_args=connect_args,
+)
 async_session_maker = async_sessionmaker(engine)
 
 
+db_query_duration_seconds = metrics.Histogram(
+    "db_query_duration_seconds", "Bet DAL query latency", ("operation",)
+)
+db_commit_duration_seconds = metrics.Histogram(
+    "db_commit_duration_seconds", "Bet DAL commit latency", ("operation",)
+)
+
+
 class Base(orm.DeclarativeBase):  # noqa
     ...
 
@@ -21,9 +117,9 @@ metadata = Base.metadata
 
 
 async def init_db():
-    """Создает бд и таблицы."""
+    """Создает бд и таблицы, применяя недостающие миграции."""
     async with engine.begin() as conn:
-        await conn.run_sync(metadata.create_all)
+        await migrations.upgrade(conn)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -36,67 +132,391 @@ class Bet(Base):
     """Модель ставки."""
 
     __tablename__ = "bet"
+    __table_args__ = (
+        Index("ix_bet_event_id_state", "event_id", "state"),
+        Index("ix_bet_state", "state"),
+    )
 
     bet_id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
     event_id: orm.Mapped[int] = orm.mapped_column(nullable=False)
     amount: orm.Mapped[float] = orm.mapped_column(nullable=False)
     state: orm.Mapped[int] = orm.mapped_column(nullable=False, default=1)
+    # Коэффициент события, с которым принята ставка
+    coefficient: orm.Mapped[decimal.Decimal | None] = orm.mapped_column(Numeric(10, 2))
+    # Сумма к выплате; заполняется при урегулировании события
+    payout: orm.Mapped[decimal.Decimal | None] = orm.mapped_column(Numeric(14, 2))
 
 
 class BetDAL:
-    """DAL-объект для взаимодействия со ставками."""
+    """DAL-объект для взаимодействия со ставками.
+
+    Подписчики уведомляются о созданных ставках и урегулированных событиях
+    после фиксации транзакции.
+    """
+
+    # Подписчики на создание ставок
+    created_listeners: list[Callable[[list[schemas.BetShow]], None]] = []
+    # Подписчики на урегулирование событий
+    settled_listeners: list[Callable[[dict[int, schemas.EventState]], None]] = []
 
     def __init__(self, db_session: AsyncSession):
         """Инициализация."""
         self.db_session = db_session
 
-    async def create(self, event_id: int, bet_amount: float) -> schemas.BetShow:
+    @staticmethod
+    def _filter(
+        query: Select,
+        event_id: int | None = None,
+        state: schemas.EventState | None = None,
+    ) -> Select:
+        """Добавляет к запросу фильтры по событию и статусу ставки.
+
+        Args:
+            query: Запрос.
+            event_id: ID события.
+            state: Статус ставки.
+
+        Returns:
+            Отфильтрованный запрос.
+        """
+        if event_id is not None:
+            query = query.where(Bet.event_id == event_id)
+        if state is not None:
+            query = query.where(Bet.state == state)
+        return query
+
+    async def _execute(
+        self, operation: str, statement: Executable, params: list[dict] | None = None
+    ) -> Result:
+        """Выполняет запрос, учитывая его время в метриках и профиле запроса.
+
+        Args:
+            operation: Операция DAL, к которой относится запрос.
+            statement: Запрос.
+            params: Параметры запроса.
+
+        Returns:
+            Результат запроса.
+        """
+        with db_query_duration_seconds.labels(operation).time(), profiling.span("sql"):
+            return await self.db_session.execute(statement, params)
+
+    async def _commit(self, operation: str) -> None:
+        """Фиксирует транзакцию, учитывая ее время в метриках и профиле запроса.
+
+        Args:
+            operation: Операция DAL, к которой относится транзакция.
+        """
+        with db_commit_duration_seconds.labels(operation).time(), profiling.span("sql"):
+            await self.db_session.commit()
+
+    async def create(
+        self,
+        event_id: int,
+        bet_amount: float,
+        coefficient: decimal.Decimal | None = None,
+    ) -> schemas.BetShow:
         """Создает ставку.
 
         Args:
             event_id: ID события.
             bet_amount: Сумма ставки.
+            coefficient: Коэффициент события, с которым принята ставка.
 
         Returns:
             Объект созданной ставки.
         """
-        new_bet = Bet(event_id=event_id, amount=bet_amount)
+        new_bet = Bet(event_id=event_id, amount=bet_amount, coefficient=coefficient)
         self.db_session.add(new_bet)
-        await self.db_session.commit()
-        await self.db_session.refresh(new_bet)
+        await self._commit("create")
+        with db_query_duration_seconds.labels("create").time(), profiling.span("sql"):
+            await self.db_session.refresh(new_bet)
 
-        return schemas.BetShow(
+        created_bet = schemas.BetShow(
             bet_id=new_bet.bet_id,
             event_id=new_bet.event_id,
             amount=new_bet.amount,
             state=new_bet.state,
+            coefficient=new_bet.coefficient,
+            payout=new_bet.payout,
         )
+        for listener in self.created_listeners:
+            listener([created_bet])
 
-    async def read_all(self) -> list[schemas.BetShow]:
-        """Возвращает все ставки.
+        return created_bet
+
+    async def create_many(
+        self, bets: list[tuple[int, float, decimal.Decimal | None]]
+    ) -> list[schemas.BetShow]:
+        """Создает пачку ставок в одной транзакции.
+
+        Строки вставляются многострочными `INSERT ... RETURNING`, порядок
+        результатов совпадает с порядком переданных ставок.
+
+        Args:
+            bets: Тройки `(event_id, bet_amount, coefficient)`.
 
         Returns:
-            Последовательность всех ставок.
+            Объекты созданных ставок.
         """
-        result = await self.db_session.execute(select(Bet))
+        if not bets:
+            return []
+
+        result = await self._execute(
+            "create_many",
+            insert(Bet).returning(
+                Bet.bet_id,
+                Bet.event_id,
+                Bet.amount,
+                Bet.state,
+                Bet.coefficient,
+                Bet.payout,
+                sort_by_parameter_order=True,
+            ),
+            [
+                {"event_id": event_id, "amount": amount, "coefficient": coefficient}
+                for event_id, amount, coefficient in bets
+            ],
+        )
+        created_bets = [
+            schemas.BetShow.model_validate(row, from_attributes=True)
+            for row in result.all()
+        ]
+        await self._commit("create_many")
+        for listener in self.created_listeners:
+            listener(created_bets)
+
+        return created_bets
+
+    async def read_page(
+        self,
+        after_bet_id: int | None = None,
+        limit: int = config.BETS_PAGE_SIZE,
+        event_id: int | None = None,
+        state: schemas.EventState | None = None,
+    ) -> list[schemas.BetShow]:
+        """Возвращает страницу ставок в порядке возрастания ID.
+
+        Args:
+            after_bet_id: ID ставки, после которой начинается страница.
+            limit: Максимальное количество ставок.
+            event_id: ID события.
+            state: Статус ставки.
+
+        Returns:
+            Последовательность ставок.
+        """
+        query = self._filter(select(Bet), event_id, state)
+        query = query.order_by(Bet.bet_id).limit(limit)
+        if after_bet_id is not None:
+            query = query.where(Bet.bet_id > after_bet_id)
+
+        result = await self._execute("read_page", query)
         return [
             schemas.BetShow(
                 bet_id=bet.bet_id,
                 event_id=bet.event_id,
                 amount=bet.amount,
                 state=bet.state,
+                coefficient=bet.coefficient,
+                payout=bet.payout,
             )
             for bet in result.scalars().all()
         ]
 
+    async def stream_all(
+        self,
+        event_id: int | None = None,
+        state: schemas.EventState | None = None,
+        chunk_size: int = config.BETS_STREAM_CHUNK_SIZE,
+    ) -> AsyncGenerator[bytes, None]:
+        """Выгружает все ставки в формате NDJSON.
+
+        Ставки читаются через серверный курсор порциями, поэтому потребление
+        памяти не зависит от размера таблицы.
+
+        Args:
+            event_id: ID события.
+            state: Статус ставки.
+            chunk_size: Количество ставок в одной порции.
+
+        Yields:
+            Порции строк NDJSON.
+        """
+        query = select(
+            Bet.bet_id,
+            Bet.event_id,
+            Bet.amount,
+            Bet.state,
+            Bet.coefficient,
+            Bet.payout,
+        )
+        with (
+            db_query_duration_seconds.labels("stream_all").time(),
+            profiling.span("sql"),
+        ):
+            result = await self.db_session.stream(
+                self._filter(query, event_id, state)
+                .order_by(Bet.bet_id)
+                .execution_options(yield_per=chunk_size)
+            )
+        async for partition in result.mappings().partitions():
+            # Десятичные значения выгружаются строками, как и в ответах API
+            yield "".join(
+                json.dumps(dict(row), default=str) + "\n" for row in partition
+            ).encode()
+
+    async def count(
+        self, event_id: int | None = None, state: schemas.EventState | None = None
+    ) -> int:
+        """Возвращает количество ставок.
+
+        Args:
+            event_id: ID события.
+            state: Статус ставки.
+
+        Returns:
+            Количество ставок.
+        """
+        result = await self._execute(
+            "count",
+            self._filter(select(func.count()).select_from(Bet), event_id, state),
+        )
+        return result.scalar_one()
+
+    async def open_event_ids(self) -> set[int]:
+        """Возвращает ID событий, на которые есть неурегулированные ставки.
+
+        Returns:
+            ID событий.
+        """
+        result = await self._execute(
+            "open_event_ids",
+            select(Bet.event_id).where(Bet.state == schemas.EventState.NEW).distinct(),
+        )
+        return set(result.scalars().all())
+
     async def update_bet_state_by_event_id(
-        self, event_ids: list[int], state: schemas.EventState
-    ) -> None:
-        """Обновляет статусы ставок по ID событий."""
-        await self.db_session.execute(
+        self, event_states: dict[int, schemas.EventState]
+    ) -> dict[int, int]:
+        """Обновляет статусы ставок по ID событий.
+
+        Все события обновляются одним запросом: пары `(event_id, state)`
+        передаются массивами и разворачиваются через `unnest`, а вместо
+        самих обновленных строк из бд возвращается только их количество
+        по каждому событию. Тем же запросом рассчитываются выплаты:
+        выигравшей ставке — сумма, умноженная на коэффициент принятия,
+        проигравшей — ноль, ставке на удаленное событие — возврат суммы.
+        Ставкам без сохраненного коэффициента выигрыш не рассчитывается.
+        Удаление события возвращает только неурегулированные ставки:
+        выплаты по уже урегулированным ставкам не меняются.
+
+        Args:
+            event_states: Новые статусы событий по их ID.
+
+        Returns:
+            Количество обновленных ставок по ID событий.
+        """
+        if not event_states:
+            return {}
+
+        states = [int(state) for state in event_states.values()]
+        settled = (
+            func.unnest(
+                bindparam("event_ids", list(event_states), type_=ARRAY(Integer)),
+                bindparam("states", states, type_=ARRAY(Integer)),
+            )
+            .table_valued("event_id", "state")
+            .render_derived("settled")
+        )
+        amount = cast(Bet.amount, Numeric)
+        payout = case(
+            (
+                settled.c.state == int(schemas.EventState.FINISHED_WIN),
+                func.round(amount * Bet.coefficient, 2),
+            ),
+            (settled.c.state == int(schemas.EventState.FINISHED_LOSE), 0),
+            (settled.c.state == int(schemas.EventState.DELETED), amount),
+            else_=None,
+        )
+        updated = (
             update(Bet)
-            .where(Bet.event_id.in_(event_ids))
-            .values({Bet.state: state})
-            .returning(Bet)
+            .where(
+                Bet.event_id == settled.c.event_id,
+                or_(
+                    settled.c.state != int(schemas.EventState.DELETED),
+                    Bet.state == int(schemas.EventState.NEW),
+                ),
+            )
+            .values({Bet.state: settled.c.state, Bet.payout: payout})
+            .returning(Bet.event_id)
+            .cte("updated")
+        )
+        result = await self._execute(
+            "update_bet_state",
+            select(updated.c.event_id, func.count()).group_by(updated.c.event_id),
+        )
+        await self._commit("update_bet_state")
+        for listener in self.settled_listeners:
+            listener(event_states)
+
+        return dict.fromkeys(event_states, 0) | dict(result.tuples().all())
+
+    async def payouts(
+        self, event_id: int | None = None, state: schemas.EventState | None = None
+    ) -> list[schemas.BetPayouts]:
+        """Возвращает сводку выплат по событиям и статусам ставок.
+
+        Сводка агрегируется в бд одним запросом по сохраненным при
+        урегулировании выплатам.
+
+        Args:
+            event_id: ID события.
+            state: Статус ставки.
+
+        Returns:
+            Количество ставок, сумма ставок и сумма выплат по каждой паре
+            `(event_id, state)` в порядке возрастания.
+        """
+        query = self._filter(
+            select(
+                Bet.event_id,
+                Bet.state,
+                func.count().label("bets"),
+                func.sum(Bet.amount).label("amount"),
+                func.sum(Bet.payout).label("payout"),
+            ),
+            event_id,
+            state,
+        )
+        result = await self._execute(
+            "payouts",
+            query.group_by(Bet.event_id, Bet.state).order_by(Bet.event_id, Bet.state),
+        )
+        return [
+            schemas.BetPayouts.model_validate(row, from_attributes=True)
+            for row in result.all()
+        ]
+
+    async def exposure(
+        self,
+    ) -> list[tuple[int, int, int, decimal.Decimal, decimal.Decimal]]:
+        """Возвращает нагрузку по событиям и статусам ставок одним запросом.
+
+        Returns:
+            Кортежи `(event_id, state, bets, stake, potential_payout)`, где
+            потенциальная выплата — сумма выигрышей ставок по коэффициентам
+            их принятия, округленных так же, как при урегулировании.
+        """
+        amount = cast(Bet.amount, Numeric)
+        result = await self._execute(
+            "exposure",
+            select(
+                Bet.event_id,
+                Bet.state,
+                func.count(),
+                func.sum(amount),
+                func.coalesce(func.sum(func.round(amount * Bet.coefficient, 2)), 0),
+            ).group_by(Bet.event_id, Bet.state),
         )
-        await self.db_session.commit()
+        return result.tuples().all()
@@ -0,0 +1,311 @@
+"""Модуль счетчиков нагрузки ставок по событиям."""
+
+import asyncio
+import contextlib
+import decimal
+import time
+
+import sqlalchemy.exc
+
+import config
+import db
+import schemas
+
+
+CENT = decimal.Decimal("0.01")
+# Суммы хранятся с точностью колонки выплат, чтобы счетчики выглядели
+# одинаково после обновлений в памяти и после загрузки из бд
+ZERO = decimal.Decimal("0.00")
+
+# Ошибки обращения к бд, при которых сверка пропускается
+DB_ERRORS = (sqlalchemy.exc.SQLAlchemyError, OSError)
+
+
+class Totals:
+    """Агрегаты ставок на событие с одним статусом."""
+
+    __slots__ = ("bets", "stake", "potential_payout")
+
+    def __init__(
+        self,
+        bets: int = 0,
+        stake: decimal.Decimal = ZERO,
+        potential_payout: decimal.Decimal = ZERO,
+    ):
+        """Инициализация.
+
+        Args:
+            bets: Количество ставок.
+            stake: Сумма ставок.
+            potential_payout: Сумма выигрышей ставок по их коэффициентам.
+        """
+        self.bets = bets
+        self.stake = stake
+        self.potential_payout = potential_payout
+
+    def __eq__(self, other: object) -> bool:
+        """Сравнивает агрегаты."""
+        if not isinstance(other, Totals):
+            return NotImplemented
+        return (self.bets, self.stake, self.potential_payout) == (
+            other.bets,
+            other.stake,
+            other.potential_payout,
+        )
+
+    def merge(self, other: "Totals") -> None:
+        """Добавляет к агрегатам другие агрегаты."""
+        self.bets += other.bets
+        self.stake += other.stake
+        self.potential_payout += other.potential_payout
+
+
+def to_money(value: decimal.Decimal | float) -> decimal.Decimal:
+    """Округляет сумму до копеек.
+
+    Args:
+        value: Сумма.
+
+    Returns:
+        Сумма с двумя знаками после запятой.
+    """
+    return decimal.Decimal(str(value)).quantize(CENT, rounding=decimal.ROUND_HALF_UP)
+
+
+def payout(state: int, totals: Totals) -> decimal.Decimal:
+    """Рассчитывает выплату по ставкам с одним статусом.
+
+    Правила совпадают с расчетом выплат при урегулировании в бд.
+
+    Args:
+        state: Статус ставок.
+        totals: Агрегаты ставок.
+
+    Returns:
+        Сумма выплат; для неурегулированных ставок — ноль.
+    """
+    if state == schemas.EventState.FINISHED_WIN:
+        return totals.potential_payout
+    if state == schemas.EventState.DELETED:
+        return totals.stake
+    return ZERO
+
+
+class ExposureTracker:
+    """Счетчики нагрузки ставок по событиям в памяти процесса.
+
+    Счетчики восстанавливаются из бд одним агрегирующим запросом при запуске,
+    затем обновляются подписками на создание ставок и урегулирование событий
+    в `BetDAL` и отдаются без обращения к бд. Ставка, созданная одновременно
+    с урегулированием ее события, и ставки, созданные другими процессами
+    сервиса, учитываются только периодической сверкой с бд.
+    """
+
+    def __init__(self, reconcile_interval: float = config.EXPOSURE_RECONCILE_INTERVAL):
+        """Инициализация.
+
+        Args:
+            reconcile_interval: Период сверки с бд, сек; 0 — без сверки.
+        """
+        self.reconcile_interval = reconcile_interval
+
+        # Агрегаты по ID событий и статусам ставок
+        self.events: dict[int, dict[int, Totals]] = {}
+        self.reconciled_at: float | None = None
+
+        self.reconciles = 0
+        self.reconcile_errors = 0
+        self.mismatches = 0
+
+        # События, изменившиеся во время текущей сверки
+        self._touched: set[int] | None = None
+        self._task: asyncio.Task | None = None
+
+        db.BetDAL.created_listeners.append(self.add)
+        db.BetDAL.settled_listeners.append(self.settle)
+
+    def add(self, bets: list[schemas.BetShow]) -> None:
+        """Учитывает созданные ставки.
+
+        Args:
+            bets: Созданные ставки.
+        """
+        for bet in bets:
+            # Выигрыш считается от точной суммы ставки, как при урегулировании
+            amount = decimal.Decimal(str(bet.amount))
+            stake = to_money(amount)
+            potential_payout = ZERO
+            if bet.coefficient is not None:
+                potential_payout = to_money(amount * bet.coefficient)
+
+            states = self.events.setdefault(bet.event_id, {})
+            totals = states.get(bet.state)
+            if totals is None:
+                totals = states[bet.state] = Totals()
+            totals.bets += 1
+            totals.stake += stake
+            totals.potential_payout += potential_payout
+
+            if self._touched is not None:
+                self._touched.add(bet.event_id)
+
+    def settle(self, event_states: dict[int, schemas.EventState]) -> None:
+        """Учитывает урегулирование событий.
+
+        Урегулирование выставляет новый статус всем ставкам события, а
+        удаление — только неурегулированным, как и в бд.
+
+        Args:
+            event_states: Новые статусы событий по их ID.
+        """
+        for event_id, state in event_states.items():
+            states = self.events.get(event_id)
+            if states is None:
+                continue
+
+            if state == schemas.EventState.DELETED:
+                refunded = states.pop(schemas.EventState.NEW, None)
+                if refunded is not None:
+                    states.setdefault(int(state), Totals()).merge(refunded)
+            else:
+                settled = Totals()
+                for totals in states.values():
+                    settled.merge(totals)
+                self.events[event_id] = {int(state): settled}
+
+            if self._touched is not None:
+                self._touched.add(event_id)
+
+    @staticmethod
+    def _group(
+        rows: list[tuple[int, int, int, decimal.Decimal, decimal.Decimal]]
+    ) -> dict[int, dict[int, Totals]]:
+        """Группирует строки агрегирующего запроса по событиям.
+
+        Args:
+            rows: Кортежи `(event_id, state, bets, stake, potential_payout)`.
+
+        Returns:
+            Агрегаты по ID событий и статусам ставок.
+        """
+        events: dict[int, dict[int, Totals]] = {}
+        for event_id, state, bets, stake, potential_payout in rows:
+            events.setdefault(event_id, {})[state] = Totals(
+                bets, to_money(stake), to_money(potential_payout)
+            )
+        return events
+
+    async def rebuild(self) -> None:
+        """Заново загружает все счетчики из бд."""
+        async with db.async_session_maker() as db_session:
+            rows = await db.BetDAL(db_session).exposure()
+
+        self.events = self._group(rows)
+        self.reconciled_at = time.monotonic()
+
+    async def reconcile(self) -> int:
+        """Сверяет счетчики с бд и исправляет расхождения.
+
+        События, изменившиеся во время запроса к бд, не сверяются: их
+        счетчики могут быть новее полученных из бд.
+
+        Returns:
+            Количество событий с расхождениями.
+        """
+        self._touched = set()
+        try:
+            async with db.async_session_maker() as db_session:
+                rows = await db.BetDAL(db_session).exposure()
+            touched = self._touched
+        except DB_ERRORS:
+            self.reconcile_errors += 1
+            raise
+        finally:
+            self._touched = None
+
+        actual = self._group(rows)
+        mismatches = 0
+        for event_id in actual.keys() | self.events.keys():
+            if event_id in touched:
+                continue
+
+            states = actual.get(event_id)
+            if self.events.get(event_id) == states:
+                continue
+
+            mismatches += 1
+            if states is None:
+                del self.events[event_id]
+            else:
+                self.events[event_id] = states
+
+        self.reconciles += 1
+        self.mismatches += mismatches
+        self.reconciled_at = time.monotonic()
+        return mismatches
+
+    def get(self, event_id: int) -> schemas.EventExposure:
+        """Возвращает нагрузку ставок на событие.
+
+        Args:
+            event_id: ID события.
+
+        Returns:
+            Нагрузка на событие; без ставок на него — нулевая.
+        """
+        states = self.events.get(event_id, {})
+        total = Totals()
+        potential_payout = paid = ZERO
+        for state, totals in states.items():
+            total.merge(totals)
+            if state == schemas.EventState.NEW:
+                potential_payout += totals.potential_payout
+            else:
+                paid += payout(state, totals)
+
+        return schemas.EventExposure(
+            event_id=event_id,
+            bets=total.bets,
+            stake=total.stake,
+            potential_payout=potential_payout,
+            payout=paid,
+        )
+
+    async def _run(self) -> None:
+        """Периодически сверяет счетчики с бд."""
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            with contextlib.suppress(*DB_ERRORS):
+                await self.reconcile()
+
+    async def start(self) -> None:
+        """Загружает счетчики из бд и запускает их фоновую сверку."""
+        await self.rebuild()
+
+        if self._task is None and self.reconcile_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую сверку счетчиков."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Возвращает статистику счетчиков."""
+        return {
+            "events": len(self.events),
+            "age": (
+                None
+                if self.reconciled_at is None
+                else time.monotonic() - self.reconciled_at
+            ),
+            "reconciles": self.reconciles,
+            "reconcile_errors": self.reconcile_errors,
+            "mismatches": self.mismatches,
+        }
+
+
+exposure = ExposureTracker()
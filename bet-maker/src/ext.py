@@ -1,9 +1,26 @@
 """Модуль взаимодействия с внешними сервисами."""
 
+from collections.abc import Iterable
+from http import HTTPStatus
+from typing import Any
+
 import httpx
 
 import config
 import schemas
+import serialization
+
+
+class CachedResponse:
+    """Последний успешный ответ сервиса и его ETag."""
+
+    def __init__(self):
+        """Инициализация."""
+        self.etag: str | None = None
+        self.data: Any = None
+
+
+new_events_response = CachedResponse()
 
 
 async def get_events_from_line_provider(
@@ -12,11 +29,95 @@ async def get_events_from_line_provider(
     """Возвращает список событий, на которые можно совершить ставку,
     от сервиса `line-provider`.
 
+    Список запрашивается в MessagePack. Запрос отправляется с ETag
+    предыдущего ответа; если список не изменился, сервис отвечает 304
+    и переиспользуется уже разобранный результат.
+
     Args:
         client_session: Клиентская сессия.
 
+    Raises:
+        httpx.HTTPStatusError: Если сервис ответил ошибкой.
+
     Returns:
         Список подходящих событий.
     """
-    response = await client_session.get(f"{config.LINE_PROVIDER_URL}event/new")
-    return response.json()
+    cached = new_events_response
+    headers = {"Accept": serialization.ACCEPT}
+    if cached.etag:
+        headers["If-None-Match"] = cached.etag
+
+    response = await client_session.get(
+        f"{config.LINE_PROVIDER_URL}event/new",
+        headers=headers,
+        extensions={"route": "/event/new"},
+    )
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        return cached.data
+
+    response.raise_for_status()
+
+    cached.data = serialization.decode(
+        response.content, response.headers.get("content-type")
+    )
+    cached.etag = response.headers.get("etag")
+    return cached.data
+
+
+async def get_all_events_from_line_provider(
+    client_session: httpx.AsyncClient,
+) -> list[schemas.EventShow]:
+    """Возвращает список всех событий от сервиса `line-provider`.
+
+    Args:
+        client_session: Клиентская сессия.
+
+    Raises:
+        httpx.HTTPStatusError: Если сервис ответил ошибкой.
+
+    Returns:
+        Список событий.
+    """
+    response = await client_session.get(
+        f"{config.LINE_PROVIDER_URL}event/all",
+        headers={"Accept": serialization.ACCEPT},
+        extensions={"route": "/event/all"},
+    )
+    response.raise_for_status()
+    return serialization.decode(response.content, response.headers.get("content-type"))
+
+
+async def get_events_by_ids_from_line_provider(
+    client_session: httpx.AsyncClient, event_ids: Iterable[int]
+) -> list[schemas.EventShow]:
+    """Возвращает события от сервиса `line-provider` по списку ID.
+
+    ID передаются пачками по `config.EVENT_BATCH_SIZE` в запросе.
+
+    Args:
+        client_session: Клиентская сессия.
+        event_ids: ID событий.
+
+    Raises:
+        httpx.HTTPStatusError: Если сервис ответил ошибкой.
+
+    Returns:
+        Найденные события; удаленных событий в списке нет.
+    """
+    event_ids = sorted(event_ids)
+    found = []
+    for start in range(0, len(event_ids), config.EVENT_BATCH_SIZE):
+        response = await client_session.get(
+            f"{config.LINE_PROVIDER_URL}event/batch",
+            params={"event_id": event_ids[start : start + config.EVENT_BATCH_SIZE]},
+            headers={"Accept": serialization.ACCEPT},
+            extensions={"route": "/event/batch"},
+        )
+        response.raise_for_status()
+        found.extend(
+            schemas.EventShow.model_validate(event)
+            for event in serialization.decode(
+                response.content, response.headers.get("content-type")
+            )
+        )
+    return found
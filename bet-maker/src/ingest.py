@@ -0,0 +1,180 @@
+"""Модуль записи ставок пачками с групповым коммитом."""
+
+import asyncio
+import contextlib
+import decimal
+import time
+from dataclasses import dataclass, field
+
+import config
+import db
+import schemas
+
+
+@dataclass
+class PendingBet:
+    """Ставка, ожидающая записи в бд."""
+
+    event_id: int
+    amount: float
+    coefficient: decimal.Decimal | None
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BetWriter:
+    """Очередь записи ставок.
+
+    Принятые ставки ставятся в очередь, а фоновая задача записывает их
+    пачками: одной многострочной вставкой и одним коммитом на пачку. Пачка
+    отправляется, когда набралось `max_batch` ставок или первая из них
+    прождала `window` секунд. Вызывающий код получает созданную ставку
+    только после коммита ее пачки, поэтому гарантии сохранности те же,
+    что и при коммите на каждый запрос, а количество коммитов, а значит
+    и сбросов журнала бд на диск, уменьшается в размер пачки раз.
+    """
+
+    def __init__(
+        self,
+        max_batch: int = config.BET_QUEUE_MAX_BATCH,
+        window: float = config.BET_QUEUE_WINDOW,
+        max_size: int = config.BET_QUEUE_MAX_SIZE,
+        enabled: bool = config.BET_QUEUE_ENABLED,
+    ):
+        """Инициализация.
+
+        Args:
+            max_batch: Максимальное количество ставок в пачке.
+            window: Максимальное время ожидания первой ставкой пачки, сек.
+            max_size: Максимальное количество ставок в очереди.
+            enabled: Записывать ли ставки через очередь.
+        """
+        self.max_batch = max_batch
+        self.window = window
+        self.enabled = enabled
+
+        self.queue: asyncio.Queue[PendingBet] = asyncio.Queue(max_size)
+
+        self.batches = 0
+        self.written = 0
+        self.failed_batches = 0
+        self.max_wait: float | None = None
+        self._wait_total = 0.0
+
+        # Устанавливается, когда в очереди набралась полная пачка
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def submit(
+        self, event_id: int, amount: float, coefficient: decimal.Decimal | None
+    ) -> schemas.BetShow:
+        """Ставит ставку в очередь и ждет коммита ее пачки.
+
+        Args:
+            event_id: ID события.
+            amount: Сумма ставки.
+            coefficient: Коэффициент события, с которым принята ставка.
+
+        Returns:
+            Объект созданной ставки.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(PendingBet(event_id, amount, coefficient, future))
+        # Первую ставку пачки задача записи уже извлекла из очереди
+        if self.queue.qsize() + 1 >= self.max_batch:
+            self._full.set()
+
+        return await future
+
+    async def _take_batch(self) -> list[PendingBet]:
+        """Дожидается и извлекает из очереди очередную пачку ставок."""
+        first = await self.queue.get()
+
+        if self.queue.qsize() + 1 < self.max_batch:
+            # Окно отсчитывается от постановки первой ставки в очередь: пока
+            # писалась предыдущая пачка, она уже могла прождать его целиком
+            timeout = first.enqueued_at + self.window - time.monotonic()
+            if timeout > 0:
+                self._full.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), timeout)
+
+        batch = [first]
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: list[PendingBet]) -> None:
+        """Записывает пачку ставок и передает результат ожидающим.
+
+        Args:
+            batch: Пачка ставок.
+        """
+        try:
+            async with db.async_session_maker() as db_session:
+                created_bets = await db.BetDAL(db_session).create_many(
+                    [
+                        (pending.event_id, pending.amount, pending.coefficient)
+                        for pending in batch
+                    ]
+                )
+        # Любая ошибка записи должна дойти до ожидающих запросов, а задача
+        # записи — продолжить работу
+        except Exception as error:
+            self.failed_batches += 1
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(error)
+            return
+
+        now = time.monotonic()
+        for pending, created_bet in zip(batch, created_bets):
+            # Запрос мог быть отменен, пока ставка ждала коммита
+            if not pending.future.done():
+                pending.future.set_result(created_bet)
+
+            wait = now - pending.enqueued_at
+            self._wait_total += wait
+            self.max_wait = max(self.max_wait or 0.0, wait)
+
+        self.batches += 1
+        self.written += len(batch)
+
+    async def _run(self) -> None:
+        """Записывает ставки из очереди."""
+        while True:
+            batch = await self._take_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def start(self) -> None:
+        """Запускает запись ставок."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дожидается записи поставленных в очередь ставок и останавливает запись."""
+        if self._task is not None:
+            await self.queue.join()
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Возвращает статистику записи."""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "batches": self.batches,
+            "written": self.written,
+            "failed_batches": self.failed_batches,
+            "avg_batch": self.written / self.batches if self.batches else None,
+            "avg_wait": self._wait_total / self.written if self.written else None,
+            "max_wait": self.max_wait,
+        }
+
+
+bet_writer = BetWriter()
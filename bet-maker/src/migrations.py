@@ -0,0 +1,126 @@
+"""Модуль версионированных миграций схемы бд."""
+
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import config
+
+
+VERSION_TABLE = "schema_version"
+
+# Ключ advisory-блокировки, не позволяющей нескольким воркерам
+# применять миграции одновременно
+LOCK_KEY = 0x6265746D
+
+
+class Migration(NamedTuple):
+    """Шаг миграции схемы."""
+
+    version: int
+    description: str
+    statements: tuple[str, ...]
+
+
+MIGRATIONS = (
+    Migration(
+        version=1,
+        description="Таблица ставок",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS bet (
+                bet_id SERIAL PRIMARY KEY,
+                event_id INTEGER NOT NULL,
+                amount FLOAT NOT NULL,
+                state INTEGER NOT NULL
+            )
+            """,
+        ),
+    ),
+    Migration(
+        version=2,
+        description="Индексы по событию и статусу ставки",
+        statements=(
+            "CREATE INDEX IF NOT EXISTS ix_bet_event_id_state ON bet (event_id, state)",
+            "CREATE INDEX IF NOT EXISTS ix_bet_state ON bet (state)",
+        ),
+    ),
+    Migration(
+        version=3,
+        description="Коэффициент и выплата ставки",
+        statements=(
+            "ALTER TABLE bet ADD COLUMN IF NOT EXISTS coefficient NUMERIC(10, 2)",
+            "ALTER TABLE bet ADD COLUMN IF NOT EXISTS payout NUMERIC(14, 2)",
+        ),
+    ),
+)
+
+# Необязательные индексы, создаваемые или удаляемые в зависимости от настроек
+OPEN_BETS_INDEX = "ix_bet_event_id_open"
+
+
+async def get_version(conn: AsyncConnection) -> int:
+    """Возвращает текущую версию схемы.
+
+    Args:
+        conn: Соединение с бд.
+
+    Returns:
+        Номер последней примененной миграции или 0.
+    """
+    await conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "description TEXT NOT NULL, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+    )
+    result = await conn.execute(
+        text(f"SELECT coalesce(max(version), 0) FROM {VERSION_TABLE}")
+    )
+    return result.scalar_one()
+
+
+async def upgrade(conn: AsyncConnection) -> int:
+    """Применяет к схеме недостающие миграции.
+
+    Должна вызываться внутри транзакции.
+
+    Args:
+        conn: Соединение с бд.
+
+    Returns:
+        Версия схемы после обновления.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+
+    version = await get_version(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+
+        for statement in migration.statements:
+            await conn.execute(text(statement))
+
+        await conn.execute(
+            text(
+                f"INSERT INTO {VERSION_TABLE} (version, description) "
+                "VALUES (:version, :description)"
+            ),
+            {"version": migration.version, "description": migration.description},
+        )
+        version = migration.version
+
+    if config.DB_OPEN_BETS_PARTIAL_INDEX:
+        await conn.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS {OPEN_BETS_INDEX} "
+                "ON bet (event_id) WHERE state = 1"
+            )
+        )
+    else:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {OPEN_BETS_INDEX}"))
+
+    return version
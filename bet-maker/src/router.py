@@ -3,14 +3,20 @@
 from http import HTTPStatus
 
 import httpx
-from fastapi import APIRouter, Body, Depends, HTTPException
-from pydantic import Json
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext import asyncio
 
+import config
 import db
 import ext
 import schemas
+import serialization
+from cache import event_cache
 from client import http_client
+from exposure import exposure
+from ingest import bet_writer
+from stream import event_stream
 
 bet_router = APIRouter(tags=["bet"])
 event_router = APIRouter(tags=["event"])
@@ -32,23 +38,66 @@ async def get_events(
     return await ext.get_events_from_line_provider(client_session)
 
 
-@event_router.post("/updated")
+@event_router.get("/events/cache")
+async def get_event_cache_stats() -> dict[str, int | float | None]:
+    """Возвращает статистику локальной реплики событий."""
+    return event_cache.stats()
+
+
+@event_router.get("/events/stream")
+async def get_event_stream_stats() -> dict[str, int | str | None]:
+    """Возвращает статистику подписки на поток изменений событий."""
+    return event_stream.stats()
+
+
+@event_router.get("/events/exposure")
+async def get_exposure_stats() -> dict[str, int | float | None]:
+    """Возвращает статистику счетчиков нагрузки ставок по событиям."""
+    return exposure.stats()
+
+
+@event_router.get("/events/{event_id}/exposure")
+async def get_event_exposure(event_id: int) -> schemas.EventExposure:
+    """Возвращает нагрузку ставок на событие: количество и сумму ставок,
+    потенциальную выплату по неурегулированным ставкам и выплаты
+    по урегулированным.
+
+    Значения берутся из счетчиков в памяти, без запроса к бд.
+    \f
+    Args:
+        event_id: ID события.
+
+    Returns:
+        Нагрузка на событие.
+    """
+    return exposure.get(event_id)
+
+
+@event_router.post(
+    "/updated", openapi_extra=serialization.request_body_openapi(schemas.EventBatch)
+)
 async def receive_updated_event_info(
-    events: Json = Body(),
+    batch: schemas.EventBatch = Depends(serialization.event_batch),
     db_session: asyncio.AsyncSession = Depends(db.get_session),
-) -> None:
+) -> dict[int, int]:
     """Обрабатывает информацию об обновленных статусах событий
     от сервиса `line-provider`.
 
-    Выставляет соответствующие статусы на ставках.
+    Выставляет соответствующие статусы на ставках. События в пачке могут
+    иметь разные статусы. Пачка принимается в JSON или, с заголовком
+    `Content-Type: application/msgpack`, в MessagePack.
     \f
     Args:
+        batch: Пачка изменившихся событий.
         db_session: Сессия бд.
+
+    Returns:
+        Количество обновленных ставок по ID событий.
     """
-    event_list = list(events.values())
-    await db.BetDAL(db_session).update_bet_state_by_event_id(
-        event_ids=[event["event_id"] for event in event_list],
-        state=event_list[0]["state"],
+    event_cache.apply(batch.events)
+
+    return await db.BetDAL(db_session).update_bet_state_by_event_id(
+        {event.event_id: event.state for event in batch.events}
     )
 
 
@@ -59,32 +108,184 @@ async def make_bet(
     db_session: asyncio.AsyncSession = Depends(db.get_session),
 ) -> schemas.BetShow:
     """Сделать ставку на событие.
+
+    Вместе со ставкой сохраняется коэффициент события на момент ее принятия,
+    по которому рассчитывается выплата. Если включена очередь записи,
+    ставка записывается пачкой вместе с другими, а ответ отправляется после
+    коммита пачки.
     \f
     Args:
         bet: Объект создаваемой ставки.
         client_session: Клиентская сессия.
         db_session: Сессия бд.
 
+    Raises:
+        HTTPException: Если событие не найдено или ставки на него не принимаются.
+
     Returns:
         Объект созданной ставки.
     """
-    events = await ext.get_events_from_line_provider(client_session)
-    if not events or bet.event_id not in {_["event_id"] for _ in events}:
+    try:
+        event = await event_cache.get_open(bet.event_id, client_session)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail="Line provider is unavailable!",
+        )
+
+    if event is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Event not found!")
 
-    return await db.BetDAL(db_session).create(bet.event_id, bet.amount)
+    if bet_writer.enabled:
+        return await bet_writer.submit(bet.event_id, bet.amount, event.coefficient)
+
+    return await db.BetDAL(db_session).create(
+        bet.event_id, bet.amount, event.coefficient
+    )
+
+
+@bet_router.post("/bets/batch")
+async def make_bets(
+    bets: list[schemas.BetCreate] = Body(max_length=config.BET_BATCH_MAX_SIZE),
+    client_session: httpx.AsyncClient = Depends(http_client),
+    db_session: asyncio.AsyncSession = Depends(db.get_session),
+) -> list[schemas.BetBatchItemResult]:
+    """Сделать пачку ставок на события.
+
+    Ставки на неизвестные или закрытые события не создаются, остальные
+    создаются одной транзакцией. Результаты возвращаются в порядке ставок
+    в запросе.
+    \f
+    Args:
+        bets: Объекты создаваемых ставок.
+        client_session: Клиентская сессия.
+        db_session: Сессия бд.
+
+    Raises:
+        HTTPException: Если сервис `line-provider` недоступен.
+
+    Returns:
+        Результаты создания ставок.
+    """
+    try:
+        open_events = await event_cache.get_open_many(
+            (bet.event_id for bet in bets), client_session
+        )
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail="Line provider is unavailable!",
+        )
+
+    accepted = [bet for bet in bets if bet.event_id in open_events]
+    created_bets = iter(
+        await db.BetDAL(db_session).create_many(
+            [
+                (bet.event_id, bet.amount, open_events[bet.event_id].coefficient)
+                for bet in accepted
+            ]
+        )
+    )
+
+    results = []
+    for index, bet in enumerate(bets):
+        if bet.event_id in open_events:
+            result = schemas.BetBatchItemResult(
+                index=index, status_code=HTTPStatus.OK, bet=next(created_bets)
+            )
+        else:
+            result = schemas.BetBatchItemResult(
+                index=index,
+                status_code=HTTPStatus.NOT_FOUND,
+                detail="Event not found!",
+            )
+        results.append(result)
+
+    return results
 
 
 @bet_router.get("/bets")
 async def get_all_bets(
+    after_bet_id: int | None = None,
+    limit: int = Query(
+        default=config.BETS_PAGE_SIZE, ge=1, le=config.BETS_MAX_PAGE_SIZE
+    ),
+    event_id: int | None = None,
+    state: schemas.EventState | None = None,
+    stream: bool = False,
     db_session: asyncio.AsyncSession = Depends(db.get_session),
 ) -> list[schemas.BetShow]:
-    """Возвращает список всех сделанных ставок.
+    """Возвращает список сделанных ставок в порядке возрастания ID.
+
+    Для получения следующей страницы в `after_bet_id` передается ID последней
+    полученной ставки. В потоковом режиме все ставки выгружаются в формате
+    NDJSON без разбиения на страницы.
     \f
     Args:
+        after_bet_id: ID ставки, после которой начинается страница.
+        limit: Максимальное количество ставок.
+        event_id: ID события.
+        state: Статус ставки.
+        stream: Выгрузить все ставки потоком.
         db_session: Сессия бд.
 
     Returns:
         Список ставок.
     """
-    return await db.BetDAL(db_session).read_all()
+    bet_dal = db.BetDAL(db_session)
+    if stream:
+        return StreamingResponse(
+            bet_dal.stream_all(event_id=event_id, state=state),
+            media_type="application/x-ndjson",
+        )
+
+    return await bet_dal.read_page(
+        after_bet_id=after_bet_id, limit=limit, event_id=event_id, state=state
+    )
+
+
+@bet_router.get("/bets/queue")
+async def get_bet_queue_stats() -> dict[str, int | float | None]:
+    """Возвращает статистику очереди записи ставок."""
+    return bet_writer.stats()
+
+
+@bet_router.get("/bets/count")
+async def count_bets(
+    event_id: int | None = None,
+    state: schemas.EventState | None = None,
+    db_session: asyncio.AsyncSession = Depends(db.get_session),
+) -> dict[str, int]:
+    """Возвращает количество сделанных ставок.
+    \f
+    Args:
+        event_id: ID события.
+        state: Статус ставки.
+        db_session: Сессия бд.
+
+    Returns:
+        Объект с количеством ставок.
+    """
+    return {"count": await db.BetDAL(db_session).count(event_id=event_id, state=state)}
+
+
+@bet_router.get("/bets/payouts")
+async def get_payouts(
+    event_id: int | None = None,
+    state: schemas.EventState | None = None,
+    db_session: asyncio.AsyncSession = Depends(db.get_session),
+) -> list[schemas.BetPayouts]:
+    """Возвращает сводку выплат по событиям и статусам ставок.
+
+    Выплаты рассчитываются при урегулировании события по коэффициентам,
+    с которыми были приняты ставки; у неурегулированных ставок выплаты нет.
+    \f
+    Args:
+        event_id: ID события.
+        state: Статус ставки.
+        db_session: Сессия бд.
+
+    Returns:
+        Количество ставок, сумма ставок и сумма выплат по событиям и статусам.
+    """
+    return await db.BetDAL(db_session).payouts(event_id=event_id, state=state)
@@ -27,6 +27,12 @@ class EventShow(BaseModel):
     state: EventState
 
 
+class EventBatch(BaseModel):
+    """Схема пачки изменившихся событий от сервиса `line-provider`."""
+
+    events: list[EventShow]
+
+
 class BetCreate(BaseModel):
     """Схема создаваемой ставки."""
 
@@ -63,3 +69,37 @@ class BetShow(BaseModel):
     event_id: int
     amount: float
     state: int
+    coefficient: decimal.Decimal | None = None
+    payout: decimal.Decimal | None = None
+
+
+class BetPayouts(BaseModel):
+    """Сводка выплат по ставкам на событие с одним статусом."""
+
+    event_id: int
+    state: int
+    bets: int
+    amount: float
+    payout: decimal.Decimal | None = None
+
+
+class EventExposure(BaseModel):
+    """Нагрузка ставок на событие."""
+
+    event_id: int
+    # Количество и общая сумма ставок
+    bets: int
+    stake: decimal.Decimal
+    # Сумма выигрышей по еще не урегулированным ставкам
+    potential_payout: decimal.Decimal
+    # Сумма выплат по урегулированным ставкам
+    payout: decimal.Decimal
+
+
+class BetBatchItemResult(BaseModel):
+    """Результат создания ставки из пакетного запроса."""
+
+    index: int
+    status_code: int
+    bet: BetShow | None = None
+    detail: str | None = None
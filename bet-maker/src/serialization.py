@@ -0,0 +1,130 @@
+"""Модуль разбора данных в поддерживаемых форматах.
+
+Кроме JSON поддерживается компактный бинарный формат MessagePack; формат
+определяется по заголовку `Content-Type`.
+"""
+
+import json
+from typing import TypeVar
+
+import msgpack
+import pydantic
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+
+import schemas
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Типы, под которыми MessagePack встречается в заголовках
+MSGPACK_TYPES = {MSGPACK, "application/x-msgpack"}
+
+# Заголовок `Accept` запросов к `line-provider`
+ACCEPT = f"{MSGPACK}, {JSON};q=0.9"
+
+Model = TypeVar("Model", bound=pydantic.BaseModel)
+
+
+def is_msgpack(content_type: str | None) -> bool:
+    """Проверяет, что данные переданы в формате MessagePack.
+
+    Args:
+        content_type: Значение заголовка `Content-Type`.
+
+    Returns:
+        True, если данные в MessagePack.
+    """
+    return (content_type or "").partition(";")[0].strip() in MSGPACK_TYPES
+
+
+def decode(content: bytes, content_type: str | None) -> object:
+    """Декодирует данные из JSON или MessagePack.
+
+    Args:
+        content: Закодированные данные.
+        content_type: Значение заголовка `Content-Type`.
+
+    Returns:
+        Данные из примитивных типов.
+    """
+    if is_msgpack(content_type):
+        return msgpack.unpackb(content)
+    return json.loads(content)
+
+
+def validate(model: type[Model], content: bytes, content_type: str | None) -> Model:
+    """Разбирает данные в объект схемы.
+
+    JSON разбирается сразу в схему, без промежуточных объектов.
+
+    Args:
+        model: Схема.
+        content: Закодированные данные.
+        content_type: Значение заголовка `Content-Type`.
+
+    Raises:
+        RequestValidationError: Если данные не соответствуют схеме.
+
+    Returns:
+        Объект схемы.
+    """
+    try:
+        if is_msgpack(content_type):
+            return model.model_validate(msgpack.unpackb(content))
+        return model.model_validate_json(content)
+    except pydantic.ValidationError as error:
+        raise RequestValidationError(
+            [{**item, "loc": ("body", *item["loc"])} for item in error.errors()]
+        )
+    except ValueError as error:
+        # Битые данные MessagePack
+        raise RequestValidationError(
+            [
+                {
+                    "type": "value_error",
+                    "loc": ("body",),
+                    "msg": f"Invalid MessagePack data: {error!r}",
+                }
+            ]
+        )
+
+
+async def event_batch(request: Request) -> schemas.EventBatch:
+    """Зависимость для получения пачки событий из тела запроса.
+
+    Args:
+        request: Объект запроса.
+
+    Returns:
+        Пачка событий.
+    """
+    return validate(
+        schemas.EventBatch, await request.body(), request.headers.get("content-type")
+    )
+
+
+def request_body_openapi(model: type[pydantic.BaseModel]) -> dict:
+    """Возвращает описание тела запроса для документации.
+
+    Вложенные схемы ссылаются на компоненты документации, поэтому они
+    должны использоваться и в других эндпоинтах.
+
+    Args:
+        model: Схема тела запроса.
+
+    Returns:
+        Описание тела запроса в форматах JSON и MessagePack.
+    """
+    schema = model.model_json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                media_type: {"schema": schema} for media_type in (JSON, MSGPACK)
+            },
+        }
+    }
@@ -0,0 +1,241 @@
+"""Модуль подписки на поток изменений событий сервиса `line-provider`."""
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import AsyncIterator
+
+import httpx
+from sqlalchemy import exc
+
+import config
+import db
+import ext
+import schemas
+from cache import event_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Ошибки соединения и бд, после которых подписка переподключается
+CONNECTION_ERRORS = (httpx.HTTPError, exc.SQLAlchemyError, OSError)
+# Ошибки разбора одного сообщения: `json.JSONDecodeError` и ошибки валидации
+# pydantic — наследники `ValueError`
+INVALID_MESSAGE_ERRORS = (ValueError, KeyError, TypeError)
+
+
+async def read_messages(
+    lines: AsyncIterator[str],
+) -> AsyncIterator[tuple[str | None, str, str]]:
+    """Разбирает поток Server-Sent Events на сообщения.
+
+    Args:
+        lines: Строки потока.
+
+    Yields:
+        ID, тип и данные сообщений.
+    """
+    message_id, event, data = None, "message", []
+    async for line in lines:
+        if not line:
+            if data:
+                yield message_id, event, "\n".join(data)
+            message_id, event, data = None, "message", []
+            continue
+
+        field, _, value = line.partition(":")
+        value = value.removeprefix(" ")
+        if field == "id":
+            message_id = value
+        elif field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+
+
+class EventStream:
+    """Подписка на поток изменений событий.
+
+    Изменения применяются к локальной реплике событий и к ставкам так же,
+    как уведомления `POST /updated`. Некорректные сообщения пропускаются.
+    После разрыва или непредвиденной ошибки подписка переподключается
+    и продолжает с последнего полученного сообщения.
+    """
+
+    def __init__(
+        self,
+        reconnect_delay: float = config.EVENT_STREAM_RECONNECT_DELAY,
+        read_timeout: float = config.EVENT_STREAM_READ_TIMEOUT,
+    ):
+        """Инициализация.
+
+        Args:
+            reconnect_delay: Задержка перед переподключением, сек.
+            read_timeout: Максимальное время без сообщений в потоке, сек.
+        """
+        self.reconnect_delay = reconnect_delay
+        self.read_timeout = read_timeout
+
+        # ID последнего обработанного сообщения
+        self.last_id: str | None = None
+
+        self.connects = 0
+        self.errors = 0
+        self.changes = 0
+        self.resyncs = 0
+        self.invalid = 0
+
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    async def _update_bets(events: list[schemas.EventShow]) -> None:
+        """Выставляет статусы ставкам на завершенные и удаленные события.
+
+        Args:
+            events: События.
+        """
+        async with db.async_session_maker() as db_session:
+            await db.BetDAL(db_session).update_bet_state_by_event_id(
+                {
+                    event.event_id: event.state
+                    for event in events
+                    if event.state != schemas.EventState.NEW
+                }
+            )
+
+    async def _resync(self, client_session: httpx.AsyncClient) -> None:
+        """Заново загружает все события, когда пропущенных изменений уже нет.
+
+        Ставки сверяются только по событиям, на которые есть неурегулированные
+        ставки: урегулированные ставки повторно не пересчитываются. События,
+        удаленные или убранные в архив, пока подписка была разорвана, в списке
+        отсутствуют, поэтому они запрашиваются пакетными запросами по ID:
+        убранные в архив события по-прежнему доступны, а для удаленных ставки
+        возвращаются.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        events = [
+            schemas.EventShow.model_validate(event)
+            for event in await ext.get_all_events_from_line_provider(client_session)
+        ]
+        event_cache.replace(
+            event for event in events if event.state == schemas.EventState.NEW
+        )
+
+        async with db.async_session_maker() as db_session:
+            open_event_ids = await db.BetDAL(db_session).open_event_ids()
+        open_events = [event for event in events if event.event_id in open_event_ids]
+
+        missing_ids = open_event_ids - {event.event_id for event in open_events}
+        found = await ext.get_events_by_ids_from_line_provider(
+            client_session, missing_ids
+        )
+        open_events.extend(found)
+        open_events.extend(
+            schemas.EventShow(event_id=event_id, state=schemas.EventState.DELETED)
+            for event_id in sorted(missing_ids - {event.event_id for event in found})
+        )
+
+        await self._update_bets(open_events)
+        self.resyncs += 1
+
+    async def _listen(self, client_session: httpx.AsyncClient) -> None:
+        """Читает поток изменений до его разрыва.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        headers = {"Accept": "text/event-stream"}
+        if self.last_id is not None:
+            headers["Last-Event-ID"] = self.last_id
+
+        async with client_session.stream(
+            "GET",
+            f"{config.LINE_PROVIDER_URL}event/stream",
+            headers=headers,
+            timeout=httpx.Timeout(self.read_timeout),
+            extensions={"route": "/event/stream"},
+        ) as response:
+            response.raise_for_status()
+            self.connects += 1
+
+            async for message_id, event, data in read_messages(response.aiter_lines()):
+                if event == "resync":
+                    await self._resync(client_session)
+                elif event == "archive":
+                    # Событие только убрано из линии, его статус не изменился
+                    pass
+                else:
+                    try:
+                        events = [
+                            schemas.EventShow.model_validate(item)
+                            for item in json.loads(data)["events"]
+                        ]
+                    except INVALID_MESSAGE_ERRORS:
+                        self.invalid += 1
+                        logger.warning(
+                            "Skipping invalid event stream message %s",
+                            message_id,
+                            exc_info=True,
+                        )
+                    else:
+                        event_cache.apply(events)
+                        await self._update_bets(events)
+                        self.changes += 1
+
+                self.last_id = message_id
+
+    async def _run(self, client_session: httpx.AsyncClient) -> None:
+        """Поддерживает подписку, переподключаясь после разрывов.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        while True:
+            try:
+                await self._listen(client_session)
+            except CONNECTION_ERRORS:
+                self.errors += 1
+            except Exception:
+                # Непредвиденная ошибка не должна останавливать урегулирование.
+                # Переподключение начинается с полной загрузки событий, чтобы
+                # не споткнуться снова о то же сообщение
+                self.errors += 1
+                self.last_id = None
+                logger.exception("Event stream failed, reconnecting")
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self, client_session: httpx.AsyncClient) -> None:
+        """Запускает подписку.
+
+        Args:
+            client_session: Клиентская сессия.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(client_session))
+
+    async def stop(self) -> None:
+        """Останавливает подписку."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | str | None]:
+        """Возвращает статистику подписки."""
+        return {
+            "last_id": self.last_id,
+            "connects": self.connects,
+            "errors": self.errors,
+            "changes": self.changes,
+            "resyncs": self.resyncs,
+            "invalid": self.invalid,
+        }
+
+
+event_stream = EventStream()
@@ -5,10 +5,11 @@ from collections.abc import AsyncGenerator, Generator
 
 import httpx
 import pytest
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from src.client import http_client
-from src import app, config, db
+from src import app, config, db, migrations
 
 
 engine_test = create_async_engine(config.DATABASE_URL)
@@ -44,12 +45,13 @@ def dependencies() -> Generator[None, None, None]:
 async def database() -> AsyncGenerator[None, None]:
     """Фикстура создания и удаления бд."""
     async with engine_test.begin() as conn:
-        await conn.run_sync(db.metadata.create_all)
+        await migrations.upgrade(conn)
 
     yield
 
     async with engine_test.begin() as conn:
         await conn.run_sync(db.metadata.drop_all)
+        await conn.execute(text(f"DROP TABLE {migrations.VERSION_TABLE}"))
 
 
 @pytest.fixture(scope="session")
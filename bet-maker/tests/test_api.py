@@ -2,27 +2,33 @@
 
 # flake8: noqa
 
+import asyncio
 import json
+from decimal import Decimal
 from http import HTTPStatus
 
+import httpx
+import msgpack
 from httpx import AsyncClient
 
-from src import config
+import ext
+import stream
+from src import app, config
 
 
 async def test_get_events(ac: AsyncClient):
     response = await ac.post(
         "/updated",
-        json=json.dumps(
-            {
-                "1": {
+        json={
+            "events": [
+                {
                     "coefficient": "7.96",
                     "deadline": 1692749643,
                     "event_id": 1,
                     "state": 1,
                 }
-            }
-        ),
+            ]
+        },
     )
 
     assert response.status_code == HTTPStatus.OK
@@ -50,3 +56,321 @@ async def test_make_bet(ac: AsyncClient):
     response = await ac.post("/bet", json=bet)
 
     assert response.status_code == HTTPStatus.OK
+
+
+async def test_get_event_cache_stats(ac: AsyncClient):
+    response = await ac.get("/events/cache")
+
+    assert response.status_code == HTTPStatus.OK
+    assert {"size", "hits", "misses"} <= response.json().keys()
+
+
+async def test_get_event_stream_stats(ac: AsyncClient):
+    response = await ac.get("/events/stream")
+
+    assert response.status_code == HTTPStatus.OK
+    assert {"last_id", "connects", "resyncs"} <= response.json().keys()
+
+
+async def test_debug_requests_disabled_by_default(ac: AsyncClient):
+    response = await ac.get("/debug/requests")
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+async def test_receive_mixed_state_events(ac: AsyncClient):
+    events = [
+        {"event_id": 1, "state": 2},
+        {"event_id": 2, "state": 3},
+    ]
+
+    response = await ac.post("/updated", json={"events": events})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json().keys() == {"1", "2"}
+
+
+async def test_receive_updated_events_msgpack(ac: AsyncClient):
+    events = [{"event_id": 1, "coefficient": "1.50", "state": 2}]
+
+    response = await ac.post(
+        "/updated",
+        content=msgpack.packb({"events": events}),
+        headers={"Content-Type": "application/msgpack"},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json().keys() == {"1"}
+
+
+async def test_receive_updated_events_invalid(ac: AsyncClient):
+    response = await ac.post("/updated", json={"events": [{"event_id": 1}]})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_make_bets_batch(ac: AsyncClient):
+    async with AsyncClient() as session:
+        response = await session.post(f"{config.LINE_PROVIDER_URL}event/generate/1")
+
+    new_event_id = response.json()[0]["event_id"]
+    bets = [
+        {"event_id": new_event_id, "amount": 1},
+        {"event_id": -1, "amount": 1},
+        {"event_id": new_event_id, "amount": 2},
+    ]
+
+    response = await ac.post("/bets/batch", json=bets)
+
+    assert response.status_code == HTTPStatus.OK
+    assert [item["status_code"] for item in response.json()] == [
+        HTTPStatus.OK,
+        HTTPStatus.NOT_FOUND,
+        HTTPStatus.OK,
+    ]
+    assert response.json()[2]["bet"]["amount"] == 2
+
+
+async def test_get_bets_pagination(ac: AsyncClient):
+    first_page = (await ac.get("/bets", params={"limit": 1})).json()
+    assert len(first_page) == 1
+
+    response = await ac.get(
+        "/bets", params={"limit": 1, "after_bet_id": first_page[0]["bet_id"]}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert all(bet["bet_id"] > first_page[0]["bet_id"] for bet in response.json())
+
+
+async def test_get_bets_stream(ac: AsyncClient):
+    response = await ac.get("/bets", params={"stream": True})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    bets = [json.loads(line) for line in response.text.splitlines()]
+    assert bets == (await ac.get("/bets")).json()
+
+
+async def test_get_bets_filtered(ac: AsyncClient):
+    bets = (await ac.get("/bets")).json()
+    event_id = bets[0]["event_id"]
+
+    response = await ac.get("/bets", params={"event_id": event_id, "state": 1})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [
+        bet for bet in bets if bet["event_id"] == event_id and bet["state"] == 1
+    ]
+
+
+async def test_count_bets(ac: AsyncClient):
+    bets = (await ac.get("/bets")).json()
+
+    response = await ac.get("/bets/count")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"count": len(bets)}
+
+
+async def test_get_db_pool_stats(ac: AsyncClient):
+    response = await ac.get("/db/pool")
+
+    assert response.status_code == HTTPStatus.OK
+    assert {"checked_out", "overflow_events", "wait_max"} <= response.json().keys()
+
+
+async def test_get_metrics(ac: AsyncClient):
+    await ac.get("/bets/count")
+
+    response = await ac.get("/metrics")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/bets/count",'
+        'status="200"}' in response.text
+    )
+    assert "db_pool_checked_out" in response.text
+
+
+async def test_get_payouts(ac: AsyncClient):
+    async with AsyncClient() as session:
+        response = await session.post(f"{config.LINE_PROVIDER_URL}event/generate/1")
+
+    event = response.json()[0]
+    bet = (
+        await ac.post("/bet", json={"event_id": event["event_id"], "amount": 2})
+    ).json()
+    assert bet["coefficient"] == event["coefficient"]
+    assert bet["payout"] is None
+
+    await ac.post("/updated", json={"events": [event | {"state": 2}]})
+
+    response = await ac.get("/bets/payouts", params={"event_id": event["event_id"]})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == [
+        {
+            "event_id": event["event_id"],
+            "state": 2,
+            "bets": 1,
+            "amount": 2,
+            "payout": str(round(Decimal(event["coefficient"]) * 2, 2)),
+        }
+    ]
+
+
+async def test_delete_does_not_refund_settled_bets(ac: AsyncClient):
+    async with AsyncClient() as session:
+        response = await session.post(f"{config.LINE_PROVIDER_URL}event/generate/1")
+
+    event = response.json()[0]
+    await ac.post("/bet", json={"event_id": event["event_id"], "amount": 2})
+    await ac.post("/updated", json={"events": [event | {"state": 2}]})
+    await ac.post("/updated", json={"events": [event | {"state": 0}]})
+
+    response = await ac.get("/bets", params={"event_id": event["event_id"]})
+
+    assert [bet["state"] for bet in response.json()] == [2]
+    assert response.json()[0]["payout"] == str(
+        round(Decimal(event["coefficient"]) * 2, 2)
+    )
+
+    response = await ac.get(f"/events/{event['event_id']}/exposure")
+
+    assert response.json()["payout"] == str(round(Decimal(event["coefficient"]) * 2, 2))
+
+
+async def test_get_event_exposure(ac: AsyncClient):
+    async with AsyncClient() as session:
+        response = await session.post(f"{config.LINE_PROVIDER_URL}event/generate/1")
+
+    event = response.json()[0]
+    bets = [
+        {"event_id": event["event_id"], "amount": 1},
+        {"event_id": event["event_id"], "amount": 2},
+    ]
+    await ac.post("/bets/batch", json=bets)
+
+    response = await ac.get(f"/events/{event['event_id']}/exposure")
+
+    assert response.status_code == HTTPStatus.OK
+    potential_payout = str(round(Decimal(event["coefficient"]) * 3, 2))
+    assert response.json() == {
+        "event_id": event["event_id"],
+        "bets": 2,
+        "stake": "3.00",
+        "potential_payout": potential_payout,
+        "payout": "0.00",
+    }
+
+    await app.exposure.rebuild()
+
+    response = await ac.get(f"/events/{event['event_id']}/exposure")
+
+    assert response.json()["stake"] == "3.00"
+    assert response.json()["potential_payout"] == potential_payout
+
+    await ac.post("/updated", json={"events": [event | {"state": 2}]})
+
+    response = await ac.get(f"/events/{event['event_id']}/exposure")
+
+    assert response.json()["potential_payout"] == "0.00"
+    assert response.json()["payout"] == potential_payout
+
+
+async def test_get_exposure_stats(ac: AsyncClient):
+    response = await ac.get("/events/exposure")
+
+    assert response.status_code == HTTPStatus.OK
+    assert {"events", "reconciles", "mismatches"} <= response.json().keys()
+
+
+async def test_make_bet_queued(ac: AsyncClient):
+    async with AsyncClient() as session:
+        response = await session.post(f"{config.LINE_PROVIDER_URL}event/generate/1")
+
+    new_event_id = response.json()[0]["event_id"]
+    bet_writer = app.bet_writer
+    bet_writer.enabled = True
+    bet_writer.start()
+    try:
+        responses = await asyncio.gather(
+            *(
+                ac.post("/bet", json={"event_id": new_event_id, "amount": amount})
+                for amount in (1, 2, 3)
+            )
+        )
+    finally:
+        bet_writer.enabled = False
+        await bet_writer.stop()
+
+    assert [response.status_code for response in responses] == [HTTPStatus.OK] * 3
+    assert [response.json()["amount"] for response in responses] == [1, 2, 3]
+    assert len({response.json()["bet_id"] for response in responses}) == 3
+    assert (await ac.get("/bets/queue")).json()["written"] >= 3
+
+
+async def test_event_stream_skips_invalid_messages():
+    body = (
+        "id: e:1\nevent: put\ndata: {not json}\n\n"
+        'id: e:2\nevent: put\ndata: {"events": [{"event_id": 1}]}\n\n'
+        "id: e:3\nevent: archive\ndata: {}\n\n"
+    )
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(
+            HTTPStatus.OK, text=body, headers={"content-type": "text/event-stream"}
+        )
+    )
+    event_stream = stream.EventStream()
+
+    async with AsyncClient(transport=transport) as session:
+        await event_stream._listen(session)
+
+    assert event_stream.invalid == 2
+    assert event_stream.last_id == "e:3"
+
+
+async def test_event_stream_resync_refunds_deleted_events(ac: AsyncClient):
+    async with AsyncClient() as session:
+        response = await session.post(f"{config.LINE_PROVIDER_URL}event/generate/1")
+        event_id = response.json()[0]["event_id"]
+        await ac.post("/bet", json={"event_id": event_id, "amount": 1})
+        await session.delete(f"{config.LINE_PROVIDER_URL}event/delete/{event_id}")
+
+        await stream.EventStream()._resync(session)
+
+    response = await ac.get("/bets", params={"event_id": event_id})
+
+    assert [bet["state"] for bet in response.json()] == [0]
+    assert response.json()[0]["payout"] == "1.00"
+
+
+async def test_get_events_by_ids_in_batches(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        event_ids = [
+            int(event_id) for event_id in request.url.params.get_list("event_id")
+        ]
+        requests.append(event_ids)
+        return httpx.Response(
+            HTTPStatus.OK,
+            json=[
+                {"event_id": event_id, "state": 2}
+                for event_id in event_ids
+                if event_id != 3
+            ],
+        )
+
+    monkeypatch.setattr(config, "EVENT_BATCH_SIZE", 2)
+
+    async with AsyncClient(transport=httpx.MockTransport(handler)) as session:
+        events = await ext.get_events_by_ids_from_line_provider(
+            session, {5, 1, 3, 2, 4}
+        )
+
+    assert requests == [[1, 2], [3, 4], [5]]
+    assert [event.event_id for event in events] == [1, 2, 4, 5]
@@ -0,0 +1,436 @@
+"""Модуль метрик в текстовом формате Prometheus.
+
+Метрики хранятся в памяти процесса и отдаются эндпоинтом `/metrics`.
+Сервис работает в одном потоке событийного цикла, поэтому метрики
+обновляются без блокировок. Значения, которые уже хранятся в других
+объектах сервиса (размер хранилища событий, пул соединений с бд),
+не дублируются, а считываются функциями в момент запроса метрик.
+
+Модуль общий для обоих сервисов.
+"""
+
+import abc
+import bisect
+import contextlib
+import math
+import time
+from collections.abc import Callable, Iterator
+
+import httpx
+
+import profiling
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм задержек по умолчанию, сек
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def format_value(value: float) -> str:
+    """Форматирует значение метрики."""
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """Форматирует метки метрики.
+
+    Args:
+        names: Названия меток.
+        values: Значения меток.
+
+    Returns:
+        Метки в фигурных скобках или пустая строка, если меток нет.
+    """
+    if not names:
+        return ""
+    labels = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    )
+    return f"{{{labels}}}"
+
+
+class Registry:
+    """Набор метрик сервиса."""
+
+    def __init__(self):
+        """Инициализация."""
+        self.metrics: dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        """Регистрирует метрику.
+
+        Метрика с тем же названием заменяется: так модуль, импортированный
+        повторно под другим именем, не ломает набор метрик.
+
+        Args:
+            metric: Метрика.
+        """
+        self.metrics[metric.name] = metric
+
+    def render(self) -> bytes:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{labels} {format_value(value)}")
+        return ("\n".join(lines) + "\n").encode()
+
+
+registry = Registry()
+
+
+class Metric(abc.ABC):
+    """Метрика с набором значений по сочетаниям меток."""
+
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry = registry,
+    ):
+        """Инициализация.
+
+        Args:
+            name: Название метрики.
+            documentation: Описание метрики.
+            labelnames: Названия меток.
+            registry: Набор метрик, в котором регистрируется метрика.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+
+        registry.register(self)
+
+    @abc.abstractmethod
+    def _new_child(self) -> object:
+        """Создает значение метрики для нового сочетания меток."""
+
+    def labels(self, *values: str) -> object:
+        """Возвращает значение метрики для сочетания меток.
+
+        Args:
+            values: Значения меток в порядке их названий.
+
+        Raises:
+            ValueError: Если количество значений не совпадает с количеством меток.
+
+        Returns:
+            Значение метрики.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """Возвращает суффиксы, метки и значения всех рядов метрики."""
+        for values, child in self._children.items():
+            yield "", format_labels(self.labelnames, values), child.value
+
+
+class CounterValue:
+    """Значение счетчика."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        """Инициализация."""
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        """Увеличивает счетчик."""
+        self.value += amount
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик."""
+
+    type = "counter"
+
+    def _new_child(self) -> CounterValue:
+        """Создает значение счетчика."""
+        return CounterValue()
+
+
+class GaugeValue(CounterValue):
+    """Значение показателя."""
+
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        """Уменьшает показатель."""
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        """Устанавливает показатель."""
+        self.value = value
+
+
+class Gauge(Metric):
+    """Показатель, который может как расти, так и уменьшаться."""
+
+    type = "gauge"
+
+    def _new_child(self) -> GaugeValue:
+        """Создает значение показателя."""
+        return GaugeValue()
+
+
+class HistogramValue:
+    """Значение гистограммы."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        """Инициализация.
+
+        Args:
+            buckets: Верхние границы корзин.
+        """
+        self.buckets = buckets
+        # Последняя корзина — для значений больше всех границ
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Учитывает наблюдение."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        """Учитывает время выполнения блока, сек."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+
+class Histogram(Metric):
+    """Гистограмма распределения значений по корзинам."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry = registry,
+    ):
+        """Инициализация.
+
+        Args:
+            name: Название метрики.
+            documentation: Описание метрики.
+            labelnames: Названия меток.
+            buckets: Верхние границы корзин по возрастанию.
+            registry: Набор метрик, в котором регистрируется метрика.
+        """
+        self.buckets = tuple(sorted(map(float, buckets)))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> HistogramValue:
+        """Создает значение гистограммы."""
+        return HistogramValue(self.buckets)
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """Возвращает накопленные корзины, сумму и количество наблюдений."""
+        names = (*self.labelnames, "le")
+        for values, child in self._children.items():
+            total = 0
+            for bound, count in zip((*self.buckets, math.inf), child.counts):
+                total += count
+                yield "_bucket", format_labels(
+                    names, (*values, format_value(bound))
+                ), total
+            labels = format_labels(self.labelnames, values)
+            yield "_sum", labels, child.sum
+            yield "_count", labels, total
+
+
+class Callback(Metric):
+    """Метрика, значение которой считывается функцией при запросе метрик."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        function: Callable[[], float | None],
+        kind: str = "gauge",
+        registry: Registry = registry,
+    ):
+        """Инициализация.
+
+        Args:
+            name: Название метрики.
+            documentation: Описание метрики.
+            function: Функция, возвращающая значение; None — значения нет.
+            kind: Тип метрики: "gauge" или "counter".
+            registry: Набор метрик, в котором регистрируется метрика.
+        """
+        self.function = function
+        self.type = kind
+        super().__init__(name, documentation, (), registry)
+
+    def _new_child(self) -> object:
+        """Не используется: значение не хранится, а считывается функцией."""
+        raise TypeError(f"{self.name} has no stored values")
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """Возвращает текущее значение."""
+        value = self.function()
+        if value is not None:
+            yield "", "", value
+
+
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+).labels()
+
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+
+http_client_request_duration_seconds = Histogram(
+    "http_client_request_duration_seconds",
+    "Latency of outbound HTTP requests until response headers",
+    ("peer", "method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware, измеряющее задержку и количество текущих запросов.
+
+    Задержка учитывается по шаблону пути маршрута, а не по фактическому
+    пути, чтобы количество рядов метрики не зависело от ID в запросах.
+    """
+
+    def __init__(self, app: Callable):
+        """Инициализация.
+
+        Args:
+            app: Оборачиваемое ASGI-приложение.
+        """
+        self.app = app
+        self._routes: dict[Callable, str] = {}
+
+    def _route(self, scope: dict) -> str:
+        """Возвращает шаблон пути маршрута, обработавшего запрос."""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+
+        route = self._routes.get(endpoint)
+        if route is None:
+            self._routes = {
+                getattr(item, "endpoint", None): item.path
+                for item in scope["app"].routes
+            }
+            route = self._routes.get(endpoint, "unmatched")
+        return route
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """Обрабатывает запрос."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_duration_seconds.labels(
+                scope["method"], self._route(scope), str(status)
+            ).observe(time.perf_counter() - started_at)
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Транспорт httpx, измеряющий задержку запросов к другому сервису.
+
+    Путь запроса может содержать ID и не годится в метку, поэтому маршрут
+    передается вызывающим кодом в расширении запроса `route`, например
+    `extensions={"route": "/event/{event_id}"}`; без него запрос учитывается
+    как "unmatched".
+    """
+
+    def __init__(self, peer: str, transport: httpx.AsyncBaseTransport | None = None):
+        """Инициализация.
+
+        Args:
+            peer: Название сервиса, к которому отправляются запросы.
+            transport: Оборачиваемый транспорт.
+        """
+        self.peer = peer
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Отправляет запрос."""
+        status = "error"
+        started_at = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            elapsed = time.perf_counter() - started_at
+            http_client_request_duration_seconds.labels(
+                self.peer,
+                request.method,
+                request.extensions.get("route", "unmatched"),
+                status,
+            ).observe(elapsed)
+            profiling.record("http", elapsed)
+
+    async def aclose(self) -> None:
+        """Закрывает оборачиваемый транспорт."""
+        await self.transport.aclose()
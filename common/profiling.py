@@ -0,0 +1,269 @@
+"""Модуль профилирования запросов.
+
+Включаемое middleware измеряет, на что уходит время запроса: запросы к бд,
+запросы к другому сервису и собственный код обработчика. Медленные запросы
+с такой разбивкой попадают в кольцевой буфер, который отдается отладочным
+эндпоинтом. Часть запросов (случайная выборка или запросы с привилегированным
+заголовком) дополнительно профилируется `cProfile`, а профили пишутся на
+диск для разбора `pstats` или snakeviz.
+
+Модуль общий для обоих сервисов; настройки берутся из модуля `config`
+сервиса.
+"""
+
+import collections
+import contextlib
+import contextvars
+import cProfile
+import hmac
+import itertools
+import random
+import re
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import config
+
+
+# Виды времени, которые учитываются отдельно от кода обработчика
+SPAN_KINDS = ("sql", "http")
+
+
+class RequestProfile:
+    """Разбивка времени одного запроса."""
+
+    __slots__ = (
+        "method",
+        "path",
+        "status",
+        "streaming",
+        "started_at",
+        "duration",
+        "spans",
+        "file",
+    )
+
+    def __init__(self, method: str, path: str):
+        """Инициализация.
+
+        Args:
+            method: HTTP-метод запроса.
+            path: Путь запроса.
+        """
+        self.method = method
+        self.path = path
+        self.status = 500
+        # Потоки Server-Sent Events длятся, пока подключен клиент, и в буфер
+        # медленных запросов не попадают
+        self.streaming = False
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.spans = dict.fromkeys(SPAN_KINDS, 0.0)
+        # Файл профиля `cProfile`, если запрос профилировался
+        self.file: str | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Возвращает разбивку времени запроса, сек."""
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            **self.spans,
+            "handler": max(self.duration - sum(self.spans.values()), 0.0),
+            "profile": self.file,
+        }
+
+
+current_profile: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def record(kind: str, seconds: float) -> None:
+    """Учитывает время в разбивке текущего запроса.
+
+    Вне профилируемого запроса ничего не делает. Время конкурентных задач
+    одного запроса складывается, поэтому сумма может превышать длительность
+    запроса.
+
+    Args:
+        kind: Вид времени из `SPAN_KINDS`.
+        seconds: Время, сек.
+    """
+    profile = current_profile.get()
+    if profile is not None:
+        profile.spans[kind] += seconds
+
+
+@contextlib.contextmanager
+def span(kind: str) -> Iterator[None]:
+    """Учитывает время выполнения блока в разбивке текущего запроса.
+
+    Args:
+        kind: Вид времени из `SPAN_KINDS`.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, time.perf_counter() - started_at)
+
+
+class SlowRequests:
+    """Кольцевой буфер медленных и профилированных запросов."""
+
+    def __init__(
+        self,
+        threshold: float = config.PROFILING_SLOW_THRESHOLD,
+        size: int = config.PROFILING_SLOW_SIZE,
+    ):
+        """Инициализация.
+
+        Args:
+            threshold: Длительность, начиная с которой запрос попадает
+                в буфер, сек.
+            size: Размер буфера.
+        """
+        self.threshold = threshold
+        self.requests: collections.deque[RequestProfile] = collections.deque(
+            maxlen=size
+        )
+        self.profiled = 0
+
+    def add(self, profile: RequestProfile) -> None:
+        """Учитывает завершенный запрос.
+
+        Args:
+            profile: Разбивка времени запроса.
+        """
+        if profile.file is not None:
+            self.profiled += 1
+        if profile.file is not None or (
+            profile.duration >= self.threshold and not profile.streaming
+        ):
+            self.requests.append(profile)
+
+    def stats(self) -> dict[str, Any]:
+        """Возвращает запросы буфера, самые долгие первыми."""
+        return {
+            "slow_threshold": self.threshold,
+            "profiled": self.profiled,
+            "requests": [
+                profile.to_dict()
+                for profile in sorted(
+                    self.requests, key=lambda item: item.duration, reverse=True
+                )
+            ],
+        }
+
+
+slow_requests = SlowRequests()
+
+
+class ProfilingMiddleware:
+    """ASGI-middleware профилирования запросов.
+
+    Разбивка времени собирается для каждого запроса, а в буфер попадают
+    только медленные и профилированные запросы. `cProfile` профилирует весь
+    поток, поэтому в профиль запроса попадает и код конкурентных запросов;
+    одновременно профилируется не больше одного запроса.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        sample_rate: float = config.PROFILING_SAMPLE_RATE,
+        header: str = config.PROFILING_HEADER,
+        token: str = config.PROFILING_TOKEN,
+        directory: str = config.PROFILING_DIR,
+        buffer: SlowRequests = slow_requests,
+    ):
+        """Инициализация.
+
+        Args:
+            app: Оборачиваемое ASGI-приложение.
+            sample_rate: Доля запросов, профилируемых `cProfile`.
+            header: Заголовок, запрашивающий профилирование запроса.
+            token: Значение заголовка, при котором запрос профилируется;
+                пусто — заголовок не учитывается.
+            directory: Каталог для файлов профилей.
+            buffer: Буфер медленных запросов.
+        """
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.token = token.encode()
+        self.directory = Path(directory)
+        self.buffer = buffer
+
+        self._profiling = False
+        self._counter = itertools.count()
+
+    def _should_profile(self, scope: dict) -> bool:
+        """Проверяет, нужно ли профилировать запрос `cProfile`."""
+        if self._profiling:
+            return False
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == self.header and hmac.compare_digest(value, self.token):
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _dump(self, profiler: cProfile.Profile, profile: RequestProfile) -> None:
+        """Сохраняет профиль запроса на диск.
+
+        Args:
+            profiler: Профилировщик.
+            profile: Разбивка времени запроса.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9]+", "_", profile.path).strip("_") or "index"
+        path = self.directory / (
+            f"{int(profile.started_at)}-{next(self._counter)}-"
+            f"{profile.method}-{name}.prof"
+        )
+        profiler.dump_stats(path)
+        profile.file = str(path)
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """Обрабатывает запрос."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_wrapper(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                profile.streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            await send(message)
+
+        profiler = None
+        if self._should_profile(scope):
+            self._profiling = True
+            profiler = cProfile.Profile()
+
+        token = current_profile.set(profile)
+        started_at = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+            profile.duration = time.perf_counter() - started_at
+            current_profile.reset(token)
+
+            if profiler is not None:
+                self._dump(profiler, profile)
+            self.buffer.add(profile)
@@ -0,0 +1,114 @@
+"""Бенчмарк массовой генерации событий.
+
+Сравнивает прежнюю генерацию (`SystemRandom`, `Decimal` и валидируемая
+модель на каждое событие) с генерацией пачкой через NumPy и через модуль
+`random` в каждом из способов хранения событий. Хранилище измеряется
+с подписчиками сервиса (журнал изменений и кэш закодированных событий),
+как при вызове `/event/generate`.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_event_generator.py --size 1000000
+"""
+
+import argparse
+import decimal
+import random
+import time
+
+import changes
+import events
+import generator
+import schemas
+import serialization
+
+
+def generate_legacy(store: events.BaseEventStore, number: int) -> None:
+    """Генерирует события прежним способом.
+
+    Args:
+        store: Хранилище событий.
+        number: Количество событий.
+    """
+    secure_random = random.SystemRandom()
+    generated_events = []
+    for event_id in store.next_ids(number):
+        timestamp = time.time()
+        generated_events.append(
+            schemas.Event(
+                event_id=event_id,
+                coefficient=round(
+                    decimal.Decimal(secure_random.uniform(0.01, 10.0)), 2
+                ),
+                deadline=int(secure_random.uniform(timestamp + 30, timestamp + 600)),
+                state=schemas.EventState.NEW,
+            )
+        )
+    store.add_many(generated_events)
+
+
+def make_store(backend: str) -> events.BaseEventStore:
+    """Создает хранилище с подписчиками сервиса.
+
+    Args:
+        backend: Способ хранения событий.
+
+    Returns:
+        Хранилище событий.
+    """
+    store = events.STORE_BACKENDS[backend]()
+    changes.ChangeLog(store)
+    serialization.EncodedEvents(store)
+    return store
+
+
+def measure(backend: str, mode: str, number: int) -> float:
+    """Измеряет время генерации событий.
+
+    Args:
+        backend: Способ хранения событий.
+        mode: Способ генерации: "legacy", "numpy" или "random".
+        number: Количество событий.
+
+    Returns:
+        Время в секундах.
+    """
+    store = make_store(backend)
+    numpy = generator.numpy
+    if mode == "random":
+        generator.numpy = None
+
+    started_at = time.perf_counter()
+    try:
+        if mode == "legacy":
+            generate_legacy(store, number)
+        else:
+            generator.generate(number, seed=0, store=store)
+    finally:
+        generator.numpy = numpy
+
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10**6)
+    parser.add_argument("--legacy-size", type=int, default=10**5)
+    args = parser.parse_args()
+
+    modes = ["legacy", "random"] + (["numpy"] if generator.numpy is not None else [])
+
+    print(f"{'backend':<10} {'mode':<8} {'events':>10} {'time, s':>10} {'per s':>12}")
+    for backend in sorted(events.STORE_BACKENDS):
+        for mode in modes:
+            number = args.legacy_size if mode == "legacy" else args.size
+            elapsed = measure(backend, mode, number)
+            print(
+                f"{backend:<10} {mode:<8} {number:>10} "
+                f"{elapsed:>10.3f} {number / elapsed:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Бенчмарк выдачи ID событий при массовой генерации.
+
+Сравнивает прежний способ (`max(events) + i` на каждое событие) с выдачей ID
+из последовательности хранилища. Прежний способ на больших объемах
+не укладывается в разумное время, поэтому он измеряется на ограниченном
+количестве итераций и экстраполируется.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_event_ids.py
+"""
+
+import argparse
+import time
+
+import events
+import generator
+
+
+def bench_legacy(store_size: int, number: int, max_iterations: int) -> float:
+    """Измеряет прежнюю выдачу ID.
+
+    Args:
+        store_size: Количество событий в хранилище.
+        number: Количество генерируемых событий.
+        max_iterations: Максимальное количество реально выполняемых итераций.
+
+    Returns:
+        Время (возможно, экстраполированное) в секундах.
+    """
+    store = dict.fromkeys(range(1, store_size + 1))
+    iterations = min(number, max_iterations)
+
+    started_at = time.perf_counter()
+    for i in range(1, iterations + 1):
+        max(store or [0]) + i
+    elapsed = time.perf_counter() - started_at
+
+    return elapsed * number / iterations
+
+
+def bench_sequence(store_size: int, number: int) -> float:
+    """Измеряет выдачу ID из последовательности хранилища.
+
+    Args:
+        store_size: Количество событий в хранилище.
+        number: Количество генерируемых событий.
+
+    Returns:
+        Время в секундах.
+    """
+    store = events.DictEventStore()
+    store.next_ids(store_size)
+
+    started_at = time.perf_counter()
+    for _ in store.next_ids(number):
+        pass
+    return time.perf_counter() - started_at
+
+
+def bench_generate(number: int) -> float:
+    """Измеряет полную генерацию событий поверх заполненного хранилища.
+
+    Args:
+        number: Количество событий в хранилище и генерируемых событий.
+
+    Returns:
+        Время генерации второй пачки в секундах.
+    """
+    events.events.clear()
+    generator.generate(number)
+
+    started_at = time.perf_counter()
+    generator.generate(number)
+    return time.perf_counter() - started_at
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6])
+    parser.add_argument("--legacy-iterations", type=int, default=200)
+    parser.add_argument("--skip-generate", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'events':>10} {'legacy, s':>14} {'sequence, s':>14} {'generate, s':>14}")
+    for size in args.sizes:
+        legacy = bench_legacy(size, size, args.legacy_iterations)
+        sequence = bench_sequence(size, size)
+        generate = float("nan") if args.skip_generate else bench_generate(size)
+        print(f"{size:>10} {legacy:>14.3f} {sequence:>14.6f} {generate:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Бенчмарк выдачи списков событий с кэшем закодированных событий и без него.
+
+Заполняет хранилище событиями и измеряет время ответа `/event/all`
+и `/event/new` в JSON и MessagePack: через модели ответа (кэш выключен),
+с пустым кэшем (первый запрос) и с заполненным кэшем.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_event_listing.py --size 1000000
+"""
+
+import argparse
+import asyncio
+import decimal
+import random
+import statistics
+import time
+
+import httpx
+
+import app
+import events
+import schemas
+import serialization
+
+
+FORMATS = {"json": serialization.JSON, "msgpack": serialization.MSGPACK}
+
+
+def fill(size: int, seed: int = 0) -> None:
+    """Заполняет хранилище событиями.
+
+    Args:
+        size: Количество событий.
+        seed: Зерно генератора случайных чисел.
+    """
+    rnd = random.Random(seed)
+    now = int(time.time())
+
+    # Половина событий уже закрыта для ставок
+    events.events.add_many(
+        schemas.Event.model_construct(
+            event_id=event_id,
+            coefficient=decimal.Decimal(rnd.randint(1, 1000)).scaleb(-2),
+            deadline=now + rnd.randint(-600, 600),
+            state=schemas.EventState.NEW,
+        )
+        for event_id in events.events.next_ids(size)
+    )
+
+
+async def request(client: httpx.AsyncClient, path: str, media_type: str) -> float:
+    """Измеряет время ответа эндпоинта.
+
+    Args:
+        client: Клиент приложения.
+        path: Путь эндпоинта.
+        media_type: MIME-тип ответа.
+
+    Returns:
+        Время ответа в секундах.
+    """
+    started_at = time.perf_counter()
+    response = await client.get(path, headers={"Accept": media_type})
+    response.raise_for_status()
+    return time.perf_counter() - started_at
+
+
+async def measure(path: str, media_type: str, repeat: int) -> dict[str, float]:
+    """Измеряет время ответа в каждом из режимов.
+
+    Args:
+        path: Путь эндпоинта.
+        media_type: MIME-тип ответа.
+        repeat: Количество повторов.
+
+    Returns:
+        Медианное время ответа по режимам в секундах.
+    """
+    cache = serialization.encoded_events
+    async with httpx.AsyncClient(app=app.app, base_url="http://test") as client:
+        cache.enabled = False
+        models = [await request(client, path, media_type) for _ in range(repeat)]
+
+        cache.enabled = True
+        cache.clear()
+        cold = await request(client, path, media_type)
+        warm = [await request(client, path, media_type) for _ in range(repeat)]
+
+    return {
+        "models": statistics.median(models),
+        "cold": cold,
+        "warm": statistics.median(warm),
+    }
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10**6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fill(args.size)
+
+    print(f"events: {args.size}, backend: {type(events.events).__name__}")
+    print(
+        f"{'endpoint':<12} {'format':<8} {'models, s':>10} "
+        f"{'cold, s':>10} {'warm, s':>10}"
+    )
+    for path in ("/event/all", "/event/new"):
+        for name, media_type in FORMATS.items():
+            result = asyncio.run(measure(path, media_type, args.repeat))
+            print(
+                f"{path:<12} {name:<8} {result['models']:>10.3f} "
+                f"{result['cold']:>10.3f} {result['warm']:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Бенчмарк восстановления событий из снимка и журнала.
+
+Заполняет хранилище, сохраняет снимок, дописывает в журнал заданное
+количество изменений и измеряет время восстановления в новое хранилище
+для каждого способа хранения.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_event_storage.py --size 2000000
+"""
+
+import argparse
+import decimal
+import random
+import tempfile
+import time
+
+import events
+import schemas
+import storage
+
+
+def fill(store: events.BaseEventStore, size: int, seed: int = 0) -> None:
+    """Заполняет хранилище событиями.
+
+    Args:
+        store: Хранилище событий.
+        size: Количество событий.
+        seed: Зерно генератора случайных чисел.
+    """
+    rnd = random.Random(seed)
+    now = int(time.time())
+
+    store.add_many(
+        schemas.Event.model_construct(
+            event_id=event_id,
+            coefficient=decimal.Decimal(rnd.randint(1, 1000)).scaleb(-2),
+            deadline=now + rnd.randint(30, 600),
+            state=schemas.EventState.NEW,
+        )
+        for event_id in store.next_ids(size)
+    )
+
+
+def bench_backend(backend: str, size: int, tail: int) -> tuple[float, float]:
+    """Измеряет сохранение снимка и восстановление для способа хранения.
+
+    Args:
+        backend: Способ хранения.
+        size: Количество событий в снимке.
+        tail: Количество изменений в хвосте журнала.
+
+    Returns:
+        Время сохранения снимка и время восстановления в секундах.
+    """
+    store_cls = events.STORE_BACKENDS[backend]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = store_cls()
+        journal = storage.EventJournal(directory, fsync="never")
+        journal.open(store)
+        fill(store, size)
+
+        started_at = time.perf_counter()
+        journal.snapshot()
+        snapshot_time = time.perf_counter() - started_at
+
+        for event_id in range(1, tail + 1):
+            store.update(event_id, {"state": schemas.EventState.FINISHED_WIN})
+
+        restored = store_cls()
+        started_at = time.perf_counter()
+        storage.EventJournal(directory).open(restored)
+        restore_time = time.perf_counter() - started_at
+
+        assert len(restored) == len(store)
+
+    return snapshot_time, restore_time
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2 * 10**6)
+    parser.add_argument("--tail", type=int, default=10**4)
+    args = parser.parse_args()
+
+    print(f"events: {args.size}, journal tail: {args.tail}")
+    print(f"{'backend':<10} {'snapshot, s':>12} {'restore, s':>12}")
+    for backend in events.STORE_BACKENDS:
+        snapshot_time, restore_time = bench_backend(backend, args.size, args.tail)
+        print(f"{backend:<10} {snapshot_time:>12.3f} {restore_time:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Бенчмарк способов хранения событий.
+
+Для каждого способа хранения (`EVENT_STORE_BACKEND`) в отдельном процессе
+заполняет хранилище событиями и измеряет занимаемую им память, а также
+время ответа `/event/all` и `/event/new`.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_event_store.py --size 1000000
+"""
+
+import argparse
+import asyncio
+import decimal
+import gc
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import httpx
+
+import app
+import events
+import schemas
+
+
+BACKENDS = ("dict", "columnar")
+
+
+def fill(size: int, seed: int = 0) -> int:
+    """Заполняет хранилище событиями.
+
+    Args:
+        size: Количество событий.
+        seed: Зерно генератора случайных чисел.
+
+    Returns:
+        Объем памяти, занятой хранилищем, в байтах.
+    """
+    rnd = random.Random(seed)
+    now = int(time.time())
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    # Половина событий уже закрыта для ставок
+    events.events.add_many(
+        schemas.Event.model_construct(
+            event_id=event_id,
+            coefficient=decimal.Decimal(rnd.randint(1, 1000)).scaleb(-2),
+            deadline=now + rnd.randint(-600, 600),
+            state=schemas.EventState.NEW,
+        )
+        for event_id in events.events.next_ids(size)
+    )
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return used
+
+
+async def measure_latency(path: str, repeat: int) -> float:
+    """Измеряет медианное время ответа эндпоинта.
+
+    Args:
+        path: Путь эндпоинта.
+        repeat: Количество повторов.
+
+    Returns:
+        Медианное время ответа в секундах.
+    """
+    samples = []
+    async with httpx.AsyncClient(app=app.app, base_url="http://test") as client:
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            samples.append(time.perf_counter() - started_at)
+
+    return statistics.median(samples)
+
+
+def run_backend(size: int, repeat: int) -> dict[str, float]:
+    """Измеряет текущий способ хранения.
+
+    Args:
+        size: Количество событий.
+        repeat: Количество повторов запросов.
+
+    Returns:
+        Результаты измерений.
+    """
+    memory = fill(size)
+    return {
+        "memory_mb": memory / 2**20,
+        "all_s": asyncio.run(measure_latency("/event/all", repeat)),
+        "new_s": asyncio.run(measure_latency("/event/new", repeat)),
+    }
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10**6)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=BACKENDS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.size, args.repeat)))
+        return
+
+    print(f"events: {args.size}")
+    print(f"{'backend':<10} {'memory, MB':>12} {'/all, s':>10} {'/new, s':>10}")
+    for backend in BACKENDS:
+        output = subprocess.run(
+            [sys.executable, __file__, f"--size={args.size}", f"--repeat={args.repeat}"]
+            + [f"--backend={backend}"],
+            env=os.environ | {"EVENT_STORE_BACKEND": backend},
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(
+            f"{backend:<10} {result['memory_mb']:>12.1f} "
+            f"{result['all_s']:>10.3f} {result['new_s']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
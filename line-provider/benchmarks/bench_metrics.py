@@ -0,0 +1,151 @@
+"""Бенчмарк накладных расходов метрик на обработку запросов.
+
+Измеряет стоимость наблюдения в гистограмме, накладные расходы
+`MetricsMiddleware` на пустом ASGI-приложении и время запросов к API
+сервиса с middleware и без него.
+
+Запуск из каталога сервиса:
+
+    PYTHONPATH=src:../common python benchmarks/bench_metrics.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import generator
+import metrics
+from router import router
+
+
+def bench_observe(number: int) -> float:
+    """Измеряет наблюдение в гистограмме с метками, нс на операцию."""
+    registry = metrics.Registry()
+    histogram = metrics.Histogram(
+        "bench_seconds", "Benchmark", ("method", "route", "status"), registry=registry
+    )
+
+    started_at = time.perf_counter()
+    for i in range(number):
+        histogram.labels("GET", "/event/new", "200").observe(i * 1e-6)
+    return (time.perf_counter() - started_at) / number * 1e9
+
+
+async def bench_middleware(number: int) -> tuple[float, float]:
+    """Измеряет обработку запроса пустым ASGI-приложением, мкс на запрос.
+
+    Returns:
+        Время без middleware и с ним.
+    """
+    app = FastAPI()
+
+    async def endpoint(scope: dict, receive, send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: dict) -> None:
+        pass
+
+    scope = {"type": "http", "method": "GET", "app": app, "endpoint": None}
+    results = []
+    for handler in (endpoint, metrics.MetricsMiddleware(endpoint)):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            await handler(dict(scope), receive, send)
+        results.append((time.perf_counter() - started_at) / number * 1e6)
+    return results[0], results[1]
+
+
+def make_app(with_metrics: bool) -> FastAPI:
+    """Создает приложение с роутером событий.
+
+    Args:
+        with_metrics: Подключать ли `MetricsMiddleware`.
+
+    Returns:
+        Приложение.
+    """
+    app = FastAPI()
+    app.include_router(router)
+    if with_metrics:
+        app.add_middleware(metrics.MetricsMiddleware)
+    return app
+
+
+async def bench_api(apps: dict[str, FastAPI], path: str, number: int) -> dict:
+    """Измеряет медианное время запроса к API каждого из приложений, мкс.
+
+    Запросы к приложениям чередуются, чтобы колебания нагрузки на машине
+    одинаково сказывались на всех.
+
+    Args:
+        apps: Приложения по названиям.
+        path: Путь запроса.
+        number: Количество запросов к каждому приложению.
+
+    Returns:
+        Медианное время запроса по приложениям.
+    """
+    samples: dict[str, list[float]] = {name: [] for name in apps}
+    async with contextlib.AsyncExitStack() as stack:
+        clients = {
+            name: await stack.enter_async_context(
+                httpx.AsyncClient(app=app, base_url="http://test")
+            )
+            for name, app in apps.items()
+        }
+        for _ in range(number):
+            for name, client in clients.items():
+                started_at = time.perf_counter()
+                response = await client.get(path)
+                samples[name].append(time.perf_counter() - started_at)
+                response.raise_for_status()
+
+    return {name: statistics.median(times) * 1e6 for name, times in samples.items()}
+
+
+async def run(number: int) -> None:
+    """Выполняет измерения.
+
+    Args:
+        number: Количество запросов.
+    """
+    print(f"histogram observe: {bench_observe(number * 100):.0f} ns")
+
+    plain, instrumented = await bench_middleware(number * 10)
+    print(
+        f"empty ASGI app: {plain:.2f} us, with middleware: {instrumented:.2f} us "
+        f"(+{instrumented - plain:.2f} us)"
+    )
+
+    event_id = generator.generate(1000, seed=0)[0]
+    apps = {"plain": make_app(False), "metrics": make_app(True)}
+    print(f"{'path':<24} {'plain, us':>10} {'metrics, us':>12} {'overhead':>9}")
+    for path in (f"/event/{event_id}", "/event/new?limit=100"):
+        times = await bench_api(apps, path, number)
+        plain, instrumented = times["plain"], times["metrics"]
+        print(
+            f"{path:<24} {plain:>10.1f} {instrumented:>12.1f} "
+            f"{(instrumented - plain) / plain * 100:>+8.1f}%"
+        )
+
+
+def main() -> None:
+    """Точка входа."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
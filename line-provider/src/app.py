@@ -1,14 +1,140 @@
 """Основной модуль."""
 
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+from typing import Any
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
 
+import config
+import metrics
+import profiling
+from archive import sweeper
+from changes import change_log
+from events import events
+from outbox import outbox
 from router import router
+from serialization import encoded_events
+from storage import journal
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Обработчик событий запуска и остановки приложения."""
+    # Журнал пишется одним процессом, а таблицу в разделяемой памяти меняют все
+    if config.EVENT_STORAGE_DIR and config.EVENT_STORE_BACKEND == "shared":
+        raise RuntimeError(
+            "EVENT_STORAGE_DIR is not supported with the shared event store"
+        )
+
+    # Архив хранится в памяти процесса и был бы виден только одному из них
+    if config.EVENT_ARCHIVE_ENABLED and config.EVENT_STORE_BACKEND == "shared":
+        raise RuntimeError(
+            "EVENT_ARCHIVE_ENABLED is not supported with the shared event store"
+        )
+
+    # ID не переиспользуются, поэтому в исчерпанную таблицу больше нельзя
+    # добавить события
+    if config.EVENT_STORE_BACKEND == "shared" and not events.free_ids:
+        raise RuntimeError(
+            f"Shared event table {config.EVENT_SHM_PATH} has used all "
+            f"{events.table.capacity} event IDs; remove it to start a new table"
+        )
+
+    # Восстанавливаем события из снимка и журнала
+    if config.EVENT_STORAGE_DIR:
+        journal.open(events)
+        journal.start()
+
+    # Запускаем проверку изменений, сделанных другими рабочими процессами
+    if config.EVENT_STORE_BACKEND == "shared":
+        events.start()
+
+    # Запускаем перенос завершенных и просроченных событий в архив; журнал
+    # считает перенесенные события удаленными, поэтому архив хранится рядом
+    if config.EVENT_ARCHIVE_ENABLED:
+        if config.EVENT_STORAGE_DIR:
+            sweeper.archive.open(config.EVENT_STORAGE_DIR)
+        sweeper.start()
 
+    # Запускаем доставку уведомлений сервису `bet-maker`
+    outbox.start()
 
-app = FastAPI(title="line-provider")
+    yield
+
+    # Останавливаем перенос в архив до остановки журнала
+    await sweeper.stop()
+    sweeper.archive.close()
+
+    # Досылаем накопленные уведомления и закрываем клиентскую сессию
+    await outbox.stop()
+
+    if config.EVENT_STORE_BACKEND == "shared":
+        await events.stop()
+
+    if config.EVENT_STORAGE_DIR:
+        await journal.stop()
+
+
+app = FastAPI(title="line-provider", lifespan=lifespan)
 app.include_router(router)
 
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if config.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+metrics.Callback("events_stored", "Events in the store", lambda: len(events))
+metrics.Callback("events_store_version", "Event store version", lambda: events.version)
+metrics.Callback(
+    "events_change_log_size", "Events in the change log", lambda: change_log.size
+)
+metrics.Callback(
+    "events_encoded_cached",
+    "Pre-encoded events in the bytes cache, all formats",
+    lambda: sum(encoded_events.stats().values()),
+)
+metrics.Callback(
+    "events_archived", "Events moved to the archive", lambda: len(sweeper.archive)
+)
+metrics.Callback(
+    "events_archive_sweeps_total",
+    "Archive sweeps run",
+    lambda: sweeper.sweeps,
+    kind="counter",
+)
+metrics.Callback(
+    "outbox_queue_depth",
+    "Event updates waiting to be sent to bet-maker",
+    lambda: len(outbox.pending),
+)
+metrics.Callback(
+    "outbox_sent_events_total",
+    "Event updates delivered to bet-maker",
+    lambda: outbox.sent_events,
+    kind="counter",
+)
+metrics.Callback(
+    "outbox_failed_batches_total",
+    "Update batches that failed to be delivered",
+    lambda: outbox.failed_batches,
+    kind="counter",
+)
+metrics.Callback(
+    "outbox_dropped_events_total",
+    "Event updates dropped after all delivery attempts",
+    lambda: outbox.dropped_events,
+    kind="counter",
+)
+metrics.Callback(
+    "outbox_delivery_latency_max_seconds",
+    "Maximum time from enqueueing an update to its delivery",
+    lambda: outbox.max_latency,
+)
+
 
 @app.get("/")
 async def index() -> dict[str, str]:
@@ -16,5 +142,51 @@ async def index() -> dict[str, str]:
     return {"message": "This is index page!"}
 
 
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    """Возвращает метрики сервиса в текстовом формате Prometheus."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/events/shared")
+async def get_shared_store_stats() -> dict[str, int]:
+    """Возвращает статистику хранилища событий в разделяемой памяти.
+
+    Raises:
+        HTTPException: Если используется другое хранилище.
+    """
+    if config.EVENT_STORE_BACKEND != "shared":
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="Shared event store is disabled"
+        )
+    return events.stats()
+
+
+@app.get("/archive")
+async def get_archive_stats() -> dict[str, int | float | None]:
+    """Возвращает статистику переноса событий в архив."""
+    return sweeper.stats()
+
+
+@app.get("/debug/requests")
+async def get_slow_requests() -> dict[str, Any]:
+    """Возвращает медленные запросы с разбивкой времени по видам работы.
+
+    Raises:
+        HTTPException: Если профилирование выключено.
+    """
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="Profiling is disabled"
+        )
+    return profiling.slow_requests.stats()
+
+
+@app.get("/outbox")
+async def get_outbox_stats() -> dict[str, int | float | None]:
+    """Возвращает статистику доставки уведомлений сервису `bet-maker`."""
+    return outbox.stats()
+
+
 if __name__ == "__main__":
     uvicorn.run(app)
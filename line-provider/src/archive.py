@@ -0,0 +1,338 @@
+"""Модуль архивации завершенных и просроченных событий.
+
+Завершенные события и события, дедлайн которых давно прошел, больше не
+нужны в списках событий, но остаются в хранилище и увеличивают затраты
+памяти и время полных проходов по нему. Фоновая задача переносит такие
+события из хранилища в компактный архив, из которого их по-прежнему можно
+получить по ID.
+"""
+
+import array
+import asyncio
+import contextlib
+import itertools
+import os
+import struct
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+import config
+import events
+import schemas
+
+
+# Запись файла архива: ID, коэффициент в сотых, дедлайн, статус
+RECORD = struct.Struct("<qqqb")
+
+
+class EventArchive(events.EventTable):
+    """Архив событий в колоночном представлении.
+
+    Строки хранятся так же, как в `events.ColumnarEventStore`, но без индекса
+    по дедлайну: колонки занимают 25 байт на событие, а массив номеров строк —
+    8 байт на каждый ID между наименьшим и наибольшим ID архива.
+
+    Журнал хранилища записывает перенос в архив как удаление, поэтому архив,
+    открытый в каталоге, дописывает перенесенные события в свой файл
+    `archive.log` до того, как они убираются из хранилища, и
+    восстанавливается из него при запуске. Если событие записано в архив
+    несколько раз, действует последняя запись.
+    """
+
+    def __init__(self):
+        """Инициализация."""
+        super().__init__()
+        self._file = None
+
+    def open(self, directory: str | os.PathLike) -> None:
+        """Загружает архив из каталога и начинает дописывать его.
+
+        Недописанная последняя запись отбрасывается.
+
+        Args:
+            directory: Каталог архива.
+        """
+        path = Path(directory) / "archive.log"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+        with open(path, "r+b") as file:
+            data = file.read()
+            valid_size = len(data) - len(data) % RECORD.size
+            if valid_size != len(data):
+                file.truncate(valid_size)
+
+        rows = {
+            row[0]: row for row in RECORD.iter_unpack(memoryview(data)[:valid_size])
+        }.values()
+        if rows:
+            self.extend(
+                events.EventColumns(
+                    *(
+                        array.array(column.typecode, values)
+                        for column, values in zip(self.columns, zip(*rows))
+                    )
+                )
+            )
+
+        self._file = open(path, "ab")
+
+    def close(self) -> None:
+        """Прекращает дописывать архив в файл."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def add(self, archived_events: Sequence[schemas.Event]) -> None:
+        """Добавляет события в архив.
+
+        События, которые уже есть в архиве, заменяются.
+
+        Args:
+            archived_events: Объекты событий.
+        """
+        if not archived_events:
+            return
+
+        for event in archived_events:
+            if event.event_id in self:
+                self.remove(event.event_id)
+        self.append(archived_events)
+
+        # Проходы редкие и пачками, поэтому каждая пачка сразу сбрасывается
+        # на диск: только после этого события удаляются из журнала хранилища
+        if self._file is not None:
+            rows = len(self) - len(archived_events)
+            self._file.write(
+                b"".join(
+                    RECORD.pack(*(column[row] for column in self.columns))
+                    for row in range(rows, len(self))
+                )
+            )
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def clear(self) -> None:
+        """Очищает архив."""
+        super().clear()
+        if self._file is not None:
+            self._file.truncate(0)
+
+
+class EventSweeper:
+    """Фоновый перенос событий из хранилища в архив.
+
+    Завершенное событие переносится через `retention` секунд после
+    завершения. Моменты завершения отслеживаются подписчиком хранилища
+    в колесе таймеров с шагом в секунду, поэтому проход стоит
+    пропорционально количеству наступивших сроков, а не размеру
+    хранилища. Незавершенные события переносятся через
+    `unsettled_retention` секунд после дедлайна: они находятся по префиксу
+    индекса хранилища по дедлайну, который уже упорядочен нужным образом.
+    """
+
+    def __init__(
+        self,
+        store: events.BaseEventStore,
+        archive: EventArchive,
+        retention: int = config.EVENT_ARCHIVE_RETENTION,
+        unsettled_retention: int = config.EVENT_ARCHIVE_UNSETTLED_RETENTION,
+        interval: float = config.EVENT_ARCHIVE_SWEEP_INTERVAL,
+    ):
+        """Инициализация.
+
+        Args:
+            store: Хранилище событий.
+            archive: Архив событий.
+            retention: Время хранения завершенного события после
+                завершения, сек.
+            unsettled_retention: Время хранения незавершенного события после
+                дедлайна, сек; 0 — не переносить такие события.
+            interval: Период проходов, сек.
+        """
+        self.store = store
+        self.archive = archive
+        self.retention = retention
+        self.unsettled_retention = unsettled_retention
+        self.interval = interval
+
+        # Срок переноса завершенного события по его ID и ID событий по секундам
+        # сроков; записи колеса, не совпадающие со сроком события, устарели
+        self._due: dict[int, int] = {}
+        self._wheel: dict[int, list[int]] = {}
+        # Секунда, сроки до которой включительно уже обработаны
+        self._swept_until = int(time.time())
+
+        self.sweeps = 0
+        self.archived = 0
+        self.last_sweep_duration: float | None = None
+
+        self._task: asyncio.Task | None = None
+
+    def _schedule(self, event_id: int, due: int) -> None:
+        """Назначает срок переноса завершенного события.
+
+        Args:
+            event_id: ID события.
+            due: Срок переноса.
+        """
+        # Наступившие сроки попадают в ближайший еще не обработанный слот
+        due = max(due, self._swept_until + 1)
+        self._due[event_id] = due
+        self._wheel.setdefault(due, []).append(event_id)
+
+    def track(
+        self, mutation: events.Mutation, changed: Sequence[schemas.Event]
+    ) -> None:
+        """Отслеживает завершение событий.
+
+        Срок переноса отсчитывается от первого изменения, после которого
+        событие стало завершенным.
+
+        Args:
+            mutation: Вид изменения.
+            changed: Затронутые события.
+        """
+        if mutation is events.Mutation.CLEAR:
+            self._due.clear()
+            self._wheel.clear()
+            self.archive.clear()
+            return
+
+        if mutation is not events.Mutation.PUT:
+            for event in changed:
+                self._due.pop(event.event_id, None)
+            return
+
+        if isinstance(changed, events.ColumnEvents):
+            states = changed.columns.states
+            # Сгенерированные пачки целиком состоят из незавершенных событий
+            if not self._due and states.count(schemas.EventState.NEW) == len(states):
+                return
+            rows = zip(changed.columns.ids, states)
+        else:
+            rows = ((event.event_id, event.state) for event in changed)
+
+        due = int(time.time()) + self.retention
+        for event_id, state in rows:
+            if state == schemas.EventState.NEW:
+                self._due.pop(event_id, None)
+            elif event_id not in self._due:
+                self._schedule(event_id, due)
+
+    def _take_due(self, now: int) -> list[int]:
+        """Извлекает из колеса завершенные события с наступившим сроком.
+
+        Args:
+            now: Текущий момент.
+
+        Returns:
+            ID событий.
+        """
+        due_ids = []
+        for second in range(self._swept_until + 1, now + 1):
+            for event_id in self._wheel.pop(second, ()):
+                if self._due.get(event_id) == second:
+                    del self._due[event_id]
+                    due_ids.append(event_id)
+        self._swept_until = max(self._swept_until, now)
+        return due_ids
+
+    def _take_expired(self, now: int) -> list[int]:
+        """Находит незавершенные события, дедлайн которых давно прошел.
+
+        Args:
+            now: Текущий момент.
+
+        Returns:
+            ID событий.
+        """
+        if self.unsettled_retention <= 0:
+            return []
+
+        store = self.store
+        closed = store.deadlines.closed_before(now - self.unsettled_retention)
+        return [
+            event_id
+            for event_id in itertools.islice(store.deadlines, closed)
+            if store.get_fields(event_id)[3] == schemas.EventState.NEW
+        ]
+
+    def sweep(self, now: float | None = None) -> int:
+        """Переносит в архив события с наступившим сроком.
+
+        Args:
+            now: Текущий момент; по умолчанию текущее время.
+
+        Returns:
+            Количество перенесенных событий.
+        """
+        started_at = time.perf_counter()
+        if now is None:
+            now = time.time()
+
+        store = self.store
+        due_ids = [
+            event_id for event_id in self._take_due(int(now)) if event_id in store
+        ]
+        due_ids.extend(self._take_expired(int(now)))
+
+        # Сначала события записываются в архив: сбой между шагами оставит
+        # событие и в архиве, и в хранилище, но не потеряет его
+        self.archive.add([store[event_id] for event_id in due_ids])
+        archived_events = store.archive(due_ids)
+
+        self.sweeps += 1
+        self.archived += len(archived_events)
+        self.last_sweep_duration = time.perf_counter() - started_at
+        return len(archived_events)
+
+    def rebuild(self) -> None:
+        """Назначает сроки переноса уже завершенным событиям хранилища.
+
+        Момент их завершения неизвестен, поэтому срок отсчитывается от
+        текущего момента.
+        """
+        self._due.clear()
+        self._wheel.clear()
+        self._swept_until = int(time.time())
+        self.track(events.Mutation.PUT, self.store.values())
+
+    async def _run(self) -> None:
+        """Периодически переносит события в архив."""
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sweep()
+
+    def start(self) -> None:
+        """Начинает отслеживать события и запускает фоновые проходы."""
+        if self._task is None:
+            self.rebuild()
+            self.store.listeners.append(self.track)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновые проходы."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+            self.store.listeners.remove(self.track)
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Возвращает статистику архивации."""
+        return {
+            "hot": len(self.store),
+            "archived": len(self.archive),
+            "archive_bytes": self.archive.nbytes(),
+            "scheduled": len(self._due),
+            "sweeps": self.sweeps,
+            "archived_total": self.archived,
+            "last_sweep_duration": self.last_sweep_duration,
+        }
+
+
+event_archive = EventArchive()
+sweeper = EventSweeper(events.events, event_archive)
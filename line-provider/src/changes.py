@@ -0,0 +1,235 @@
+"""Модуль журнала последних изменений событий.
+
+Хранит в памяти ограниченное количество последних изменений хранилища,
+чтобы потребители могли догнать его, получив только разницу с известной им
+версией, а не весь список событий.
+"""
+
+import asyncio
+import collections
+import itertools
+import json
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, NamedTuple
+
+import config
+import events
+import schemas
+
+
+class Change(NamedTuple):
+    """Изменение хранилища событий."""
+
+    version: int
+    mutation: events.Mutation
+    # Состояние затронутых событий на момент изменения:
+    # (ID, коэффициент, дедлайн, статус)
+    rows: tuple[tuple[Any, ...], ...]
+
+
+class ChangeLog:
+    """Ограниченный журнал изменений хранилища событий.
+
+    Изменения записываются подписчиком хранилища с версией, которую
+    хранилище присвоило изменению. Когда количество затронутых событий
+    превышает предел, самые старые изменения вытесняются. Удаленные события
+    записываются со статусом `DELETED`.
+    """
+
+    def __init__(
+        self, store: events.BaseEventStore, max_size: int = config.CHANGE_LOG_SIZE
+    ):
+        """Инициализация.
+
+        Args:
+            store: Хранилище событий.
+            max_size: Максимальное количество событий во всех изменениях журнала.
+        """
+        self.store = store
+        self.max_size = max_size
+
+        self.changes: collections.deque[Change] = collections.deque()
+        self.size = 0
+        # Изменения с версиями до `first_version` в журнале отсутствуют
+        self.first_version = store.version + 1
+
+        self._changed = asyncio.Event()
+
+        store.listeners.append(self.record)
+
+    @property
+    def last_version(self) -> int:
+        """Версия последнего изменения в журнале."""
+        return self.changes[-1].version if self.changes else self.first_version - 1
+
+    def _reset(self, first_version: int) -> None:
+        """Очищает журнал.
+
+        Args:
+            first_version: Версия, начиная с которой журнал снова полон.
+        """
+        self.changes.clear()
+        self.size = 0
+        self.first_version = first_version
+
+    def record(
+        self, mutation: events.Mutation, changed: Sequence[schemas.Event]
+    ) -> None:
+        """Записывает изменение хранилища.
+
+        Args:
+            mutation: Вид изменения.
+            changed: Затронутые события.
+        """
+        version = self.store.version
+
+        if self.last_version != version - 1:
+            self._reset(version)
+
+        # Изменение, которое само больше предела, сразу вытесняет весь журнал:
+        # потребителю дешевле заново загрузить весь список событий
+        if len(changed) > self.max_size:
+            self._reset(version + 1)
+            self._changed.set()
+            self._changed = asyncio.Event()
+            return
+
+        # Убранные в архив события не удалены, поэтому передаются как есть
+        if mutation in (events.Mutation.PUT, events.Mutation.ARCHIVE):
+            rows = tuple(
+                (event.event_id, event.coefficient, event.deadline, event.state)
+                for event in changed
+            )
+        else:
+            rows = tuple(
+                (
+                    event.event_id,
+                    event.coefficient,
+                    event.deadline,
+                    schemas.EventState.DELETED,
+                )
+                for event in changed
+            )
+
+        self.changes.append(Change(version, mutation, rows))
+        self.size += len(rows)
+
+        while self.size > self.max_size:
+            evicted = self.changes.popleft()
+            self.size -= len(evicted.rows)
+            self.first_version = evicted.version + 1
+
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def since(self, version: int, epoch: str | None = None) -> schemas.EventChanges:
+        """Возвращает изменения, сделанные после переданной версии.
+
+        Args:
+            version: Последняя известная потребителю версия.
+            epoch: Эпоха хранилища, к которой относится версия.
+
+        Returns:
+            Изменения или признак того, что потребителю нужно заново
+            загрузить весь список событий.
+        """
+        current = self.store.version
+        # Изменения, сделанные без уведомления подписчиков (например,
+        # при восстановлении), в журнал не попали
+        if self.last_version != current:
+            self._reset(current + 1)
+
+        resync = (
+            (epoch is not None and epoch != self.store.epoch)
+            or version > current
+            or version < self.first_version - 1
+        )
+
+        changes = []
+        if not resync:
+            start = len(self.changes) - (current - version)
+            for change in itertools.islice(self.changes, start, None):
+                changes.append(
+                    schemas.EventChange(
+                        version=change.version,
+                        mutation=change.mutation.name.lower(),
+                        events=[
+                            schemas.Event.model_construct(
+                                event_id=event_id,
+                                coefficient=coefficient,
+                                deadline=deadline,
+                                state=state,
+                            )
+                            for event_id, coefficient, deadline, state in change.rows
+                        ],
+                    )
+                )
+
+        return schemas.EventChanges(
+            epoch=self.store.epoch, version=current, resync=resync, changes=changes
+        )
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Ждет изменения хранилища после переданной версии.
+
+        Args:
+            version: Последняя известная версия.
+            timeout: Максимальное время ожидания, сек.
+
+        Returns:
+            True, если хранилище изменилось.
+        """
+        if self.store.version != version:
+            return True
+
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stream(
+        self,
+        version: int | None = None,
+        epoch: str | None = None,
+        heartbeat: float = config.STREAM_HEARTBEAT_INTERVAL,
+    ) -> AsyncIterator[str]:
+        """Передает изменения хранилища в формате Server-Sent Events.
+
+        Сначала передаются изменения после переданной версии, затем новые
+        по мере их появления. ID каждого сообщения — `<эпоха>:<версия>`.
+        Если изменения после версии недоступны или версия не передана,
+        отправляется сообщение `resync` с текущими эпохой и версией, и
+        передача продолжается с них.
+
+        Args:
+            version: Последняя известная потребителю версия.
+            epoch: Эпоха, к которой относится версия.
+            heartbeat: Период отправки пустых сообщений, сек.
+
+        Yields:
+            Сообщения потока.
+        """
+        # Версии не бывают отрицательными, поэтому поток начнется с `resync`
+        if version is None:
+            version = -1
+
+        while True:
+            result = self.since(version, epoch)
+            epoch, version = result.epoch, result.version
+
+            if result.resync:
+                data = json.dumps({"epoch": epoch, "version": version})
+                yield f"id: {epoch}:{version}\nevent: resync\ndata: {data}\n\n"
+
+            for change in result.changes:
+                yield (
+                    f"id: {epoch}:{change.version}\nevent: {change.mutation}\n"
+                    f"data: {change.model_dump_json()}\n\n"
+                )
+
+            if not await self.wait(version, heartbeat):
+                yield ": heartbeat\n\n"
+
+
+change_log = ChangeLog(events.events)
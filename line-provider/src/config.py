@@ -5,6 +5,150 @@ import os
 import pydantic
 
 
+# Значения переменных окружения, трактуемые как включенный флаг
+TRUTHY = {"1", "true", "yes"}
+
 BET_MAKER_URL = pydantic.TypeAdapter(pydantic.HttpUrl).validate_python(
     os.getenv(key="BET_MAKER_URL", default="http://127.0.0.1:8001/")
 )
+
+# Отправлять ли изменения событий в `bet-maker` запросами `POST /updated`;
+# можно отключить, если `bet-maker` получает их из `/event/stream`
+NOTIFY_ENABLED = os.getenv(key="NOTIFY_ENABLED", default="true").lower() in TRUTHY
+
+# Формат уведомлений: "application/json" или "application/msgpack"
+NOTIFY_CONTENT_TYPE = os.getenv(key="NOTIFY_CONTENT_TYPE", default="application/json")
+
+# Окно, в течение которого изменения событий объединяются в одно уведомление, сек
+NOTIFY_COALESCE_WINDOW = float(os.getenv(key="NOTIFY_COALESCE_WINDOW", default="0.05"))
+
+# Максимальное количество событий в одном уведомлении
+NOTIFY_MAX_BATCH = int(os.getenv(key="NOTIFY_MAX_BATCH", default="1000"))
+
+# Начальная и максимальная задержки повторной отправки уведомления, сек
+NOTIFY_RETRY_BASE_DELAY = float(os.getenv(key="NOTIFY_RETRY_BASE_DELAY", default="0.5"))
+NOTIFY_RETRY_MAX_DELAY = float(os.getenv(key="NOTIFY_RETRY_MAX_DELAY", default="30"))
+
+# Количество попыток доставки, после которого уведомление отбрасывается
+NOTIFY_MAX_ATTEMPTS = int(os.getenv(key="NOTIFY_MAX_ATTEMPTS", default="10"))
+
+# Таймаут запроса к сервису `bet-maker`, сек
+NOTIFY_TIMEOUT = float(os.getenv(key="NOTIFY_TIMEOUT", default="5"))
+
+# Способ хранения событий в памяти: "dict", "columnar" или "shared" — таблица
+# в разделяемой памяти, общая для всех рабочих процессов uvicorn
+EVENT_STORE_BACKEND = os.getenv(key="EVENT_STORE_BACKEND", default="dict")
+
+# Файл таблицы хранилища "shared"; таблица переживает перезапуск сервиса,
+# пока файл не удален
+EVENT_SHM_PATH = os.getenv(
+    key="EVENT_SHM_PATH", default="/dev/shm/line-provider-events"
+)
+
+# Наибольший ID события в таблице и количество записей в ее кольце изменений
+EVENT_SHM_CAPACITY = int(os.getenv(key="EVENT_SHM_CAPACITY", default="1000000"))
+EVENT_SHM_RING_SIZE = int(os.getenv(key="EVENT_SHM_RING_SIZE", default="65536"))
+
+# Период проверки изменений, сделанных другими рабочими процессами, сек
+EVENT_SHM_SYNC_INTERVAL = float(
+    os.getenv(key="EVENT_SHM_SYNC_INTERVAL", default="0.05")
+)
+
+# Хранить события закодированными для быстрой выдачи списков
+EVENT_BYTES_CACHE = os.getenv(key="EVENT_BYTES_CACHE", default="true").lower() in TRUTHY
+
+# Максимальное количество ID событий в одном запросе `/event/batch`
+EVENT_BATCH_LIMIT = int(os.getenv(key="EVENT_BATCH_LIMIT", default="500"))
+
+# Максимальное количество событий во всех изменениях журнала `/event/changes`
+CHANGE_LOG_SIZE = int(os.getenv(key="CHANGE_LOG_SIZE", default="100000"))
+
+# Период отправки пустых сообщений в `/event/stream` при отсутствии изменений, сек
+STREAM_HEARTBEAT_INTERVAL = float(
+    os.getenv(key="STREAM_HEARTBEAT_INTERVAL", default="15")
+)
+
+# Каталог для снимков и журнала изменений событий; пусто — события только в памяти
+EVENT_STORAGE_DIR = os.getenv(key="EVENT_STORAGE_DIR", default="")
+
+# Политика fsync журнала: "always" — после каждой записи, "interval" — периодически,
+# "never" — на усмотрение ОС
+EVENT_STORAGE_FSYNC = os.getenv(key="EVENT_STORAGE_FSYNC", default="interval")
+EVENT_STORAGE_FSYNC_INTERVAL = float(
+    os.getenv(key="EVENT_STORAGE_FSYNC_INTERVAL", default="1")
+)
+
+# Количество записей журнала, после которого он сворачивается в снимок
+EVENT_STORAGE_SNAPSHOT_THRESHOLD = int(
+    os.getenv(key="EVENT_STORAGE_SNAPSHOT_THRESHOLD", default="100000")
+)
+
+# Переносить ли завершенные и просроченные события из хранилища в архив
+EVENT_ARCHIVE_ENABLED = (
+    os.getenv(key="EVENT_ARCHIVE_ENABLED", default="false").lower() in TRUTHY
+)
+
+# Время хранения события после завершения и незавершенного события после
+# дедлайна до переноса в архив, сек; 0 для незавершенных — не переносить их
+EVENT_ARCHIVE_RETENTION = int(os.getenv(key="EVENT_ARCHIVE_RETENTION", default="3600"))
+EVENT_ARCHIVE_UNSETTLED_RETENTION = int(
+    os.getenv(key="EVENT_ARCHIVE_UNSETTLED_RETENTION", default="86400")
+)
+
+# Период проходов переноса событий в архив, сек
+EVENT_ARCHIVE_SWEEP_INTERVAL = float(
+    os.getenv(key="EVENT_ARCHIVE_SWEEP_INTERVAL", default="10")
+)
+
+# Распределения генератора событий `/event/generate`: коэффициенты "uniform"
+# или "lognormal" (с медианой и разбросом логарифма), обрезанные по границам
+GENERATOR_COEFFICIENT_DISTRIBUTION = os.getenv(
+    key="GENERATOR_COEFFICIENT_DISTRIBUTION", default="uniform"
+)
+GENERATOR_MIN_COEFFICIENT = float(
+    os.getenv(key="GENERATOR_MIN_COEFFICIENT", default="0.01")
+)
+GENERATOR_MAX_COEFFICIENT = float(
+    os.getenv(key="GENERATOR_MAX_COEFFICIENT", default="10")
+)
+GENERATOR_COEFFICIENT_MEDIAN = float(
+    os.getenv(key="GENERATOR_COEFFICIENT_MEDIAN", default="2")
+)
+GENERATOR_COEFFICIENT_SIGMA = float(
+    os.getenv(key="GENERATOR_COEFFICIENT_SIGMA", default="0.5")
+)
+
+# Границы дедлайнов генерируемых событий относительно момента генерации, сек
+GENERATOR_MIN_DEADLINE_OFFSET = int(
+    os.getenv(key="GENERATOR_MIN_DEADLINE_OFFSET", default="30")
+)
+GENERATOR_MAX_DEADLINE_OFFSET = int(
+    os.getenv(key="GENERATOR_MAX_DEADLINE_OFFSET", default="600")
+)
+
+# Собирать метрики запросов и отдавать их в `/metrics`
+METRICS_ENABLED = os.getenv(key="METRICS_ENABLED", default="true").lower() in TRUTHY
+
+# Профилировать запросы: разбивка времени медленных запросов отдается
+# в `/debug/requests`, выбранные запросы профилируются `cProfile`
+PROFILING_ENABLED = (
+    os.getenv(key="PROFILING_ENABLED", default="false").lower() in TRUTHY
+)
+
+# Доля запросов, профилируемых `cProfile`
+PROFILING_SAMPLE_RATE = float(os.getenv(key="PROFILING_SAMPLE_RATE", default="0"))
+
+# Заголовок и его значение, с которым запрос профилируется `cProfile`;
+# без значения заголовок не учитывается
+PROFILING_HEADER = os.getenv(key="PROFILING_HEADER", default="X-Profile")
+PROFILING_TOKEN = os.getenv(key="PROFILING_TOKEN", default="")
+
+# Каталог для файлов профилей `cProfile`
+PROFILING_DIR = os.getenv(key="PROFILING_DIR", default="/tmp/profiles")
+
+# Длительность, начиная с которой запрос попадает в буфер медленных, сек,
+# и размер буфера
+PROFILING_SLOW_THRESHOLD = float(
+    os.getenv(key="PROFILING_SLOW_THRESHOLD", default="0.1")
+)
+PROFILING_SLOW_SIZE = int(os.getenv(key="PROFILING_SLOW_SIZE", default="100"))
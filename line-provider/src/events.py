@@ -1,48 +1,1435 @@
 """Хранилище событий."""
 
+import abc
+import array
+import asyncio
+import bisect
+import contextlib
 import decimal
-import random
+import enum
+import functools
+import itertools
+import operator
+import threading
 import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import Any, NamedTuple
 
+import config
 import schemas
+import shm
 
 
-MIN_COEFFICIENT = 0.01
-MAX_COEFFICIENT = 10.0
+# Размер пачки, начиная с которого индекс пересортировывается целиком,
+# а не дополняется поэлементными вставками
+BULK_INSERT_THRESHOLD = 64
 
+# Длина пустого начала массива номеров строк `EventTable`, начиная с которой
+# оно отрезается
+TRIM_THRESHOLD = 4096
 
-events: dict[int, schemas.Event] = {}
-secure_random = random.SystemRandom()
+# Значение, которым в целочисленных колонках обозначается отсутствие значения
+NULL = -(2**63)
 
+# Статусы событий по их значениям для быстрого обратного преобразования
+STATES = tuple(sorted(schemas.EventState))
 
-def generate(number: int = 1) -> dict[int, schemas.Event]:
-    """Генерирует события в переданном количестве и сохраняет их в хранилище.
+
+@enum.unique
+class Mutation(enum.IntEnum):
+    """Перечисление видов изменений хранилища событий."""
+
+    PUT = 1
+    DELETE = 2
+    CLEAR = 3
+    # Событие убрано из хранилища в архив, но не удалено
+    ARCHIVE = 4
+
+
+class EventColumns(NamedTuple):
+    """События в колоночном представлении."""
+
+    ids: array.array
+    coefficients: array.array
+    deadlines: array.array
+    states: array.array
+
+
+def pack_coefficient(coefficient: decimal.Decimal | None) -> int:
+    """Переводит коэффициент в целое число сотых."""
+    if coefficient is None:
+        return NULL
+    return int(coefficient.scaleb(2).to_integral_value(decimal.ROUND_HALF_EVEN))
+
+
+@functools.lru_cache(maxsize=4096)
+def unpack_coefficient(value: int) -> decimal.Decimal | None:
+    """Переводит целое число сотых в коэффициент.
+
+    Различных коэффициентов немного, а `Decimal` неизменяем, поэтому
+    объекты переиспользуются между событиями.
+    """
+    if value == NULL:
+        return None
+    return decimal.Decimal(value).scaleb(-2)
+
+
+def build_event(
+    event_id: int, coefficient: int, deadline: int, state: int
+) -> schemas.Event:
+    """Собирает объект события из колоночных значений без валидации.
 
     Args:
-        number: Количество событий.
+        event_id: ID события.
+        coefficient: Коэффициент в сотых.
+        deadline: Дедлайн.
+        state: Статус.
 
     Returns:
-        Сгенерированные события.
+        Объект события.
+    """
+    return schemas.Event.model_construct(
+        event_id=event_id,
+        coefficient=unpack_coefficient(coefficient),
+        deadline=None if deadline == NULL else deadline,
+        state=STATES[state],
+    )
+
+
+class ColumnEvents(Sequence):
+    """События пачки, собираемые из колонок только при обращении к ним.
+
+    Передается подписчикам при массовом добавлении событий вместо списка
+    объектов; подписчикам, которым достаточно значений полей, колонки
+    доступны напрямую.
+    """
+
+    def __init__(self, columns: EventColumns):
+        """Инициализация.
+
+        Args:
+            columns: Колонки событий.
+        """
+        self.columns = columns
+
+    def __len__(self) -> int:
+        """Возвращает количество событий."""
+        return len(self.columns.ids)
+
+    def __getitem__(self, index: int) -> schemas.Event:
+        """Собирает событие по его позиции в пачке."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return build_event(*(column[index] for column in self.columns))
+
+    def __iter__(self) -> Iterator[schemas.Event]:
+        """Итерирует по событиям пачки."""
+        return itertools.starmap(build_event, zip(*self.columns))
+
+
+class DeadlineIndex:
+    """Вторичный индекс событий, упорядоченный по дедлайну.
+
+    Хранит отсортированный список ключей `(deadline, event_id)`, поэтому
+    выборка событий с ещё не наступившим дедлайном стоит O(log n + k).
+    """
+
+    def __init__(self):
+        """Инициализация."""
+        self._keys: list[tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        """Возвращает количество проиндексированных событий."""
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[int]:
+        """Перебирает ID событий в порядке возрастания дедлайна."""
+        return map(operator.itemgetter(1), self._keys)
+
+    def add(self, event_id: int, deadline: int | None) -> None:
+        """Добавляет событие в индекс.
+
+        События без дедлайна не индексируются: ставки на них не принимаются.
+
+        Args:
+            event_id: ID события.
+            deadline: Дедлайн события.
+        """
+        if deadline is not None:
+            bisect.insort(self._keys, (deadline, event_id))
+
+    def add_many(self, keys: Iterable[tuple[int, int | None]]) -> None:
+        """Добавляет в индекс пачку событий.
+
+        Args:
+            keys: Пары `(event_id, deadline)`.
+        """
+        self.add_keys(
+            [
+                (deadline, event_id)
+                for event_id, deadline in keys
+                if deadline is not None
+            ]
+        )
+
+    def add_keys(self, keys: list[tuple[int, int]]) -> None:
+        """Добавляет в индекс готовые ключи `(deadline, event_id)`.
+
+        Args:
+            keys: Ключи индекса.
+        """
+        if len(keys) < BULK_INSERT_THRESHOLD:
+            for key in keys:
+                bisect.insort(self._keys, key)
+        else:
+            self._keys.extend(keys)
+            self._keys.sort()
+
+    def remove(self, event_id: int, deadline: int | None) -> None:
+        """Удаляет событие из индекса.
+
+        Args:
+            event_id: ID события.
+            deadline: Дедлайн события.
+        """
+        if deadline is None:
+            return
+
+        key = (deadline, event_id)
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+    def remove_many(self, keys: Iterable[tuple[int, int | None]]) -> None:
+        """Удаляет из индекса пачку событий.
+
+        Каждое удаление сдвигает хвост списка, поэтому большая пачка
+        удаляется одним проходом по индексу.
+
+        Args:
+            keys: Пары `(event_id, deadline)`.
+        """
+        removed = {
+            (deadline, event_id) for event_id, deadline in keys if deadline is not None
+        }
+        if len(removed) < BULK_INSERT_THRESHOLD:
+            for deadline, event_id in removed:
+                self.remove(event_id, deadline)
+        else:
+            self._keys = [key for key in self._keys if key not in removed]
+
+    def clear(self) -> None:
+        """Очищает индекс."""
+        self._keys.clear()
+
+    def closed_before(self, timestamp: int) -> int:
+        """Возвращает количество событий, дедлайн которых не позже момента.
+
+        Args:
+            timestamp: Момент времени.
+
+        Returns:
+            Количество событий.
+        """
+        return bisect.bisect_right(self._keys, (timestamp, float("inf")))
+
+    def open_since(
+        self, timestamp: int, after: tuple[int, int] | None = None
+    ) -> Iterator[int]:
+        """Перебирает ID событий, дедлайн которых позже переданного момента.
+
+        Args:
+            timestamp: Момент времени.
+            after: Ключ `(deadline, event_id)`, после которого начинать перебор.
+
+        Yields:
+            ID событий в порядке возрастания дедлайна.
+        """
+        start = self.closed_before(timestamp)
+        if after is not None:
+            start = max(start, bisect.bisect_right(self._keys, after))
+
+        for position in range(start, len(self._keys)):
+            yield self._keys[position][1]
+
+
+class BaseEventStore(abc.ABC):
+    """Базовое хранилище событий с индексом по дедлайну.
+
+    Выдает ID событий из монотонной последовательности: ID не переиспользуются
+    даже после удаления всех событий. Наследники определяют только способ
+    хранения самих событий.
     """
-    generated_events = {}
 
-    for i in range(1, number + 1):
-        timestamp = time.time()
+    def __init__(self):
+        """Инициализация."""
+        self.deadlines = DeadlineIndex()
+        self.listeners: list[Callable[[Mutation, Sequence[schemas.Event]], None]] = []
+
+        # Версия содержимого увеличивается при каждом изменении; эпоха
+        # отличает версии разных запусков сервиса
+        self.version = 0
+        self.epoch = f"{time.time_ns():x}"
+
+        self._last_id = 0
+        self._id_lock = threading.Lock()
+
+    @property
+    def last_id(self) -> int:
+        """Последний выданный ID события."""
+        return self._last_id
+
+    def advance_ids(self, event_id: int) -> None:
+        """Сдвигает последовательность ID так, чтобы она не выдала переданный ID.
+
+        Args:
+            event_id: Уже занятый ID события.
+        """
+        with self._id_lock:
+            self._last_id = max(self._last_id, event_id)
+
+    @contextlib.contextmanager
+    def muted(self) -> Iterator[None]:
+        """Временно отключает уведомление подписчиков об изменениях."""
+        listeners, self.listeners = self.listeners, []
+        try:
+            yield
+        finally:
+            self.listeners = listeners
+
+    def _notify(self, mutation: Mutation, events: Sequence[schemas.Event]) -> None:
+        """Увеличивает версию хранилища и сообщает подписчикам об изменении.
+
+        Args:
+            mutation: Вид изменения.
+            events: Затронутые события.
+        """
+        self.version += 1
+        for listener in self.listeners:
+            listener(mutation, events)
+
+    def sync(self) -> None:
+        """Догоняет изменения, сделанные другими процессами.
+
+        Хранилище в памяти процесса изменяется только им самим.
+        """
+
+    @abc.abstractmethod
+    def __contains__(self, event_id: int) -> bool:
+        """Проверяет наличие события в хранилище."""
+
+    @abc.abstractmethod
+    def __getitem__(self, event_id: int) -> schemas.Event:
+        """Возвращает событие по его ID."""
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Возвращает количество событий в хранилище."""
+
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[int]:
+        """Перебирает ID событий."""
+
+    @abc.abstractmethod
+    def values(self) -> Iterable[schemas.Event]:
+        """Возвращает все события."""
+
+    def get_fields(
+        self, event_id: int
+    ) -> tuple[int, decimal.Decimal | None, int | None, int]:
+        """Возвращает поля события без сборки его объекта.
+
+        Args:
+            event_id: ID события.
+
+        Raises:
+            KeyError: Если событие не найдено.
+
+        Returns:
+            ID, коэффициент, дедлайн и статус события.
+        """
+        event = self[event_id]
+        return event.event_id, event.coefficient, event.deadline, event.state
+
+    @abc.abstractmethod
+    def _insert(self, events: list[schemas.Event]) -> None:
+        """Сохраняет новые события.
+
+        Args:
+            events: Объекты событий.
+        """
 
-        event = schemas.Event(
-            event_id=max(events or [0]) + i,
-            coefficient=round(
-                decimal.Decimal(
-                    secure_random.uniform(MIN_COEFFICIENT, MAX_COEFFICIENT)
+    @abc.abstractmethod
+    def _assign(self, event_id: int, fields: dict[str, Any]) -> int | None:
+        """Записывает новые значения полей события.
+
+        Args:
+            event_id: ID события.
+            fields: Новые значения полей.
+
+        Returns:
+            Дедлайн события до изменения.
+        """
+
+    @abc.abstractmethod
+    def _remove(self, event_id: int) -> schemas.Event:
+        """Удаляет событие.
+
+        Args:
+            event_id: ID события.
+
+        Returns:
+            Объект удаленного события.
+        """
+
+    @abc.abstractmethod
+    def _remove_all(self) -> list[schemas.Event]:
+        """Удаляет все события.
+
+        Returns:
+            Список удаленных событий.
+        """
+
+    def next_ids(self, number: int = 1) -> range:
+        """Резервирует диапазон новых ID событий.
+
+        Args:
+            number: Количество ID.
+
+        Returns:
+            Диапазон зарезервированных ID.
+        """
+        with self._id_lock:
+            start = self._last_id + 1
+            self._last_id += number
+
+        return range(start, start + number)
+
+    def next_id(self) -> int:
+        """Резервирует новый ID события."""
+        return self.next_ids()[0]
+
+    def add(self, event: schemas.Event) -> None:
+        """Сохраняет событие.
+
+        Args:
+            event: Объект события.
+        """
+        self.add_many([event])
+
+    def add_many(self, events: Iterable[schemas.Event]) -> None:
+        """Сохраняет пачку новых событий.
+
+        Args:
+            events: Объекты событий.
+        """
+        events = list(events)
+        if not events:
+            return
+
+        self._insert(events)
+        self.deadlines.add_many((event.event_id, event.deadline) for event in events)
+
+        # События могли прийти с уже назначенными ID
+        self.advance_ids(max(event.event_id for event in events))
+
+        self._notify(Mutation.PUT, events)
+
+    def update(self, event_id: int, fields: dict[str, Any]) -> schemas.Event:
+        """Обновляет поля события, поддерживая индекс в актуальном состоянии.
+
+        Args:
+            event_id: ID события.
+            fields: Новые значения полей.
+
+        Returns:
+            Объект измененного события.
+        """
+        deadline = self._assign(event_id, fields)
+        event = self[event_id]
+
+        if event.deadline != deadline:
+            self.deadlines.remove(event_id, deadline)
+            self.deadlines.add(event_id, event.deadline)
+
+        self._notify(Mutation.PUT, [event])
+
+        return event
+
+    def delete(self, event_id: int) -> schemas.Event:
+        """Удаляет событие из хранилища.
+
+        Args:
+            event_id: ID события.
+
+        Returns:
+            Объект удаленного события.
+        """
+        event = self._remove(event_id)
+        self.deadlines.remove(event_id, event.deadline)
+
+        self._notify(Mutation.DELETE, [event])
+
+        return event
+
+    def clear(self) -> list[schemas.Event]:
+        """Удаляет все события из хранилища.
+
+        Returns:
+            Список удаленных событий.
+        """
+        deleted_events = self._remove_all()
+        self.deadlines.clear()
+
+        self._notify(Mutation.CLEAR, deleted_events)
+
+        return deleted_events
+
+    def archive(self, event_ids: Iterable[int]) -> list[schemas.Event]:
+        """Убирает события из хранилища в архив.
+
+        В отличие от удаления, подписчики получают события с их текущим
+        статусом: событие не удалено, а только больше не хранится здесь.
+
+        Args:
+            event_ids: ID событий.
+
+        Returns:
+            Список убранных событий.
+        """
+        archived_events = [self._remove(event_id) for event_id in event_ids]
+        self.deadlines.remove_many(
+            (event.event_id, event.deadline) for event in archived_events
+        )
+
+        if archived_events:
+            self._notify(Mutation.ARCHIVE, archived_events)
+
+        return archived_events
+
+    def to_columns(self) -> EventColumns:
+        """Возвращает все события в колоночном представлении.
+
+        События с дедлайном идут первыми в порядке индекса, поэтому индекс
+        при загрузке строится по уже отсортированным данным.
+
+        Returns:
+            Колонки событий.
+        """
+        events = [self[event_id] for event_id in self.deadlines]
+        events.extend(event for event in self.values() if event.deadline is None)
+
+        return EventColumns(
+            ids=array.array("q", (event.event_id for event in events)),
+            coefficients=array.array(
+                "q", (pack_coefficient(event.coefficient) for event in events)
+            ),
+            deadlines=array.array(
+                "q",
+                (
+                    NULL if event.deadline is None else event.deadline
+                    for event in events
                 ),
-                2,
             ),
-            deadline=int(secure_random.uniform(timestamp + 30, timestamp + 600)),
-            state=schemas.EventState.NEW,
+            states=array.array("b", (event.state for event in events)),
         )
 
-        generated_events[event.event_id] = event
+    def load_columns(self, columns: EventColumns) -> None:
+        """Загружает события из колоночного представления.
+
+        Подписчики об этом не уведомляются: загрузка восстанавливает уже
+        сохраненное состояние.
+
+        Args:
+            columns: Колонки событий.
+        """
+        with self.muted():
+            self.add_many(itertools.starmap(build_event, zip(*columns)))
+
+    def add_columns(self, columns: EventColumns) -> None:
+        """Сохраняет пачку новых событий из колоночного представления.
+
+        В отличие от `load_columns`, подписчики уведомляются о новых событиях.
+
+        Args:
+            columns: Колонки событий.
+        """
+        self.add_many(itertools.starmap(build_event, zip(*columns)))
+
+    def get_new_ids(
+        self,
+        limit: int | None = None,
+        after: int | None = None,
+        timestamp: int | None = None,
+    ) -> list[int]:
+        """Возвращает ID событий, на которые можно совершить ставку.
+
+        Args:
+            limit: Максимальное количество событий.
+            after: ID события, после которого начинается страница.
+            timestamp: Момент, на который проверяется дедлайн; по умолчанию
+                текущий.
+
+        Raises:
+            KeyError: Если событие-курсор не найдено.
+            ValueError: Если у события-курсора нет дедлайна.
+
+        Returns:
+            ID событий в порядке возрастания дедлайна.
+        """
+        cursor = None
+        if after is not None:
+            deadline = self.get_fields(after)[2]
+            # Дедлайн события-курсора могли убрать после получения страницы,
+            # и его место в индексе неизвестно
+            if deadline is None:
+                raise ValueError(f"Event {after} has no deadline")
+            cursor = (deadline, after)
+
+        if timestamp is None:
+            timestamp = int(time.time())
+
+        event_ids = self.deadlines.open_since(timestamp, cursor)
+        if limit is not None:
+            event_ids = itertools.islice(event_ids, limit)
+
+        return list(event_ids)
+
+    def get_new(
+        self,
+        limit: int | None = None,
+        after: int | None = None,
+        timestamp: int | None = None,
+    ) -> list[schemas.Event]:
+        """Возвращает события, на которые можно совершить ставку.
+
+        Args:
+            limit: Максимальное количество событий.
+            after: ID события, после которого начинается страница.
+            timestamp: Момент, на который проверяется дедлайн; по умолчанию
+                текущий.
+
+        Raises:
+            KeyError: Если событие-курсор не найдено.
+
+        Returns:
+            События в порядке возрастания дедлайна.
+        """
+        return [
+            self[event_id] for event_id in self.get_new_ids(limit, after, timestamp)
+        ]
+
+
+class DictEventStore(BaseEventStore):
+    """Хранилище событий в виде словаря объектов `schemas.Event`."""
+
+    def __init__(self):
+        """Инициализация."""
+        super().__init__()
+        self._events: dict[int, schemas.Event] = {}
+
+    def __contains__(self, event_id: int) -> bool:
+        """Проверяет наличие события в хранилище."""
+        return event_id in self._events
+
+    def __getitem__(self, event_id: int) -> schemas.Event:
+        """Возвращает событие по его ID."""
+        return self._events[event_id]
+
+    def __len__(self) -> int:
+        """Возвращает количество событий в хранилище."""
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[int]:
+        """Перебирает ID событий."""
+        return iter(self._events)
+
+    def values(self) -> Iterable[schemas.Event]:
+        """Возвращает все события."""
+        return self._events.values()
+
+    def _insert(self, events: list[schemas.Event]) -> None:
+        """Сохраняет новые события."""
+        self._events.update((event.event_id, event) for event in events)
+
+    def _assign(self, event_id: int, fields: dict[str, Any]) -> int | None:
+        """Записывает новые значения полей события."""
+        event = self._events[event_id]
+        deadline = event.deadline
+
+        for p_name, p_value in fields.items():
+            setattr(event, p_name, p_value)
+
+        return deadline
+
+    def _remove(self, event_id: int) -> schemas.Event:
+        """Удаляет событие."""
+        return self._events.pop(event_id)
+
+    def _remove_all(self) -> list[schemas.Event]:
+        """Удаляет все события."""
+        deleted_events = list(self._events.values())
+        self._events.clear()
+        return deleted_events
+
+
+class EventTable:
+    """Колонки событий со строками, адресуемыми по ID.
+
+    Поля событий хранятся в типизированных массивах, коэффициент — в виде
+    целого числа сотых, отсутствующие значения — в виде `NULL`. Номер строки
+    события хранится в массиве по смещению его ID от `base`: ID выдаются по
+    возрастанию, поэтому массив не требует словаря. При удалении на место
+    удаленной строки переносится последняя, поэтому колонки всегда остаются
+    плотными, а пустое начало массива номеров строк отрезается, когда
+    занимает его большую часть. Колонки занимают 25 байт на событие, массив
+    номеров строк — 8 байт на каждый ID между наименьшим и наибольшим ID
+    таблицы.
+    """
+
+    def __init__(self):
+        """Инициализация."""
+        # Номер строки события по смещению его ID от `base`; отсутствующим
+        # событиям соответствует -1
+        self.base = 0
+        self.positions = array.array("q")
+        # Длина пустого начала массива номеров строк; может быть меньше
+        # фактической, но не больше
+        self._leading = 0
+        self.ids = array.array("q")
+        self.coefficients = array.array("q")
+        self.deadlines = array.array("q")
+        self.states = array.array("b")
+
+    @property
+    def columns(self) -> tuple[array.array, ...]:
+        """Колонки событий в порядке полей `EventColumns`."""
+        return (self.ids, self.coefficients, self.deadlines, self.states)
+
+    def row(self, event_id: int) -> int:
+        """Возвращает номер строки события.
+
+        Args:
+            event_id: ID события.
+
+        Returns:
+            Номер строки или -1, если события нет.
+        """
+        offset = event_id - self.base
+        if 0 <= offset < len(self.positions):
+            return self.positions[offset]
+        return -1
+
+    def __contains__(self, event_id: int) -> bool:
+        """Проверяет наличие события в таблице."""
+        return self.row(event_id) >= 0
+
+    def __len__(self) -> int:
+        """Возвращает количество событий в таблице."""
+        return len(self.ids)
+
+    def build(self, row: int) -> schemas.Event:
+        """Собирает объект события из строки таблицы.
+
+        Args:
+            row: Номер строки.
+
+        Returns:
+            Объект события.
+        """
+        return build_event(*(column[row] for column in self.columns))
+
+    def __getitem__(self, event_id: int) -> schemas.Event:
+        """Возвращает событие по его ID."""
+        row = self.row(event_id)
+        if row < 0:
+            raise KeyError(event_id)
+        return self.build(row)
+
+    def _reserve(self, first_id: int, last_id: int) -> None:
+        """Расширяет массив номеров строк под диапазон ID.
+
+        Args:
+            first_id: Наименьший ID диапазона.
+            last_id: Наибольший ID диапазона.
+        """
+        if not self.ids:
+            self.base = first_id
+            self._leading = 0
+            del self.positions[:]
+        elif first_id < self.base:
+            self.positions[0:0] = array.array("q", [-1]) * (self.base - first_id)
+            self.base = first_id
+            self._leading = 0
+        else:
+            self._leading = min(self._leading, first_id - self.base)
+
+        missing = last_id - self.base + 1 - len(self.positions)
+        if missing > 0:
+            self.positions.extend(array.array("q", [-1]) * missing)
+
+    def append(self, events: Sequence[schemas.Event]) -> None:
+        """Добавляет строки событий, которых еще нет в таблице.
+
+        Args:
+            events: Объекты событий.
+        """
+        if not events:
+            return
+
+        self._reserve(
+            min(event.event_id for event in events),
+            max(event.event_id for event in events),
+        )
+        base, positions = self.base, self.positions
+        for row, event in enumerate(events, start=len(self.ids)):
+            positions[event.event_id - base] = row
+        self.ids.extend(event.event_id for event in events)
+        self.coefficients.extend(
+            pack_coefficient(event.coefficient) for event in events
+        )
+        self.deadlines.extend(
+            NULL if event.deadline is None else event.deadline for event in events
+        )
+        self.states.extend(event.state for event in events)
+
+    def extend(self, columns: EventColumns) -> None:
+        """Добавляет строки событий из колонок без сборки объектов.
+
+        Args:
+            columns: Колонки событий, которых еще нет в таблице.
+        """
+        if not columns.ids:
+            return
+
+        self._reserve(min(columns.ids), max(columns.ids))
+        row = len(self.ids)
+        for column, values in zip(self.columns, columns):
+            column.extend(values)
+
+        base, positions = self.base, self.positions
+        for i, event_id in enumerate(columns.ids, start=row):
+            positions[event_id - base] = i
+
+    def remove(self, event_id: int) -> schemas.Event:
+        """Удаляет строку события.
+
+        Args:
+            event_id: ID события, которое есть в таблице.
+
+        Returns:
+            Объект удаленного события.
+        """
+        row = self.positions[event_id - self.base]
+        self.positions[event_id - self.base] = -1
+        event = self.build(row)
+
+        last = len(self.ids) - 1
+        if row != last:
+            for column in self.columns:
+                column[row] = column[last]
+            self.positions[self.ids[row] - self.base] = row
+
+        for column in self.columns:
+            del column[last]
+
+        self._trim()
+        return event
+
+    def _trim(self) -> None:
+        """Отрезает пустое начало массива номеров строк.
+
+        Начало растет, когда из таблицы уходят самые старые события. Оно
+        отрезается, только когда занимает не меньше половины массива, поэтому
+        копирование массива окупается удаленными до этого строками.
+        """
+        positions = self.positions
+        leading = self._leading
+        while leading < len(positions) and positions[leading] < 0:
+            leading += 1
+        self._leading = leading
+
+        if leading >= TRIM_THRESHOLD and 2 * leading >= len(positions):
+            del positions[:leading]
+            self.base += leading
+            self._leading = 0
+
+    def select(self, rows: Iterable[int]) -> EventColumns:
+        """Копирует строки таблицы в колоночное представление.
+
+        Args:
+            rows: Номера строк.
+
+        Returns:
+            Колонки событий.
+        """
+        rows = list(rows)
+        return EventColumns(
+            *(
+                array.array(column.typecode, map(column.__getitem__, rows))
+                for column in self.columns
+            )
+        )
+
+    def clear(self) -> None:
+        """Удаляет все строки."""
+        self._leading = 0
+        del self.positions[:]
+        for column in self.columns:
+            del column[:]
+
+    def nbytes(self) -> int:
+        """Возвращает размер колонок и массива номеров строк, байт."""
+        return sum(
+            column.itemsize * len(column) for column in (self.positions, *self.columns)
+        )
+
+
+class ColumnarEventStore(BaseEventStore):
+    """Компактное колоночное хранилище событий.
+
+    События хранятся в `EventTable`, объекты `schemas.Event` создаются только
+    при выдаче событий наружу.
+    """
+
+    def __init__(self):
+        """Инициализация."""
+        super().__init__()
+        self._table = EventTable()
+
+    def __contains__(self, event_id: int) -> bool:
+        """Проверяет наличие события в хранилище."""
+        return event_id in self._table
+
+    def __getitem__(self, event_id: int) -> schemas.Event:
+        """Возвращает событие по его ID."""
+        return self._table[event_id]
+
+    def __len__(self) -> int:
+        """Возвращает количество событий в хранилище."""
+        return len(self._table)
+
+    def get_fields(
+        self, event_id: int
+    ) -> tuple[int, decimal.Decimal | None, int | None, int]:
+        """Возвращает поля события без сборки его объекта."""
+        table = self._table
+        row = table.row(event_id)
+        if row < 0:
+            raise KeyError(event_id)
+
+        deadline = table.deadlines[row]
+        return (
+            event_id,
+            unpack_coefficient(table.coefficients[row]),
+            None if deadline == NULL else deadline,
+            table.states[row],
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        """Перебирает ID событий."""
+        return iter(self._table.ids)
+
+    def values(self) -> Iterable[schemas.Event]:
+        """Возвращает все события."""
+        table = self._table
+        return [table.build(row) for row in range(len(table))]
+
+    def _insert(self, events: list[schemas.Event]) -> None:
+        """Сохраняет новые события."""
+        for event in events:
+            if event.event_id in self._table:
+                self._table.remove(event.event_id)
+        self._table.append(events)
+
+    def _assign(self, event_id: int, fields: dict[str, Any]) -> int | None:
+        """Записывает новые значения полей события."""
+        table = self._table
+        row = table.row(event_id)
+        deadline = table.deadlines[row]
+
+        if "coefficient" in fields:
+            table.coefficients[row] = pack_coefficient(fields["coefficient"])
+        if "deadline" in fields:
+            value = fields["deadline"]
+            table.deadlines[row] = NULL if value is None else value
+        if "state" in fields:
+            table.states[row] = fields["state"]
+
+        return None if deadline == NULL else deadline
+
+    def _remove(self, event_id: int) -> schemas.Event:
+        """Удаляет событие."""
+        return self._table.remove(event_id)
+
+    def to_columns(self) -> EventColumns:
+        """Возвращает все события в колоночном представлении."""
+        table = self._table
+        base, positions = table.base, table.positions
+        rows = [positions[event_id - base] for event_id in self.deadlines]
+        if len(rows) < len(table):
+            rows.extend(
+                row for row, value in enumerate(table.deadlines) if value == NULL
+            )
+        return table.select(rows)
+
+    def load_columns(self, columns: EventColumns) -> None:
+        """Загружает события из колоночного представления без сборки объектов."""
+        if not columns.ids:
+            return
+
+        self._table.extend(columns)
+
+        keys = list(zip(columns.deadlines, columns.ids))
+        if NULL in columns.deadlines:
+            keys = [key for key in keys if key[0] != NULL]
+        self.deadlines.add_keys(keys)
+
+        self.advance_ids(max(columns.ids))
+
+    def add_columns(self, columns: EventColumns) -> None:
+        """Сохраняет пачку новых событий, копируя колонки напрямую.
+
+        Подписчики получают события пачки в виде `ColumnEvents`.
+        """
+        if not columns.ids:
+            return
+
+        self.load_columns(columns)
+        self._notify(Mutation.PUT, ColumnEvents(columns))
+
+    def _remove_all(self) -> list[schemas.Event]:
+        """Удаляет все события."""
+        deleted_events = list(self.values())
+        self._table.clear()
+        return deleted_events
+
+
+class SharedEventStore(BaseEventStore):
+    """Хранилище событий в разделяемой памяти для нескольких процессов.
+
+    События хранятся в таблице `shm.SharedTable`, которую отображают в память
+    все рабочие процессы сервиса, поэтому чтение идет без копирования и без
+    блокировок. Изменения, последовательность ID, версия и эпоха общие
+    для всех процессов: запись идет под межпроцессной блокировкой, которая
+    сериализует изменения и выдачу ID.
+
+    Строка события адресуется его ID, поэтому `capacity` — жесткий предел
+    количества ID, выданных за все время жизни таблицы, включая удаленные
+    события: после него новые события не создаются, пока файл таблицы
+    не удален. Полные проходы (`values`, `__iter__`, перестроение индекса)
+    идут по всем выданным ID, а не только по хранимым событиям, и каждый
+    процесс держит свой массив дедлайнов по 8 байт на строку таблицы.
+
+    Индекс по дедлайну у каждого процесса свой. Процесс догоняет изменения
+    других процессов в `sync` по кольцу изменений таблицы: перестраивает
+    индекс и уведомляет подписчиков с версиями этих изменений. Подписчики
+    получают текущее состояние затронутых событий, а не состояние на момент
+    изменения. Если кольцо переполнилось или все события были удалены,
+    индекс строится заново без уведомления подписчиков, и они сбрасываются
+    сами по скачку версии.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        capacity: int = config.EVENT_SHM_CAPACITY,
+        ring_size: int = config.EVENT_SHM_RING_SIZE,
+        sync_interval: float = config.EVENT_SHM_SYNC_INTERVAL,
+    ):
+        """Инициализация.
+
+        Args:
+            path: Путь к файлу таблицы; без него хранилище видно только
+                этому процессу.
+            capacity: Наибольший ID события.
+            ring_size: Количество записей в кольце изменений.
+            sync_interval: Период фоновой проверки изменений других
+                процессов, сек.
+        """
+        super().__init__()
+        self.table = shm.SharedTable(path, capacity, ring_size)
+        self.sync_interval = sync_interval
+        self.epoch = f"{self.table.epoch:x}"
+
+        self.remote_changes = 0
+        self.resyncs = 0
+
+        # Дедлайн, с которым строка учтена в индексе этого процесса
+        self._indexed = array.array("q", [NULL]) * capacity
+        # Количество записей кольца, уже примененных этим процессом
+        self._cursor = 0
+        self._task: asyncio.Task | None = None
+
+        with self.table.locked():
+            self._rebuild()
+
+    @property
+    def last_id(self) -> int:
+        """Последний выданный ID события."""
+        return self.table.last_id
+
+    def advance_ids(self, event_id: int) -> None:
+        """Сдвигает последовательность ID так, чтобы она не выдала переданный ID."""
+        with self.table.locked():
+            self.table.last_id = max(self.table.last_id, event_id)
+
+    @property
+    def free_ids(self) -> int:
+        """Количество ID, которые еще можно выдать."""
+        return self.table.capacity - self.table.last_id
+
+    def next_ids(self, number: int = 1) -> range:
+        """Резервирует диапазон новых ID событий.
+
+        Raises:
+            ValueError: Если ID не помещаются в таблицу.
+        """
+        with self.table.locked():
+            start = self.table.last_id + 1
+            if start + number - 1 > self.table.capacity:
+                raise ValueError(
+                    f"Shared event table is full: {self.table.capacity} event IDs"
+                )
+            self.table.last_id += number
+
+        return range(start, start + number)
+
+    def _row(self, event_id: int) -> int:
+        """Возвращает номер строки события.
+
+        Args:
+            event_id: ID события.
+
+        Raises:
+            ValueError: Если ID не помещается в таблицу.
+
+        Returns:
+            Номер строки.
+        """
+        if not 0 < event_id <= self.table.capacity:
+            raise ValueError(
+                f"Event ID {event_id} is outside the shared event table "
+                f"(1..{self.table.capacity})"
+            )
+        return event_id - 1
+
+    def _build(self, row: int) -> schemas.Event:
+        """Собирает объект события из строки таблицы.
+
+        Args:
+            row: Номер строки.
+
+        Returns:
+            Объект события.
+        """
+        return build_event(row + 1, *self.table.read_row(row))
+
+    def _present_rows(self) -> Iterator[int]:
+        """Перебирает номера строк хранимых событий."""
+        present = self.table.present
+        return (row for row in range(self.table.last_id) if present[row])
+
+    def __contains__(self, event_id: int) -> bool:
+        """Проверяет наличие события в хранилище."""
+        return 0 < event_id <= self.table.capacity and bool(
+            self.table.present[event_id - 1]
+        )
+
+    def __getitem__(self, event_id: int) -> schemas.Event:
+        """Возвращает событие по его ID."""
+        if event_id not in self:
+            raise KeyError(event_id)
+        return self._build(event_id - 1)
+
+    def __len__(self) -> int:
+        """Возвращает количество событий в хранилище."""
+        return self.table.count
+
+    def __iter__(self) -> Iterator[int]:
+        """Перебирает ID событий."""
+        return (row + 1 for row in self._present_rows())
+
+    def values(self) -> Iterable[schemas.Event]:
+        """Возвращает все события."""
+        return [self._build(row) for row in self._present_rows()]
+
+    def get_fields(
+        self, event_id: int
+    ) -> tuple[int, decimal.Decimal | None, int | None, int]:
+        """Возвращает поля события без сборки его объекта."""
+        if event_id not in self:
+            raise KeyError(event_id)
+
+        coefficient, deadline, state = self.table.read_row(event_id - 1)
+        return (
+            event_id,
+            unpack_coefficient(coefficient),
+            None if deadline == NULL else deadline,
+            state,
+        )
+
+    def _insert(self, events: list[schemas.Event]) -> None:
+        """Сохраняет новые события.
+
+        Признак наличия записывается последним, чтобы читающие без
+        блокировки процессы не увидели недописанную строку нового события,
+        а поля переписываются под счетчиком записи строки.
+        """
+        rows = [self._row(event.event_id) for event in events]
+
+        table = self.table
+        for row, event in zip(rows, events):
+            if table.present[row]:
+                self.deadlines.remove(row + 1, self._deadline(row))
+            else:
+                table.count += 1
+
+            deadline = NULL if event.deadline is None else event.deadline
+            with table.write_row(row):
+                table.coefficients[row] = pack_coefficient(event.coefficient)
+                table.deadlines[row] = deadline
+                table.states[row] = event.state
+            table.present[row] = 1
+            self._indexed[row] = deadline
+
+    def _deadline(self, row: int) -> int | None:
+        """Возвращает дедлайн строки, учтенный в индексе этого процесса."""
+        deadline = self._indexed[row]
+        return None if deadline == NULL else deadline
+
+    def _assign(self, event_id: int, fields: dict[str, Any]) -> int | None:
+        """Записывает новые значения полей события."""
+        if event_id not in self:
+            raise KeyError(event_id)
+
+        row = event_id - 1
+        table = self.table
+        deadline = self._deadline(row)
+
+        with table.write_row(row):
+            if "coefficient" in fields:
+                table.coefficients[row] = pack_coefficient(fields["coefficient"])
+            if "deadline" in fields:
+                value = fields["deadline"]
+                table.deadlines[row] = NULL if value is None else value
+            if "state" in fields:
+                table.states[row] = fields["state"]
+        self._indexed[row] = table.deadlines[row]
+
+        return deadline
+
+    def _remove(self, event_id: int) -> schemas.Event:
+        """Удаляет событие.
+
+        Поля строки сохраняются: по ним другие процессы уведомляют своих
+        подписчиков об удалении.
+        """
+        if event_id not in self:
+            raise KeyError(event_id)
+
+        row = event_id - 1
+        event = self._build(row)
+        self.table.present[row] = 0
+        self.table.count -= 1
+        self._indexed[row] = NULL
+        return event
+
+    def _remove_all(self) -> list[schemas.Event]:
+        """Удаляет все события."""
+        table = self.table
+        deleted_events = []
+        for row in list(self._present_rows()):
+            deleted_events.append(self._build(row))
+            table.present[row] = 0
+            self._indexed[row] = NULL
+        table.count = 0
+        return deleted_events
+
+    @contextlib.contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Захватывает блокировку записи, предварительно догоняя таблицу."""
+        with self.table.locked():
+            self._sync_locked()
+            yield
+
+    def add_many(self, events: Iterable[schemas.Event]) -> None:
+        """Сохраняет пачку новых событий."""
+        with self._writing():
+            super().add_many(events)
+
+    def update(self, event_id: int, fields: dict[str, Any]) -> schemas.Event:
+        """Обновляет поля события."""
+        with self._writing():
+            return super().update(event_id, fields)
+
+    def delete(self, event_id: int) -> schemas.Event:
+        """Удаляет событие из хранилища."""
+        with self._writing():
+            return super().delete(event_id)
+
+    def clear(self) -> list[schemas.Event]:
+        """Удаляет все события из хранилища."""
+        with self._writing():
+            return super().clear()
+
+    def archive(self, event_ids: Iterable[int]) -> list[schemas.Event]:
+        """Убирает события из хранилища в архив."""
+        with self._writing():
+            return super().archive(event_ids)
+
+    def _notify(self, mutation: Mutation, events: Sequence[schemas.Event]) -> None:
+        """Записывает изменение в кольцо таблицы и уведомляет подписчиков.
+
+        Вызывается под блокировкой записи, когда процесс уже догнал таблицу,
+        поэтому версия процесса совпадает с версией таблицы.
+        """
+        if mutation is Mutation.CLEAR:
+            event_ids = [shm.ALL_EVENTS]
+        elif isinstance(events, ColumnEvents):
+            event_ids = events.columns.ids
+        else:
+            event_ids = [event.event_id for event in events]
+
+        table = self.table
+        table.append_changes(self.version + 1, mutation, event_ids)
+        table.version = self.version + 1
+        self._cursor = table.ring_head
+
+        super()._notify(mutation, events)
+
+    def sync(self) -> None:
+        """Догоняет изменения, сделанные другими процессами."""
+        if self.table.version != self.version:
+            with self.table.locked():
+                self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        """Применяет изменения из кольца таблицы. Вызывается под блокировкой."""
+        table = self.table
+        if table.version == self.version:
+            return
+
+        changes = table.read_changes(self._cursor)
+        if (
+            not changes
+            or changes[0][0] != self.version + 1
+            or any(event_id == shm.ALL_EVENTS for _, _, event_id in changes)
+        ):
+            self._rebuild()
+            self.resyncs += 1
+            return
+
+        for version, group in itertools.groupby(changes, key=operator.itemgetter(0)):
+            group = list(group)
+            event_ids = [event_id for _, _, event_id in group]
+            self._reindex(event_ids)
+
+            self.version = version - 1
+            BaseEventStore._notify(
+                self, Mutation(group[0][1]), ColumnEvents(self._columns(event_ids))
+            )
+            self.remote_changes += 1
+
+        self._cursor = table.ring_head
+
+    def _reindex(self, event_ids: list[int]) -> None:
+        """Приводит индекс по дедлайну к текущему состоянию строк.
+
+        Args:
+            event_ids: ID изменившихся событий.
+        """
+        table, indexed = self.table, self._indexed
+        for event_id in event_ids:
+            row = event_id - 1
+            deadline = table.deadlines[row] if table.present[row] else NULL
+            if indexed[row] != deadline:
+                self.deadlines.remove(event_id, self._deadline(row))
+                if deadline != NULL:
+                    self.deadlines.add(event_id, deadline)
+                indexed[row] = deadline
+
+    def _columns(self, event_ids: list[int]) -> EventColumns:
+        """Возвращает строки событий в колоночном представлении.
+
+        Args:
+            event_ids: ID событий.
+
+        Returns:
+            Колонки событий.
+        """
+        table = self.table
+        rows = [event_id - 1 for event_id in event_ids]
+        return EventColumns(
+            ids=array.array("q", event_ids),
+            coefficients=array.array("q", map(table.coefficients.__getitem__, rows)),
+            deadlines=array.array("q", map(table.deadlines.__getitem__, rows)),
+            states=array.array("b", map(table.states.__getitem__, rows)),
+        )
+
+    def _rebuild(self) -> None:
+        """Строит индекс по дедлайну заново по всей таблице.
+
+        Подписчики не уведомляются. Вызывается под блокировкой.
+        """
+        table = self.table
+        indexed = self._indexed = array.array("q", [NULL]) * table.capacity
+
+        keys = []
+        for row in self._present_rows():
+            deadline = indexed[row] = table.deadlines[row]
+            if deadline != NULL:
+                keys.append((deadline, row + 1))
+
+        self.deadlines.clear()
+        self.deadlines.add_keys(keys)
+        self.version = table.version
+        self._cursor = table.ring_head
+
+    async def _run(self) -> None:
+        """Периодически догоняет изменения других процессов."""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            self.sync()
+
+    def start(self) -> None:
+        """Запускает фоновую проверку изменений других процессов.
+
+        Без нее процесс догоняет таблицу только при обработке запросов,
+        и потоки `/event/stream` не получали бы чужие изменения.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновую проверку изменений."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        """Возвращает статистику таблицы."""
+        return {
+            "capacity": self.table.capacity,
+            "last_id": self.table.last_id,
+            "free_ids": self.free_ids,
+            "events": self.table.count,
+            "version": self.table.version,
+            "remote_changes": self.remote_changes,
+            "resyncs": self.resyncs,
+        }
+
+
+STORE_BACKENDS: dict[str, type[BaseEventStore]] = {
+    "dict": DictEventStore,
+    "columnar": ColumnarEventStore,
+    "shared": SharedEventStore,
+}
 
-    events.update(generated_events)
 
-    return generated_events
+if config.EVENT_STORE_BACKEND == "shared":
+    events = SharedEventStore(config.EVENT_SHM_PATH)
+else:
+    events = STORE_BACKENDS[config.EVENT_STORE_BACKEND]()
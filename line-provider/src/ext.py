@@ -5,11 +5,23 @@ import httpx
 import config
 
 
-async def send_event_update(payload: str) -> None:
+async def send_event_update(
+    client_session: httpx.AsyncClient, content: bytes, content_type: str
+) -> None:
     """Отправляет уведомление в сервис `bet-maker` об обноволенном событии.
 
     Args:
-        payload: JSON-объект с отправляемыми данными.
+        client_session: Клиентская сессия.
+        content: Закодированная пачка событий.
+        content_type: MIME-тип формата пачки.
+
+    Raises:
+        httpx.HTTPError: Если уведомление не доставлено.
     """
-    async with httpx.AsyncClient() as session:
-        await session.post(f"{config.BET_MAKER_URL}updated", json=payload)
+    response = await client_session.post(
+        f"{config.BET_MAKER_URL}updated",
+        content=content,
+        headers={"Content-Type": content_type},
+        extensions={"route": "/updated"},
+    )
+    response.raise_for_status()
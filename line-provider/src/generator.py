@@ -0,0 +1,298 @@
+"""Генератор событий для нагрузочного тестирования.
+
+Коэффициенты и дедлайны генерируются сразу всей пачкой из генератора
+псевдослучайных чисел с зерном, поэтому при одном и том же зерне получается
+одна и та же линия событий. Пачка записывается в хранилище в колоночном
+представлении, без создания объектов событий по одному.
+
+Значения генерируются векторно средствами NumPy, который входит в
+зависимости сервиса. Без NumPy, например при запуске генератора в окружении
+без него, используется стандартный модуль `random`. Последовательности у них
+разные, поэтому воспроизводимость гарантируется только в пределах одной
+реализации.
+
+Запуск из каталога `src`:
+
+    python generator.py 1000000 --seed 42 --storage-dir /data/events
+"""
+
+import argparse
+import array
+import asyncio
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass
+
+import config
+import events
+import schemas
+import storage
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+COEFFICIENT_DISTRIBUTIONS = {"uniform", "lognormal"}
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """Распределения значений генерируемых событий."""
+
+    # Распределение коэффициентов: "uniform" или "lognormal"
+    coefficient: str = config.GENERATOR_COEFFICIENT_DISTRIBUTION
+    # Границы коэффициентов; логнормальные значения обрезаются по ним
+    min_coefficient: float = config.GENERATOR_MIN_COEFFICIENT
+    max_coefficient: float = config.GENERATOR_MAX_COEFFICIENT
+    # Медиана и стандартное отклонение логарифма для "lognormal"
+    coefficient_median: float = config.GENERATOR_COEFFICIENT_MEDIAN
+    coefficient_sigma: float = config.GENERATOR_COEFFICIENT_SIGMA
+    # Границы дедлайнов относительно момента генерации, сек
+    min_deadline_offset: int = config.GENERATOR_MIN_DEADLINE_OFFSET
+    max_deadline_offset: int = config.GENERATOR_MAX_DEADLINE_OFFSET
+
+    def __post_init__(self):
+        """Проверка параметров.
+
+        Raises:
+            ValueError: Если параметры распределений некорректны.
+        """
+        if self.coefficient not in COEFFICIENT_DISTRIBUTIONS:
+            raise ValueError(f"Unknown coefficient distribution: {self.coefficient}")
+        if not 0.01 <= self.min_coefficient <= self.max_coefficient:
+            raise ValueError("Coefficient bounds must satisfy 0.01 <= min <= max")
+        if self.coefficient_median <= 0 or self.coefficient_sigma < 0:
+            raise ValueError("Coefficient median must be positive, sigma non-negative")
+        if not 0 < self.min_deadline_offset <= self.max_deadline_offset:
+            raise ValueError("Deadline offsets must satisfy 0 < min <= max")
+
+
+def _generate_numpy(
+    event_ids: range, seed: int | None, distribution: Distribution, now: int
+) -> events.EventColumns:
+    """Генерирует колонки событий средствами NumPy.
+
+    Строки упорядочиваются по дедлайну, поэтому индекс дедлайнов хранилища
+    дополняется уже отсортированными ключами.
+
+    Args:
+        event_ids: ID событий.
+        seed: Зерно генератора.
+        distribution: Распределения значений.
+        now: Момент, от которого отсчитываются дедлайны.
+
+    Returns:
+        Колонки событий.
+    """
+    number = len(event_ids)
+    rng = numpy.random.default_rng(seed)
+
+    if distribution.coefficient == "uniform":
+        values = rng.uniform(
+            distribution.min_coefficient, distribution.max_coefficient, number
+        )
+    else:
+        values = rng.lognormal(
+            math.log(distribution.coefficient_median),
+            distribution.coefficient_sigma,
+            number,
+        )
+    coefficients = numpy.clip(
+        numpy.rint(values * 100),
+        round(distribution.min_coefficient * 100),
+        round(distribution.max_coefficient * 100),
+    ).astype(numpy.int64)
+
+    deadlines = now + rng.integers(
+        distribution.min_deadline_offset,
+        distribution.max_deadline_offset,
+        number,
+        dtype=numpy.int64,
+        endpoint=True,
+    )
+    ids = numpy.arange(event_ids.start, event_ids.stop, dtype=numpy.int64)
+
+    order = numpy.lexsort((ids, deadlines))
+    return events.EventColumns(
+        ids=array.array("q", ids[order].tobytes()),
+        coefficients=array.array("q", coefficients[order].tobytes()),
+        deadlines=array.array("q", deadlines[order].tobytes()),
+        states=array.array("b", [schemas.EventState.NEW]) * number,
+    )
+
+
+def _generate_python(
+    event_ids: range, seed: int | None, distribution: Distribution, now: int
+) -> events.EventColumns:
+    """Генерирует колонки событий модулем `random`.
+
+    Args:
+        event_ids: ID событий.
+        seed: Зерно генератора.
+        distribution: Распределения значений.
+        now: Момент, от которого отсчитываются дедлайны.
+
+    Returns:
+        Колонки событий.
+    """
+    number = len(event_ids)
+    rnd = random.Random(seed)
+    low = round(distribution.min_coefficient * 100)
+    high = round(distribution.max_coefficient * 100)
+
+    if distribution.coefficient == "uniform":
+        uniform = rnd.uniform
+        values = (uniform(low, high) for _ in range(number))
+    else:
+        lognormvariate = rnd.lognormvariate
+        mu = math.log(distribution.coefficient_median * 100)
+        sigma = distribution.coefficient_sigma
+        values = (lognormvariate(mu, sigma) for _ in range(number))
+
+    randint = rnd.randint
+    min_deadline = now + distribution.min_deadline_offset
+    max_deadline = now + distribution.max_deadline_offset
+
+    return events.EventColumns(
+        ids=array.array("q", event_ids),
+        coefficients=array.array(
+            "q", (min(max(round(value), low), high) for value in values)
+        ),
+        deadlines=array.array(
+            "q", (randint(min_deadline, max_deadline) for _ in range(number))
+        ),
+        states=array.array("b", [schemas.EventState.NEW]) * number,
+    )
+
+
+def generate_columns(
+    event_ids: range,
+    seed: int | None = None,
+    distribution: Distribution | None = None,
+    now: int | None = None,
+) -> events.EventColumns:
+    """Генерирует новые события в колоночном представлении.
+
+    Args:
+        event_ids: ID событий.
+        seed: Зерно генератора; без него значения не воспроизводятся.
+        distribution: Распределения значений.
+        now: Момент, от которого отсчитываются дедлайны.
+
+    Returns:
+        Колонки событий.
+    """
+    distribution = distribution or Distribution()
+    now = int(time.time()) if now is None else now
+
+    if numpy is None:
+        return _generate_python(event_ids, seed, distribution, now)
+    return _generate_numpy(event_ids, seed, distribution, now)
+
+
+def generate(
+    number: int = 1,
+    seed: int | None = None,
+    distribution: Distribution | None = None,
+    store: events.BaseEventStore = events.events,
+) -> range:
+    """Генерирует события в переданном количестве и сохраняет их в хранилище.
+
+    Args:
+        number: Количество событий.
+        seed: Зерно генератора.
+        distribution: Распределения значений.
+        store: Хранилище событий.
+
+    Returns:
+        ID сгенерированных событий.
+    """
+    event_ids = store.next_ids(number)
+    store.add_columns(generate_columns(event_ids, seed, distribution))
+    return event_ids
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Генерирует события и сохраняет их в снимок хранилища.
+
+    Args:
+        argv: Аргументы командной строки.
+    """
+    parser = argparse.ArgumentParser(description="Generate events for load testing")
+    parser.add_argument("number", type=int, help="number of events")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--coefficient",
+        choices=sorted(COEFFICIENT_DISTRIBUTIONS),
+        default=config.GENERATOR_COEFFICIENT_DISTRIBUTION,
+    )
+    parser.add_argument(
+        "--min-coefficient", type=float, default=config.GENERATOR_MIN_COEFFICIENT
+    )
+    parser.add_argument(
+        "--max-coefficient", type=float, default=config.GENERATOR_MAX_COEFFICIENT
+    )
+    parser.add_argument(
+        "--coefficient-median", type=float, default=config.GENERATOR_COEFFICIENT_MEDIAN
+    )
+    parser.add_argument(
+        "--coefficient-sigma", type=float, default=config.GENERATOR_COEFFICIENT_SIGMA
+    )
+    parser.add_argument(
+        "--min-deadline-offset", type=int, default=config.GENERATOR_MIN_DEADLINE_OFFSET
+    )
+    parser.add_argument(
+        "--max-deadline-offset", type=int, default=config.GENERATOR_MAX_DEADLINE_OFFSET
+    )
+    parser.add_argument(
+        "--storage-dir",
+        default=config.EVENT_STORAGE_DIR,
+        help="directory with the event snapshot; events are appended to it",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        distribution = Distribution(
+            coefficient=args.coefficient,
+            min_coefficient=args.min_coefficient,
+            max_coefficient=args.max_coefficient,
+            coefficient_median=args.coefficient_median,
+            coefficient_sigma=args.coefficient_sigma,
+            min_deadline_offset=args.min_deadline_offset,
+            max_deadline_offset=args.max_deadline_offset,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+
+    # Снимок не зависит от способа хранения, а колоночное хранилище
+    # принимает пачку без создания объектов событий
+    store = events.ColumnarEventStore()
+    journal = None
+    if args.storage_dir:
+        journal = storage.EventJournal(args.storage_dir)
+        journal.open(store)
+
+    # События сразу попадают в снимок, поэтому журналировать их по одному
+    # не нужно
+    started_at = time.perf_counter()
+    with store.muted():
+        event_ids = generate(args.number, args.seed, distribution, store)
+    elapsed = time.perf_counter() - started_at
+
+    if journal is not None:
+        asyncio.run(journal.stop())
+
+    print(
+        f"generated {len(event_ids)} events "
+        f"(ids {event_ids.start}..{event_ids.stop - 1}) in {elapsed:.3f} s, "
+        f"{'numpy' if numpy is not None else 'random'} backend",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Модуль фоновой доставки уведомлений сервису `bet-maker`."""
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+import httpx
+
+import config
+import ext
+import metrics
+import schemas
+import serialization
+
+
+@dataclass
+class PendingUpdate:
+    """Ожидающее доставки изменение события."""
+
+    payload: dict
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+class EventOutbox:
+    """Очередь уведомлений об изменениях событий.
+
+    Изменения одного события, накопившиеся за окно объединения, схлопываются
+    до последнего состояния и отправляются одним пакетным запросом через
+    общую keep-alive сессию. Вызывающий код не ждет доставки.
+    """
+
+    def __init__(
+        self,
+        coalesce_window: float = config.NOTIFY_COALESCE_WINDOW,
+        max_batch: int = config.NOTIFY_MAX_BATCH,
+        retry_base_delay: float = config.NOTIFY_RETRY_BASE_DELAY,
+        retry_max_delay: float = config.NOTIFY_RETRY_MAX_DELAY,
+        max_attempts: int = config.NOTIFY_MAX_ATTEMPTS,
+        enabled: bool = config.NOTIFY_ENABLED,
+        content_type: str = config.NOTIFY_CONTENT_TYPE,
+    ):
+        """Инициализация.
+
+        Args:
+            coalesce_window: Окно объединения изменений, сек.
+            max_batch: Максимальное количество событий в одном запросе.
+            retry_base_delay: Начальная задержка повторной отправки, сек.
+            retry_max_delay: Максимальная задержка повторной отправки, сек.
+            max_attempts: Количество попыток, после которого изменение
+                отбрасывается.
+            enabled: Отправлять ли уведомления; если нет, изменения
+                не ставятся в очередь.
+            content_type: MIME-тип формата уведомлений.
+        """
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        self.content_type = content_type
+
+        self.session: httpx.AsyncClient | None = None
+        self.pending: dict[int, PendingUpdate] = {}
+
+        self.sent_batches = 0
+        self.sent_events = 0
+        self.failed_batches = 0
+        self.dropped_events = 0
+        self.last_latency: float | None = None
+        self.max_latency: float | None = None
+        self._latency_total = 0.0
+
+        self._failures = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def put(self, events: Iterable[schemas.Event]) -> None:
+        """Ставит изменения событий в очередь на отправку.
+
+        Args:
+            events: Изменившиеся события.
+        """
+        if not self.enabled:
+            return
+
+        for event in events:
+            pending = self.pending.get(event.event_id)
+            if pending is None:
+                self.pending[event.event_id] = PendingUpdate(
+                    serialization.dump_event(event)
+                )
+            else:
+                pending.payload = serialization.dump_event(event)
+
+        self._wakeup.set()
+
+    def _take_batch(self) -> dict[int, PendingUpdate]:
+        """Извлекает из очереди очередную пачку изменений."""
+        batch = {}
+        for event_id in list(self.pending)[: self.max_batch]:
+            batch[event_id] = self.pending.pop(event_id)
+        return batch
+
+    def _requeue(self, batch: dict[int, PendingUpdate]) -> None:
+        """Возвращает недоставленную пачку в очередь.
+
+        Изменения, уже вытесненные более свежими, не возвращаются.
+
+        Args:
+            batch: Недоставленная пачка.
+        """
+        for event_id, pending in batch.items():
+            pending.attempts += 1
+            if event_id in self.pending:
+                continue
+            if pending.attempts >= self.max_attempts:
+                self.dropped_events += 1
+            else:
+                self.pending[event_id] = pending
+
+    async def _send(self, batch: dict[int, PendingUpdate]) -> None:
+        """Отправляет пачку изменений.
+
+        Args:
+            batch: Пачка изменений.
+
+        Raises:
+            httpx.HTTPError: Если уведомление не доставлено.
+        """
+        assert self.session is not None
+        await ext.send_event_update(
+            self.session,
+            serialization.encode(
+                {"events": [pending.payload for pending in batch.values()]},
+                self.content_type,
+            ),
+            self.content_type,
+        )
+
+        now = time.monotonic()
+        for pending in batch.values():
+            latency = now - pending.enqueued_at
+            self._latency_total += latency
+            self.max_latency = max(self.max_latency or 0.0, latency)
+            self.last_latency = latency
+
+        self.sent_batches += 1
+        self.sent_events += len(batch)
+
+    async def _run(self) -> None:
+        """Доставляет накопленные изменения."""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.coalesce_window)
+
+            while self.pending:
+                batch = self._take_batch()
+                try:
+                    await self._send(batch)
+                except httpx.HTTPError:
+                    self.failed_batches += 1
+                    self._requeue(batch)
+
+                    delay = self.retry_base_delay * 2**self._failures
+                    self._failures += 1
+                    await asyncio.sleep(min(delay, self.retry_max_delay))
+                else:
+                    self._failures = 0
+
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """Открывает клиентскую сессию и запускает доставку."""
+        if self.session is None:
+            self.session = httpx.AsyncClient(
+                timeout=config.NOTIFY_TIMEOUT,
+                transport=metrics.InstrumentedTransport(peer="bet-maker"),
+            )
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает доставку, пытаясь один раз отправить остаток очереди."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        if self.session is not None:
+            while self.pending:
+                batch = self._take_batch()
+                try:
+                    await self._send(batch)
+                except httpx.HTTPError:
+                    self.dropped_events += len(batch)
+
+            await self.session.aclose()
+            self.session = None
+
+    def stats(self) -> dict[str, int | float | None]:
+        """Возвращает статистику доставки."""
+        return {
+            "queue_depth": len(self.pending),
+            "sent_batches": self.sent_batches,
+            "sent_events": self.sent_events,
+            "failed_batches": self.failed_batches,
+            "dropped_events": self.dropped_events,
+            "last_latency": self.last_latency,
+            "avg_latency": (
+                self._latency_total / self.sent_events if self.sent_events else None
+            ),
+            "max_latency": self.max_latency,
+        }
+
+
+outbox = EventOutbox()
@@ -1,43 +1,281 @@
 """Модуль с роутерами."""
 
 import decimal
-import json
 import time
+from collections.abc import Iterable
 from http import HTTPStatus
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
-import ext
+import config
+import generator
 import schemas
-from events import events, generate
+import serialization
+from archive import event_archive
+from changes import change_log
+from events import events
+from outbox import outbox
+
+
+async def sync_events() -> None:
+    """Догоняет изменения событий, сделанные другими рабочими процессами."""
+    events.sync()
+
+
+# Хранилище в разделяемой памяти меняют все рабочие процессы, поэтому перед
+# обработкой запроса процесс догоняет чужие изменения
+router = APIRouter(
+    prefix="/event",
+    tags=["event"],
+    dependencies=(
+        [Depends(sync_events)] if config.EVENT_STORE_BACKEND == "shared" else []
+    ),
+)
+update_callback_router = APIRouter()
 
 
-router = APIRouter(prefix="/event", tags=["event"])
-update_callback_router = APIRouter()
+def make_etag(*parts: int | str) -> str:
+    """Формирует ETag по версии хранилища событий.
+
+    Args:
+        parts: Дополнительные величины, от которых зависит ответ.
+
+    Returns:
+        Значение заголовка `ETag`.
+    """
+    return '"{}"'.format("-".join(map(str, (events.epoch, events.version, *parts))))
+
+
+def set_listing_headers(response: Response, etag: str) -> None:
+    """Передает в заголовках ответа ETag, эпоху и версию хранилища событий.
+
+    По эпохе и версии потребитель затем получает изменения из `/event/changes`.
+
+    Args:
+        response: Объект ответа.
+        etag: ETag ответа.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Vary"] = "Accept"
+    response.headers["X-Events-Epoch"] = events.epoch
+    response.headers["X-Events-Version"] = str(events.version)
+
+
+def listing_response(
+    response: Response, media_type: str, etag: str, event_ids: Iterable[int]
+) -> list[schemas.Event] | Response:
+    """Формирует ответ со списком событий в выбранном формате.
+
+    Если включен кэш закодированных событий, ответ собирается из готовых
+    байтов, минуя валидацию и сериализацию моделей.
+
+    Args:
+        response: Объект ответа.
+        media_type: MIME-тип ответа.
+        etag: ETag ответа.
+        event_ids: ID событий.
+
+    Returns:
+        Список событий для ответа в JSON или готовый ответ.
+    """
+    if serialization.encoded_events.enabled:
+        content = serialization.encoded_events.encode(event_ids, media_type)
+    elif media_type == serialization.MSGPACK:
+        content = serialization.encode_events(
+            map(events.__getitem__, event_ids), media_type
+        )
+    else:
+        set_listing_headers(response, etag)
+        return [events[event_id] for event_id in event_ids]
+
+    response = Response(content, media_type=media_type)
+    set_listing_headers(response, etag)
+    return response
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Проверяет, есть ли у клиента актуальная версия ответа.
+
+    Args:
+        request: Объект запроса.
+        etag: Текущий ETag ответа.
+
+    Returns:
+        True, если ETag совпадает с одним из переданных в `If-None-Match`.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
 
 
 @router.get("/new")
-async def get_new_events() -> list[schemas.Event]:
+async def get_new_events(
+    request: Request,
+    response: Response,
+    limit: int | None = Query(default=None, ge=1),
+    after: int | None = None,
+) -> list[schemas.Event]:
     """Возвращает список событий, на которые можно совершить ставку.
 
     Таковыми считаются все события, для которых ещё не наступил дедлайн для ставок.
+    События упорядочены по дедлайну; для постраничного получения следующей
+    страницы в `after` передается ID последнего полученного события.
+    Если список не изменился с версии из `If-None-Match`, возвращается 304.
+    Клиенты, передающие `Accept: application/msgpack`, получают MessagePack.
+    \f
+    Args:
+        request: Объект запроса.
+        response: Объект ответа.
+        limit: Максимальное количество событий.
+        after: ID события, после которого начинается страница.
+
+    Raises:
+        HTTPException: Если событие-курсор не найдено или у него нет дедлайна.
+
+    Returns:
+        Список событий.
     """
-    return [
-        event
-        for event in events.values()
-        if event.deadline and int(time.time()) < event.deadline
-    ]
+    # Список меняется не только при изменении хранилища, но и с истечением
+    # дедлайнов, поэтому в ETag входит и количество уже закрытых событий
+    media_type = serialization.negotiate(request.headers.get("accept"))
+    timestamp = int(time.time())
+    etag = make_etag(
+        events.deadlines.closed_before(timestamp), media_type.rpartition("/")[2]
+    )
+    if is_not_modified(request, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={"ETag": etag, "Vary": "Accept"},
+        )
+
+    try:
+        event_ids = events.get_new_ids(limit=limit, after=after, timestamp=timestamp)
+    except KeyError:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Event not found!")
+    except ValueError:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail="Cursor event has no deadline!",
+        )
+
+    return listing_response(response, media_type, etag, event_ids)
 
 
 @router.get("/all")
-async def get_all_events() -> list[schemas.Event]:
-    """Возвращает список всех событий."""
-    return list(events.values())
+async def get_all_events(request: Request, response: Response) -> list[schemas.Event]:
+    """Возвращает список всех событий.
+
+    Если список не изменился с версии из `If-None-Match`, возвращается 304.
+    Клиенты, передающие `Accept: application/msgpack`, получают MessagePack.
+    \f
+    Args:
+        request: Объект запроса.
+        response: Объект ответа.
+
+    Returns:
+        Список событий.
+    """
+    media_type = serialization.negotiate(request.headers.get("accept"))
+    etag = make_etag(media_type.rpartition("/")[2])
+    if is_not_modified(request, etag):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={"ETag": etag, "Vary": "Accept"},
+        )
+
+    return listing_response(response, media_type, etag, events)
+
+
+@router.get("/changes")
+async def get_event_changes(
+    since: int = Query(ge=0), epoch: str | None = None
+) -> schemas.EventChanges:
+    """Возвращает изменения событий, сделанные после переданной версии.
+
+    Изменение `clear` означает удаление всех событий, `archive` — перенос
+    давно завершенных или просроченных событий в архив: они больше не входят
+    в списки, но доступны по `/event/{event_id}`. Если изменения после
+    версии уже вытеснены из журнала или версия относится к другой эпохе
+    (сервис перезапускался), возвращается `resync: true`, и потребителю
+    нужно заново загрузить весь список событий.
+    \f
+    Args:
+        since: Последняя известная потребителю версия.
+        epoch: Эпоха, к которой относится версия.
+
+    Returns:
+        Изменения событий, текущие эпоха и версия.
+    """
+    return change_log.since(since, epoch)
+
+
+@router.get("/stream")
+async def stream_event_changes(
+    request: Request,
+    since: int | None = Query(default=None, ge=0),
+    epoch: str | None = None,
+) -> StreamingResponse:
+    """Передает изменения событий потоком Server-Sent Events.
+
+    ID сообщения имеет вид `<эпоха>:<версия>`; переподключившись с ним
+    в заголовке `Last-Event-ID` (или в параметрах `epoch` и `since`),
+    потребитель получит изменения, пропущенные за время разрыва. Сообщение
+    `resync` означает, что потребителю нужно заново загрузить весь список
+    событий.
+    \f
+    Args:
+        request: Объект запроса.
+        since: Последняя известная потребителю версия.
+        epoch: Эпоха, к которой относится версия.
+
+    Returns:
+        Поток изменений.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        epoch, _, version = last_event_id.rpartition(":")
+        since = int(version) if version.isdigit() else None
+
+    return StreamingResponse(
+        change_log.stream(since, epoch),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/batch")
+async def get_events_batch(
+    event_id: list[int] = Query(default=[], max_length=config.EVENT_BATCH_LIMIT)
+) -> list[schemas.Event]:
+    """Возвращает события по списку ID.
+
+    События, перенесенные в архив, возвращаются из архива; удаленных событий
+    в ответе нет.
+    \f
+    Args:
+        event_id: ID событий.
+
+    Returns:
+        Список найденных событий.
+    """
+    found = []
+    for item in dict.fromkeys(event_id):
+        if item in events:
+            found.append(events[item])
+        elif item in event_archive:
+            found.append(event_archive[item])
+    return found
 
 
 @router.get("/{event_id}")
 async def get_event(event_id: int) -> schemas.Event:
     """Возвращает событие по его ID.
+
+    События, перенесенные в архив, возвращаются из архива.
     \f
     Args:
         event_id: ID события.
@@ -48,23 +286,73 @@ async def get_event(event_id: int) -> schemas.Event:
     Returns:
         Объект события.
     """
-    if event_id not in events:
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Event not found!")
+    if event_id in events:
+        return events[event_id]
+    if event_id in event_archive:
+        return event_archive[event_id]
 
-    return events[event_id]
+    raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Event not found!")
 
 
 @router.post("/generate/{number}")
-async def generate_events(number: int) -> list[schemas.Event]:
+async def generate_events(
+    number: int = Path(ge=0),
+    seed: int | None = None,
+    coefficient_distribution: str = config.GENERATOR_COEFFICIENT_DISTRIBUTION,
+    min_coefficient: float = config.GENERATOR_MIN_COEFFICIENT,
+    max_coefficient: float = config.GENERATOR_MAX_COEFFICIENT,
+    coefficient_median: float = config.GENERATOR_COEFFICIENT_MEDIAN,
+    coefficient_sigma: float = config.GENERATOR_COEFFICIENT_SIGMA,
+    min_deadline_offset: int = config.GENERATOR_MIN_DEADLINE_OFFSET,
+    max_deadline_offset: int = config.GENERATOR_MAX_DEADLINE_OFFSET,
+) -> list[schemas.Event]:
     """Возвращает список сгенерированных событий по переданному количеству.
+
+    При одном и том же `seed` генерируются одни и те же коэффициенты
+    и смещения дедлайнов. Коэффициенты распределены равномерно ("uniform")
+    или логнормально ("lognormal") в заданных границах, дедлайны — равномерно
+    в заданном интервале от текущего момента.
     \f
     Args:
         number: Количество событий, которое необходимо сгенерировать.
+        seed: Зерно генератора.
+        coefficient_distribution: Распределение коэффициентов.
+        min_coefficient: Минимальный коэффициент.
+        max_coefficient: Максимальный коэффициент.
+        coefficient_median: Медиана логнормального распределения.
+        coefficient_sigma: Стандартное отклонение логарифма коэффициента.
+        min_deadline_offset: Минимальное время до дедлайна, сек.
+        max_deadline_offset: Максимальное время до дедлайна, сек.
+
+    Raises:
+        HTTPException: Если параметры распределений некорректны.
 
     Returns:
         Список событий.
     """
-    return list(generate(number).values())
+    try:
+        distribution = generator.Distribution(
+            coefficient=coefficient_distribution,
+            min_coefficient=min_coefficient,
+            max_coefficient=max_coefficient,
+            coefficient_median=coefficient_median,
+            coefficient_sigma=coefficient_sigma,
+            min_deadline_offset=min_deadline_offset,
+            max_deadline_offset=max_deadline_offset,
+        )
+    except ValueError as error:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail=str(error)
+        )
+
+    event_ids = generator.generate(number, seed, distribution)
+
+    if serialization.encoded_events.enabled:
+        return Response(
+            serialization.encoded_events.encode(event_ids, serialization.JSON),
+            media_type=serialization.JSON,
+        )
+    return [events[event_id] for event_id in event_ids]
 
 
 @router.post("/create")
@@ -77,13 +365,15 @@ async def create_event(event: schemas.EventCreate) -> schemas.Event:
     Returns:
         Объект созданного события.
     """
-    event_id = max(events or [0]) + 1
-
-    events[event_id] = schemas.Event(
-        event_id=event_id,
-        coefficient=event.coefficient or round(decimal.Decimal(1), 2),
-        deadline=event.deadline or int(time.time()) + 3600,
-        state=schemas.EventState.NEW,
+    event_id = events.next_id()
+
+    events.add(
+        schemas.Event(
+            event_id=event_id,
+            coefficient=event.coefficient or round(decimal.Decimal(1), 2),
+            deadline=event.deadline or int(time.time()) + 3600,
+            state=schemas.EventState.NEW,
+        )
     )
 
     return events[event_id]
@@ -112,13 +402,10 @@ async def update_event(event: schemas.Event) -> schemas.Event:
 
     is_state_changed = event.state is not events[event.event_id].state
 
-    for p_name, p_value in event.model_dump(exclude_unset=True).items():
-        setattr(events[event.event_id], p_name, p_value)
+    events.update(event.event_id, event.model_dump(exclude_unset=True))
 
     if is_state_changed:
-        await ext.send_event_update(
-            json.dumps({event.event_id: event.model_dump()}, default=float)
-        )
+        outbox.put([events[event.event_id]])
 
     return events[event.event_id]
 
@@ -134,17 +421,11 @@ async def delete_all_events() -> dict:
             status_code=HTTPStatus.NOT_FOUND, detail="There are no events!"
         )
 
-    for _, event in events.items():
+    deleted_events = events.clear()
+    for event in deleted_events:
         event.state = schemas.EventState.DELETED
 
-    await ext.send_event_update(
-        json.dumps(
-            {event.event_id: event.model_dump() for event in events.values()},
-            default=float,
-        )
-    )
-
-    events.clear()
+    outbox.put(deleted_events)
 
     return {"result": True, "message": "All events were successfully deleted!"}
 
@@ -164,12 +445,9 @@ async def delete_event(event_id: int) -> dict:
     if event_id not in events:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Event not found!")
 
-    events[event_id].state = schemas.EventState.DELETED
-
-    await ext.send_event_update(
-        json.dumps({event_id: events[event_id].model_dump()}, default=int)
-    )
+    event = events.delete(event_id)
+    event.state = schemas.EventState.DELETED
 
-    del events[event_id]
+    outbox.put([event])
 
     return {"result": True, "message": f"Event {event_id} was successfully deleted!"}
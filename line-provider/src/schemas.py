@@ -5,6 +5,7 @@ import decimal
 import enum
 import time
 from http import HTTPStatus
+from typing import Literal
 
 from fastapi import HTTPException
 from pydantic import BaseModel, field_validator
@@ -78,3 +79,20 @@ class Event(EventCreate):
 
     event_id: int
     state: EventState
+
+
+class EventChange(BaseModel):
+    """Схема изменения событий."""
+
+    version: int
+    mutation: Literal["put", "delete", "clear", "archive"]
+    events: list[Event]
+
+
+class EventChanges(BaseModel):
+    """Схема изменений событий после версии, известной потребителю."""
+
+    epoch: str
+    version: int
+    resync: bool
+    changes: list[EventChange]
@@ -0,0 +1,293 @@
+"""Модуль сериализации событий.
+
+Кроме JSON поддерживается компактный бинарный формат MessagePack; формат
+ответа выбирается по заголовку `Accept`.
+"""
+
+import decimal
+import json
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+import msgpack
+
+import config
+import events
+import schemas
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Типы, под которыми MessagePack встречается в заголовках
+MSGPACK_TYPES = {MSGPACK, "application/x-msgpack"}
+
+
+def parse_accept(accept: str) -> dict[str, float]:
+    """Разбирает заголовок `Accept` на диапазоны типов и их веса.
+
+    Args:
+        accept: Значение заголовка `Accept`.
+
+    Returns:
+        Наибольший вес каждого диапазона типов; диапазоны с некорректным
+        весом считаются неприемлемыми.
+    """
+    ranges: dict[str, float] = {}
+    for item in accept.split(","):
+        media_range, *params = item.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+
+        ranges[media_range] = max(quality, ranges.get(media_range, 0.0))
+    return ranges
+
+
+def negotiate(accept: str | None) -> str:
+    """Выбирает формат ответа по заголовку `Accept`.
+
+    MessagePack отдается, только если клиент явно перечислил его тип, а его
+    вес не меньше веса JSON. Вес JSON берется из самого точного подходящего
+    диапазона: `application/json`, `application/*` или `*/*`.
+
+    Args:
+        accept: Значение заголовка `Accept`.
+
+    Returns:
+        MIME-тип ответа.
+    """
+    if not accept:
+        return JSON
+
+    ranges = parse_accept(accept)
+    msgpack_quality = max(
+        (ranges[media_type] for media_type in MSGPACK_TYPES if media_type in ranges),
+        default=0.0,
+    )
+    if not msgpack_quality:
+        return JSON
+
+    json_quality = next(
+        (
+            ranges[media_range]
+            for media_range in (JSON, "application/*", "*/*")
+            if media_range in ranges
+        ),
+        0.0,
+    )
+    return MSGPACK if msgpack_quality >= json_quality else JSON
+
+
+def dump_event(event: schemas.Event) -> dict[str, Any]:
+    """Преобразует событие в словарь из примитивных типов.
+
+    Коэффициент передается строкой, чтобы не терять точность.
+
+    Args:
+        event: Объект события.
+
+    Returns:
+        Словарь с полями события.
+    """
+    return dump_fields(event.event_id, event.coefficient, event.deadline, event.state)
+
+
+def dump_fields(
+    event_id: int,
+    coefficient: decimal.Decimal | None,
+    deadline: int | None,
+    state: int,
+) -> dict[str, Any]:
+    """Преобразует поля события в словарь из примитивных типов.
+
+    Args:
+        event_id: ID события.
+        coefficient: Коэффициент.
+        deadline: Дедлайн.
+        state: Статус.
+
+    Returns:
+        Словарь с полями события.
+    """
+    return {
+        "event_id": event_id,
+        "coefficient": None if coefficient is None else str(coefficient),
+        "deadline": deadline,
+        "state": int(state),
+    }
+
+
+def encode(data: Any, media_type: str) -> bytes:
+    """Кодирует данные в переданный формат.
+
+    Args:
+        data: Данные из примитивных типов.
+        media_type: MIME-тип формата.
+
+    Returns:
+        Закодированные данные.
+    """
+    if media_type in MSGPACK_TYPES:
+        return msgpack.packb(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def encode_fields(
+    fields: tuple[int, decimal.Decimal | None, int | None, int], media_type: str
+) -> bytes:
+    """Кодирует поля одного события в переданный формат.
+
+    JSON собирается по шаблону: поля события — числа и десятичная запись
+    коэффициента, которые не нужно экранировать.
+
+    Args:
+        fields: ID, коэффициент, дедлайн и статус события.
+        media_type: MIME-тип формата.
+
+    Returns:
+        Закодированное событие.
+    """
+    if media_type in MSGPACK_TYPES:
+        return msgpack.packb(dump_fields(*fields))
+
+    event_id, coefficient, deadline, state = fields
+    coefficient = "null" if coefficient is None else f'"{coefficient}"'
+    deadline = "null" if deadline is None else int(deadline)
+    return (
+        f'{{"event_id":{int(event_id)},"coefficient":{coefficient},'
+        f'"deadline":{deadline},"state":{int(state)}}}'
+    ).encode()
+
+
+def encode_events(event_list: Iterable[schemas.Event], media_type: str) -> bytes:
+    """Кодирует список событий в переданный формат.
+
+    Args:
+        event_list: События.
+        media_type: MIME-тип формата.
+
+    Returns:
+        Закодированный список событий.
+    """
+    return encode([dump_event(event) for event in event_list], media_type)
+
+
+def join(parts: list[bytes], media_type: str) -> bytes:
+    """Собирает список из уже закодированных элементов.
+
+    Args:
+        parts: Закодированные элементы.
+        media_type: MIME-тип формата.
+
+    Returns:
+        Закодированный список.
+    """
+    if media_type in MSGPACK_TYPES:
+        return msgpack.Packer().pack_array_header(len(parts)) + b"".join(parts)
+    return b"[" + b",".join(parts) + b"]"
+
+
+class EncodedEvents:
+    """Кэш закодированных событий.
+
+    Хранит каждое событие уже закодированным в каждом из форматов, поэтому
+    списки событий собираются склейкой готовых байтов, без создания
+    объектов и их сериализации на каждый запрос. Запись события сбрасывается
+    подписчиком хранилища при каждом его изменении.
+    """
+
+    def __init__(
+        self, store: events.BaseEventStore, enabled: bool = config.EVENT_BYTES_CACHE
+    ):
+        """Инициализация.
+
+        Args:
+            store: Хранилище событий.
+            enabled: Использовать ли кэш.
+        """
+        self.store = store
+        self.enabled = enabled
+
+        self._encoded: dict[str, dict[int, bytes]] = {JSON: {}, MSGPACK: {}}
+        # Версия хранилища, которой соответствует кэш
+        self._version = store.version
+
+        store.listeners.append(self.invalidate)
+
+    def clear(self) -> None:
+        """Очищает кэш."""
+        for encoded in self._encoded.values():
+            encoded.clear()
+        self._version = self.store.version
+
+    def invalidate(
+        self, mutation: events.Mutation, changed: Sequence[schemas.Event]
+    ) -> None:
+        """Сбрасывает закодированные изменившиеся события.
+
+        Args:
+            mutation: Вид изменения.
+            changed: Затронутые события.
+        """
+        # Изменения, сделанные без уведомления подписчиков (например,
+        # при восстановлении), неизвестны, поэтому кэш сбрасывается целиком
+        if mutation is events.Mutation.CLEAR or self.store.version != self._version + 1:
+            self.clear()
+            return
+
+        if any(self._encoded.values()):
+            if isinstance(changed, events.ColumnEvents):
+                event_ids = changed.columns.ids
+            else:
+                event_ids = [event.event_id for event in changed]
+            for encoded in self._encoded.values():
+                for event_id in event_ids:
+                    encoded.pop(event_id, None)
+        self._version = self.store.version
+
+    def encode(self, event_ids: Iterable[int], media_type: str) -> bytes:
+        """Кодирует список событий по их ID.
+
+        Args:
+            event_ids: ID событий.
+            media_type: MIME-тип формата.
+
+        Returns:
+            Закодированный список событий.
+        """
+        if media_type in MSGPACK_TYPES:
+            media_type = MSGPACK
+        if self.store.version != self._version:
+            self.clear()
+
+        encoded = self._encoded[media_type]
+        store = self.store
+        parts = []
+        for event_id in event_ids:
+            data = encoded.get(event_id)
+            if data is None:
+                data = encoded[event_id] = encode_fields(
+                    store.get_fields(event_id), media_type
+                )
+            parts.append(data)
+
+        return join(parts, media_type)
+
+    def stats(self) -> dict[str, int]:
+        """Возвращает количество закодированных событий по форматам."""
+        return {
+            media_type: len(encoded) for media_type, encoded in self._encoded.items()
+        }
+
+
+encoded_events = EncodedEvents(events.events)
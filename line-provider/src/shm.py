@@ -0,0 +1,321 @@
+"""Модуль таблицы событий в разделяемой памяти.
+
+Таблица хранится в файле, который каждый процесс сервиса отображает в память
+(`mmap`); файл в `/dev/shm` не попадает на диск. Раскладка фиксирована:
+
+- заголовок из восьми 64-битных полей (`HEADER_FIELDS`);
+- колонки коэффициентов, дедлайнов и счетчиков записи строк (`q`),
+  по строке на каждый ID;
+- кольцо последних изменений: версия и ID события (`q`);
+- колонки статусов и признаков наличия событий (`B`);
+- виды изменений в кольце (`B`).
+
+Запись идет под межпроцессной блокировкой `flock` на файле таблицы. Каждое
+изменение записывается в кольцо с версией, по которой другие процессы
+догоняют таблицу. Чтение идет без блокировки; чтобы не увидеть строку
+записанной наполовину, читатель сверяет счетчик записи строки до и после
+чтения (`read_row`).
+"""
+
+import contextlib
+import fcntl
+import mmap
+import os
+import tempfile
+import time
+from collections.abc import Iterator, Sequence
+
+
+# Сигнатура файла таблицы
+MAGIC = int.from_bytes(b"LPEVTBL2", "little")
+
+HEADER_FIELDS = (
+    "magic",
+    "capacity",
+    "ring_size",
+    "epoch",
+    "last_id",
+    "version",
+    "count",
+    "ring_head",
+)
+HEADER_SIZE = 8 * len(HEADER_FIELDS)
+
+# ID события в кольце, означающий, что изменились все события
+ALL_EVENTS = 0
+
+# Количество попыток чтения строки без блокировки
+READ_RETRIES = 100
+
+
+def table_size(capacity: int, ring_size: int) -> int:
+    """Возвращает размер файла таблицы, байт.
+
+    Args:
+        capacity: Количество строк.
+        ring_size: Количество записей в кольце изменений.
+
+    Returns:
+        Размер файла.
+    """
+    return HEADER_SIZE + 26 * capacity + 17 * ring_size
+
+
+class SharedTable:
+    """Таблица событий фиксированной раскладки в разделяемой памяти.
+
+    Строка события адресуется его ID: строка `event_id - 1`. ID не
+    переиспользуются, поэтому размер таблицы ограничивает количество ID,
+    выданных за все время жизни файла, а не количество хранимых событий:
+    когда ID закончились, файл нужно удалить. Блокировка повторно входима
+    в пределах процесса и не рассчитана на потоки.
+
+    Счетчик записи строки нечетен, пока строка переписывается
+    (`write_row`), поэтому читатель без блокировки повторяет чтение, если
+    счетчик был нечетным или изменился за время чтения.
+    """
+
+    def __init__(self, path: str | None, capacity: int, ring_size: int):
+        """Открывает таблицу, создавая ее при необходимости.
+
+        Args:
+            path: Путь к файлу таблицы; без него таблица создается во временном
+                файле и видна только этому процессу.
+            capacity: Количество строк.
+            ring_size: Количество записей в кольце изменений.
+
+        Raises:
+            ValueError: Если параметры некорректны или файл содержит таблицу
+                другой раскладки.
+        """
+        if capacity < 1 or ring_size < 1:
+            raise ValueError("Shared table capacity and ring size must be positive")
+
+        self.path = path
+        if path is None:
+            self._file = tempfile.TemporaryFile()
+            self._fd = self._file.fileno()
+        else:
+            self._file = None
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._depth = 0
+
+        size = table_size(capacity, ring_size)
+        with self.locked():
+            created = os.fstat(self._fd).st_size == 0
+            if created:
+                os.ftruncate(self._fd, size)
+            elif os.fstat(self._fd).st_size != size:
+                raise ValueError(
+                    f"{path} holds a table of another size; "
+                    "remove it or match its capacity and ring size"
+                )
+
+            self._mmap = mmap.mmap(self._fd, size)
+            self._map_views(capacity, ring_size)
+
+            if created:
+                self.header[HEADER_FIELDS.index("magic")] = MAGIC
+                self.header[HEADER_FIELDS.index("capacity")] = capacity
+                self.header[HEADER_FIELDS.index("ring_size")] = ring_size
+                self.header[HEADER_FIELDS.index("epoch")] = time.time_ns()
+            elif (self.header[0], self.capacity, self.ring_size) != (
+                MAGIC,
+                capacity,
+                ring_size,
+            ):
+                raise ValueError(
+                    f"{path} holds a table with another layout; "
+                    "remove it or match its capacity and ring size"
+                )
+
+    def _map_views(self, capacity: int, ring_size: int) -> None:
+        """Создает типизированные представления областей файла.
+
+        Args:
+            capacity: Количество строк.
+            ring_size: Количество записей в кольце изменений.
+        """
+        view = memoryview(self._mmap)
+        offset = HEADER_SIZE
+        self.header = view[:offset].cast("q")
+
+        def region(length: int, typecode: str) -> memoryview:
+            nonlocal offset
+            size = length * (8 if typecode == "q" else 1)
+            region = view[offset : offset + size].cast(typecode)
+            offset += size
+            return region
+
+        self.coefficients = region(capacity, "q")
+        self.deadlines = region(capacity, "q")
+        self.row_writes = region(capacity, "q")
+        self.ring_versions = region(ring_size, "q")
+        self.ring_ids = region(ring_size, "q")
+        self.states = region(capacity, "B")
+        self.present = region(capacity, "B")
+        self.ring_mutations = region(ring_size, "B")
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Захватывает межпроцессную блокировку записи."""
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def write_row(self, row: int) -> Iterator[None]:
+        """Помечает строку переписываемой на время записи полей.
+
+        Вызывается под блокировкой.
+
+        Args:
+            row: Номер строки.
+        """
+        self.row_writes[row] += 1
+        try:
+            yield
+        finally:
+            self.row_writes[row] += 1
+
+    def read_row(self, row: int) -> tuple[int, int, int]:
+        """Читает поля строки.
+
+        Без блокировки чтение повторяется, пока строка переписывается. Если
+        строка остается переписываемой после `READ_RETRIES` попыток, она
+        читается под блокировкой: нечетный счетчик под блокировкой означает,
+        что записывавший процесс завершился посреди записи, и счетчик
+        выравнивается.
+
+        Args:
+            row: Номер строки.
+
+        Returns:
+            Коэффициент в сотых, дедлайн и статус.
+        """
+        row_writes = self.row_writes
+        before = row_writes[row]
+        fields = (self.coefficients[row], self.deadlines[row], self.states[row])
+        if self._depth or (not before & 1 and row_writes[row] == before):
+            return fields
+
+        for _ in range(READ_RETRIES):
+            before = row_writes[row]
+            if before & 1:
+                continue
+            fields = (self.coefficients[row], self.deadlines[row], self.states[row])
+            if row_writes[row] == before:
+                return fields
+
+        with self.locked():
+            if row_writes[row] % 2:
+                row_writes[row] += 1
+            return self.coefficients[row], self.deadlines[row], self.states[row]
+
+    @property
+    def capacity(self) -> int:
+        """Количество строк."""
+        return self.header[1]
+
+    @property
+    def ring_size(self) -> int:
+        """Количество записей в кольце изменений."""
+        return self.header[2]
+
+    @property
+    def epoch(self) -> int:
+        """Момент создания таблицы, нс."""
+        return self.header[3]
+
+    @property
+    def last_id(self) -> int:
+        """Последний выданный ID события."""
+        return self.header[4]
+
+    @last_id.setter
+    def last_id(self, value: int) -> None:
+        self.header[4] = value
+
+    @property
+    def version(self) -> int:
+        """Версия последнего изменения."""
+        return self.header[5]
+
+    @version.setter
+    def version(self, value: int) -> None:
+        self.header[5] = value
+
+    @property
+    def count(self) -> int:
+        """Количество хранимых событий."""
+        return self.header[6]
+
+    @count.setter
+    def count(self, value: int) -> None:
+        self.header[6] = value
+
+    @property
+    def ring_head(self) -> int:
+        """Количество записей, когда-либо добавленных в кольцо."""
+        return self.header[7]
+
+    def append_changes(
+        self, version: int, mutation: int, event_ids: Sequence[int]
+    ) -> None:
+        """Записывает изменение в кольцо.
+
+        Изменение, не помещающееся в кольцо, записывается одной записью
+        с `ALL_EVENTS`. Вызывается под блокировкой.
+
+        Args:
+            version: Версия изменения.
+            mutation: Вид изменения.
+            event_ids: ID затронутых событий.
+        """
+        if len(event_ids) > self.ring_size:
+            event_ids = [ALL_EVENTS]
+
+        head, ring_size = self.ring_head, self.ring_size
+        versions, ids, mutations = (
+            self.ring_versions,
+            self.ring_ids,
+            self.ring_mutations,
+        )
+        for event_id in event_ids:
+            position = head % ring_size
+            versions[position] = version
+            ids[position] = event_id
+            mutations[position] = mutation
+            head += 1
+        self.header[7] = head
+
+    def read_changes(self, cursor: int) -> list[tuple[int, int, int]] | None:
+        """Возвращает записи кольца, добавленные после курсора.
+
+        Args:
+            cursor: Количество уже прочитанных записей.
+
+        Returns:
+            Тройки `(version, mutation, event_id)` или None, если часть
+            записей уже перезаписана.
+        """
+        head, ring_size = self.ring_head, self.ring_size
+        if head - cursor > ring_size:
+            return None
+
+        versions, ids, mutations = (
+            self.ring_versions,
+            self.ring_ids,
+            self.ring_mutations,
+        )
+        changes = []
+        for index in range(cursor, head):
+            position = index % ring_size
+            changes.append((versions[position], mutations[position], ids[position]))
+        return changes
@@ -0,0 +1,403 @@
+"""Модуль долговременного хранения событий.
+
+События сохраняются в виде бинарного снимка и журнала изменений, сделанных
+после него. Журнал периодически сворачивается в новый снимок. При запуске
+снимок отображается в память, а из журналов применяется только хвост.
+
+Снимок `snapshot.bin` — заголовок и колонки событий (ID, коэффициенты в
+сотых, дедлайны, статусы) подряд. Журнал `journal.<поколение>.log` — записи
+фиксированной длины; поколение журнала, идущего за снимком, хранится
+в заголовке снимка.
+"""
+
+import array
+import asyncio
+import contextlib
+import mmap
+import os
+import struct
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+import config
+import events
+import schemas
+
+
+SNAPSHOT_MAGIC = b"LPEVSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+RECORD = struct.Struct("<BqqqB")
+
+FSYNC_POLICIES = {"always", "interval", "never"}
+
+
+class EventJournal:
+    """Снимок и журнал изменений хранилища событий."""
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        fsync: str = config.EVENT_STORAGE_FSYNC,
+        fsync_interval: float = config.EVENT_STORAGE_FSYNC_INTERVAL,
+        snapshot_threshold: int = config.EVENT_STORAGE_SNAPSHOT_THRESHOLD,
+    ):
+        """Инициализация.
+
+        Args:
+            directory: Каталог для снимка и журнала.
+            fsync: Политика fsync журнала.
+            fsync_interval: Период fsync для политики "interval", сек.
+            snapshot_threshold: Количество записей журнала, после которого
+                он сворачивается в снимок.
+
+        Raises:
+            ValueError: Если передана неизвестная политика fsync.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.snapshot_threshold = snapshot_threshold
+
+        self.store: events.BaseEventStore | None = None
+        self.generation = 0
+        self.records = 0
+
+        self._log = None
+        self._dirty = False
+        self._task: asyncio.Task | None = None
+        # Запись снимка в отдельном потоке
+        self._writing: asyncio.Future | None = None
+
+    @property
+    def snapshot_path(self) -> Path:
+        """Путь к снимку."""
+        return self.directory / "snapshot.bin"
+
+    def log_path(self, generation: int) -> Path:
+        """Возвращает путь к журналу поколения.
+
+        Args:
+            generation: Поколение журнала.
+
+        Returns:
+            Путь к журналу.
+        """
+        return self.directory / f"journal.{generation:08d}.log"
+
+    def _load_snapshot(self) -> None:
+        """Загружает в хранилище последний снимок."""
+        if not self.snapshot_path.exists():
+            return
+
+        with open(self.snapshot_path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as view:
+            magic, generation, count, last_id = SNAPSHOT_HEADER.unpack_from(view)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"Broken snapshot: {self.snapshot_path}")
+
+            offset = SNAPSHOT_HEADER.size
+            columns = []
+            for typecode in ("q", "q", "q", "b"):
+                column = array.array(typecode)
+                size = count * column.itemsize
+                column.frombytes(view[offset : offset + size])
+                columns.append(column)
+                offset += size
+
+        assert self.store is not None
+        self.store.load_columns(events.EventColumns(*columns))
+        self.store.advance_ids(last_id)
+        self.generation = generation
+
+    def _log_generations(self) -> list[int]:
+        """Возвращает поколения журналов, не свернутых в снимок.
+
+        Журналов может быть несколько, если сбой произошел после начала
+        нового поколения, но до замены снимка.
+
+        Returns:
+            Поколения по возрастанию.
+        """
+        generations = (
+            int(path.name.split(".")[1])
+            for path in self.directory.glob("journal.*.log")
+        )
+        return sorted(
+            generation for generation in generations if generation >= self.generation
+        )
+
+    def _read_log(self, path: Path) -> Iterator[tuple[int, int, int, int, int]]:
+        """Читает целые записи журнала.
+
+        Недописанная последняя запись отбрасывается.
+
+        Args:
+            path: Путь к журналу.
+
+        Yields:
+            Поля записей журнала.
+        """
+        if not path.exists() or not path.stat().st_size:
+            return
+
+        with open(path, "r+b") as file:
+            size = file.seek(0, os.SEEK_END)
+            valid_size = size - size % RECORD.size
+            if valid_size != size:
+                file.truncate(valid_size)
+            if not valid_size:
+                return
+
+            with mmap.mmap(file.fileno(), valid_size, access=mmap.ACCESS_READ) as view:
+                yield from RECORD.iter_unpack(view)
+
+    def _read_logs(self) -> Iterator[tuple[int, int, int, int, int]]:
+        """Читает записи всех журналов, идущих за снимком, по порядку поколений.
+
+        Поколение последнего журнала становится текущим.
+
+        Yields:
+            Поля записей журналов.
+        """
+        for generation in self._log_generations():
+            self.generation = generation
+            yield from self._read_log(self.log_path(generation))
+
+    def _replay_log(self) -> None:
+        """Применяет к хранилищу хвост журналов.
+
+        Записи сначала схлопываются до последнего состояния каждого события,
+        поэтому каждое событие меняется в хранилище не более одного раза.
+        """
+        assert self.store is not None
+
+        cleared = False
+        last_id = 0
+        overlay: dict[int, tuple[int, int, int] | None] = {}
+
+        for mutation, event_id, coefficient, deadline, state in self._read_logs():
+            self.records += 1
+            if mutation == events.Mutation.PUT:
+                overlay[event_id] = (coefficient, deadline, state)
+            elif mutation in (events.Mutation.DELETE, events.Mutation.ARCHIVE):
+                overlay[event_id] = None
+            elif mutation == events.Mutation.CLEAR:
+                cleared = True
+                last_id = max(last_id, event_id)
+                overlay.clear()
+
+        store = self.store
+        with store.muted():
+            if cleared:
+                store.clear()
+            store.advance_ids(last_id)
+
+            new_events = []
+            for event_id, values in overlay.items():
+                if values is None:
+                    if event_id in store:
+                        store.delete(event_id)
+                    continue
+
+                event = events.build_event(event_id, *values)
+                if event_id in store:
+                    store.update(event_id, event.model_dump(exclude={"event_id"}))
+                else:
+                    new_events.append(event)
+
+            store.add_many(new_events)
+
+    def _open_log(self, generation: int) -> None:
+        """Открывает журнал поколения для дозаписи.
+
+        Args:
+            generation: Поколение журнала.
+        """
+        if self._log is not None:
+            self._sync()
+            self._log.close()
+
+        self.generation = generation
+        self._log = open(self.log_path(generation), "ab")
+
+    def _sync(self) -> None:
+        """Сбрасывает журнал на диск."""
+        if self._log is not None and self._dirty:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._dirty = False
+
+    def record(
+        self, mutation: events.Mutation, changed: Sequence[schemas.Event]
+    ) -> None:
+        """Записывает изменение хранилища в журнал.
+
+        Args:
+            mutation: Вид изменения.
+            changed: Затронутые события.
+        """
+        assert self._log is not None and self.store is not None
+
+        if isinstance(changed, events.ColumnEvents):
+            data = b"".join(
+                RECORD.pack(mutation, *row) for row in zip(*changed.columns)
+            )
+        elif mutation in (events.Mutation.PUT, events.Mutation.ARCHIVE):
+            data = b"".join(
+                RECORD.pack(
+                    mutation,
+                    event.event_id,
+                    events.pack_coefficient(event.coefficient),
+                    events.NULL if event.deadline is None else event.deadline,
+                    event.state,
+                )
+                for event in changed
+            )
+        elif mutation is events.Mutation.DELETE:
+            data = b"".join(
+                RECORD.pack(mutation, event.event_id, 0, 0, 0) for event in changed
+            )
+        else:
+            data = RECORD.pack(mutation, self.store.last_id, 0, 0, 0)
+
+        self._log.write(data)
+        self._log.flush()
+        self._dirty = True
+        self.records += len(data) // RECORD.size
+
+        if self.fsync == "always":
+            self._sync()
+
+    def _capture(self) -> tuple[int, bytes, events.EventColumns]:
+        """Начинает новое поколение журнала и снимает копию колонок хранилища.
+
+        Returns:
+            Поколение, заголовок снимка и колонки событий.
+        """
+        assert self.store is not None
+
+        generation = self.generation + 1
+        self._open_log(generation)
+        self.records = 0
+
+        columns = self.store.to_columns()
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, generation, len(columns.ids), self.store.last_id
+        )
+        return generation, header, columns
+
+    def _write_snapshot(
+        self, generation: int, header: bytes, columns: events.EventColumns
+    ) -> None:
+        """Записывает снимок на диск и удаляет свернутые в него журналы.
+
+        Обращается только к переданной копии колонок, поэтому может
+        выполняться в отдельном потоке.
+
+        Args:
+            generation: Поколение журнала, идущего за снимком.
+            header: Заголовок снимка.
+            columns: Колонки событий.
+        """
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(header)
+            for column in columns:
+                column.tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._sync_directory()
+
+        for path in self.directory.glob("journal.*.log"):
+            if int(path.name.split(".")[1]) < generation:
+                path.unlink()
+
+    def _sync_directory(self) -> None:
+        """Сбрасывает на диск записи каталога, чтобы замена снимка пережила сбой."""
+        descriptor = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def snapshot(self) -> None:
+        """Сворачивает журнал в новый снимок.
+
+        Новые изменения сразу пишутся в журнал следующего поколения, а снимок
+        заменяется атомарно. Журналы удаляются только после замены снимка,
+        а при запуске применяются все журналы начиная с поколения снимка,
+        поэтому сбой на любом шаге не теряет данных.
+        """
+        self._write_snapshot(*self._capture())
+
+    async def snapshot_async(self) -> None:
+        """Сворачивает журнал в новый снимок, не блокируя цикл событий.
+
+        Колонки копируются в цикле событий, а запись на диск выполняется
+        в отдельном потоке. Отмена ожидания не прерывает начатую запись.
+        """
+        self._writing = asyncio.ensure_future(
+            asyncio.to_thread(self._write_snapshot, *self._capture())
+        )
+        await asyncio.shield(self._writing)
+
+    def open(self, store: events.BaseEventStore) -> None:
+        """Восстанавливает хранилище и начинает журналировать его изменения.
+
+        Args:
+            store: Хранилище событий.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.store = store
+
+        self._load_snapshot()
+        self._replay_log()
+        self._open_log(self.generation)
+
+        store.listeners.append(self.record)
+
+    async def _run(self) -> None:
+        """Периодически сбрасывает журнал на диск и сворачивает его в снимок."""
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+
+            if self.records >= self.snapshot_threshold:
+                await self.snapshot_async()
+            elif self.fsync == "interval":
+                self._sync()
+
+    def start(self) -> None:
+        """Запускает фоновое обслуживание журнала."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает журналирование, сохраняя снимок для быстрого запуска."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        # Снимок из фоновой задачи должен быть записан раньше итогового,
+        # иначе он заменит более новый снимок
+        if self._writing is not None:
+            await self._writing
+            self._writing = None
+
+        if self.store is not None:
+            self.snapshot()
+            self.store.listeners.remove(self.record)
+
+        if self._log is not None:
+            self._sync()
+            self._log.close()
+            self._log = None
+
+
+journal = EventJournal(config.EVENT_STORAGE_DIR)
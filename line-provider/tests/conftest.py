@@ -0,0 +1,71 @@
+"""Конфигурация для тестов."""
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Callable, Generator
+
+import httpx
+import pytest
+
+import archive
+import events
+import schemas
+from src import app
+
+
+@pytest.fixture(scope="session")
+def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
+    """Фикстура создания экземляра событийного цикла для каждого теста."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+async def ac() -> AsyncGenerator[httpx.AsyncClient, None]:
+    """Фикстура получения сессии клиента."""
+    async with httpx.AsyncClient(
+        app=app.app, base_url="http://127.0.0.1:8002"
+    ) as session:
+        yield session
+
+
+@pytest.fixture
+def make_event() -> Callable[..., schemas.Event]:
+    """Фикстура создания незавершенного события с коэффициентом 1.50."""
+
+    def factory(event_id: int, deadline: int | None = None) -> schemas.Event:
+        return events.build_event(
+            event_id, 150, deadline or int(time.time()) + 600, schemas.EventState.NEW
+        )
+
+    return factory
+
+
+@pytest.fixture
+def open_store(tmp_path) -> Callable[..., events.SharedEventStore]:
+    """Фикстура открытия хранилища в разделяемой памяти во временном каталоге.
+
+    Хранилища, открытые без явного пути, работают с одной таблицей.
+    """
+
+    def factory(path: str | None = None, **kwargs) -> events.SharedEventStore:
+        kwargs.setdefault("capacity", 1000)
+        kwargs.setdefault("ring_size", 100)
+        return events.SharedEventStore(path or str(tmp_path / "events"), **kwargs)
+
+    return factory
+
+
+@pytest.fixture
+def make_sweeper() -> Callable[..., archive.EventSweeper]:
+    """Фикстура создания архивации, переносящей события без задержки."""
+
+    def factory(store: events.BaseEventStore, **kwargs) -> archive.EventSweeper:
+        kwargs.setdefault("retention", 0)
+        kwargs.setdefault("unsettled_retention", 0)
+        sweeper = archive.EventSweeper(store, archive.EventArchive(), **kwargs)
+        store.listeners.append(sweeper.track)
+        return sweeper
+
+    return factory
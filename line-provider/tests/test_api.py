@@ -0,0 +1,209 @@
+"""Модуль тестов API."""
+
+# flake8: noqa
+
+import time
+from http import HTTPStatus
+
+import msgpack
+import pytest
+from httpx import AsyncClient
+
+import outbox
+import serialization
+
+
+async def test_generate_events(ac: AsyncClient):
+    response = await ac.post("/event/generate/10")
+
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.json()) == 10
+
+
+async def test_get_new_events_ordered_by_deadline(ac: AsyncClient):
+    response = await ac.get("/event/new")
+
+    assert response.status_code == HTTPStatus.OK
+
+    deadlines = [event["deadline"] for event in response.json()]
+    assert deadlines == sorted(deadlines)
+    assert all(deadline > time.time() - 1 for deadline in deadlines)
+
+
+async def test_get_new_events_pagination(ac: AsyncClient):
+    expected = (await ac.get("/event/new")).json()
+
+    pages, after = [], None
+    while True:
+        params = {"limit": 3} | ({"after": after} if after is not None else {})
+        page = (await ac.get("/event/new", params=params)).json()
+        if not page:
+            break
+        pages.extend(page)
+        after = page[-1]["event_id"]
+
+    assert pages == expected
+
+
+async def test_get_new_events_unknown_cursor(ac: AsyncClient):
+    response = await ac.get("/event/new", params={"after": 10**9})
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+async def test_get_new_events_cursor_without_deadline(ac: AsyncClient):
+    await ac.post("/event/create", json={})
+    event = (await ac.post("/event/create", json={})).json()
+    await ac.put("/event/update", json=event | {"deadline": None})
+    event_id = event["event_id"]
+
+    response = await ac.get("/event/new", params={"after": event_id})
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+async def test_create_event_is_indexed(ac: AsyncClient):
+    deadline = int(time.time()) + 10**6
+    response = await ac.post("/event/create", json={"deadline": deadline})
+    event_id = response.json()["event_id"]
+
+    response = await ac.get("/event/new")
+
+    assert response.json()[-1]["event_id"] == event_id
+
+
+async def test_update_event_deadline_is_reindexed(ac: AsyncClient):
+    deadline = int(time.time()) + 10**6
+    first = (await ac.post("/event/create", json={"deadline": deadline})).json()
+    event = (await ac.post("/event/create", json={"deadline": deadline + 1})).json()
+    event["deadline"] = deadline - 1
+
+    response = await ac.put("/event/update", json=event)
+
+    assert response.status_code == HTTPStatus.OK
+    event_ids = [event["event_id"] for event in (await ac.get("/event/new")).json()]
+    assert event_ids.index(event["event_id"]) < event_ids.index(first["event_id"])
+
+
+async def test_get_new_events_not_modified(ac: AsyncClient):
+    etag = (await ac.get("/event/new")).headers["etag"]
+
+    response = await ac.get("/event/new", headers={"If-None-Match": etag})
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers["etag"] == etag
+
+
+async def test_get_all_events_modified_after_update(ac: AsyncClient):
+    event = (await ac.post("/event/create", json={})).json()
+    etag = (await ac.get("/event/all")).headers["etag"]
+    event["coefficient"] = "2.50"
+
+    await ac.put("/event/update", json=event)
+    response = await ac.get("/event/all", headers={"If-None-Match": etag})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["etag"] != etag
+
+
+async def test_get_all_events_msgpack(ac: AsyncClient):
+    expected = (await ac.get("/event/all")).json()
+
+    response = await ac.get("/event/all", headers={"Accept": "application/msgpack"})
+
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == expected
+
+
+@pytest.mark.parametrize(
+    "accept, media_type",
+    [
+        (None, serialization.JSON),
+        ("*/*", serialization.JSON),
+        ("application/msgpack", serialization.MSGPACK),
+        ("application/msgpack, application/json;q=0.9", serialization.MSGPACK),
+        ("application/json, application/x-msgpack;q=0.1", serialization.JSON),
+        ("application/msgpack;q=0.5, */*;q=0.1", serialization.MSGPACK),
+        ("application/msgpack;q=0", serialization.JSON),
+        ("application/msgpack;q=oops", serialization.JSON),
+    ],
+)
+def test_negotiate_honours_quality(accept, media_type):
+    assert serialization.negotiate(accept) == media_type
+
+
+async def test_get_all_events_bytes_cache(ac: AsyncClient):
+    event = (await ac.post("/event/create", json={})).json()
+    event["coefficient"] = "3.25"
+    await ac.put("/event/update", json=event)
+
+    serialization.encoded_events.enabled = False
+    try:
+        expected = (await ac.get("/event/all")).json()
+    finally:
+        serialization.encoded_events.enabled = True
+
+    response = await ac.get("/event/all")
+
+    assert response.json() == expected
+    assert event in response.json()
+    assert serialization.encoded_events.stats()["application/json"] == len(expected)
+
+
+async def test_get_event_changes(ac: AsyncClient):
+    event = (await ac.post("/event/create", json={})).json()
+    response = await ac.get("/event/all")
+    version = int(response.headers["x-events-version"])
+    event["state"] = 2
+
+    await ac.put("/event/update", json=event)
+    response = await ac.get("/event/changes", params={"since": version})
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["resync"] is False
+    assert response.json()["version"] == version + 1
+    [change] = response.json()["changes"]
+    assert change["mutation"] == "put"
+    assert change["events"] == [event]
+
+
+async def test_get_event_changes_resync(ac: AsyncClient):
+    version = (await ac.get("/event/changes", params={"since": 0})).json()["version"]
+
+    response = await ac.get("/event/changes", params={"since": version + 1})
+    assert response.json()["resync"] is True
+
+    response = await ac.get(
+        "/event/changes", params={"since": version, "epoch": "unknown"}
+    )
+    assert response.json()["resync"] is True
+
+
+async def test_event_ids_are_not_reused(ac: AsyncClient):
+    last_id = (await ac.post("/event/generate/1")).json()[0]["event_id"]
+
+    response = await ac.post("/event/create", json={})
+
+    assert response.json()["event_id"] == last_id + 1
+
+
+async def test_delete_all_events_does_not_reuse_ids(ac: AsyncClient):
+    last_id = (await ac.post("/event/generate/1")).json()[0]["event_id"]
+
+    response = await ac.delete("/event/delete/all")
+
+    assert response.status_code == HTTPStatus.OK
+    assert (await ac.post("/event/generate/1")).json()[0]["event_id"] == last_id + 1
+
+
+async def test_get_outbox_stats(ac: AsyncClient, make_event, monkeypatch):
+    queue = outbox.outbox
+    monkeypatch.setattr(queue, "enabled", True)
+    monkeypatch.setattr(queue, "pending", {})
+    # Изменения одного события схлопываются в одно уведомление
+    queue.put([make_event(1), make_event(2), make_event(1)])
+
+    response = await ac.get("/outbox")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["queue_depth"] == 2
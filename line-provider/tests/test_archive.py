@@ -0,0 +1,209 @@
+"""Модуль тестов архивации событий."""
+
+# flake8: noqa
+
+import decimal
+import time
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+import archive
+import config
+import changes
+import events
+import schemas
+import storage
+
+
+@pytest.mark.parametrize("backend", sorted(events.STORE_BACKENDS))
+def test_settled_events_move_to_archive(backend, make_event, make_sweeper):
+    store = events.STORE_BACKENDS[backend]()
+    sweeper = make_sweeper(store, retention=60)
+    store.add_many(make_event(event_id) for event_id in store.next_ids(3))
+    store.update(2, {"state": schemas.EventState.FINISHED_WIN})
+
+    assert sweeper.sweep(now=time.time() + 30) == 0
+    assert sweeper.sweep(now=time.time() + 61) == 1
+
+    assert 2 not in store and len(store) == 2
+    assert sweeper.archive[2].state == schemas.EventState.FINISHED_WIN
+    assert store.get_new_ids() == [1, 3]
+    assert sweeper.stats()["archived"] == 1
+
+
+def test_reopened_event_stays_in_store(make_event, make_sweeper):
+    store = events.DictEventStore()
+    sweeper = make_sweeper(store)
+    store.add(make_event(1))
+    store.update(1, {"state": schemas.EventState.FINISHED_LOSE})
+    store.update(1, {"state": schemas.EventState.NEW})
+
+    assert sweeper.sweep(now=time.time() + 1) == 0
+    assert 1 in store
+
+
+def test_unsettled_events_expire_after_deadline(make_event, make_sweeper):
+    store = events.DictEventStore()
+    sweeper = make_sweeper(store, unsettled_retention=100)
+    store.add_many([make_event(1, deadline=1000), make_event(2, deadline=5000)])
+
+    assert sweeper.sweep(now=1099) == 0
+    assert sweeper.sweep(now=1100) == 1
+    assert list(store) == [2]
+    assert sweeper.archive[1].deadline == 1000
+
+
+def test_archive_is_not_reported_as_delete(make_event, make_sweeper):
+    store = events.DictEventStore()
+    change_log = changes.ChangeLog(store)
+    sweeper = make_sweeper(store)
+    store.add(make_event(1))
+    store.update(1, {"state": schemas.EventState.FINISHED_WIN})
+    version = store.version
+
+    sweeper.sweep(now=time.time() + 1)
+    change = change_log.since(version).changes[0]
+
+    assert change.mutation == "archive"
+    assert change.events[0].state == schemas.EventState.FINISHED_WIN
+
+
+def test_journal_does_not_restore_archived_events(tmp_path, make_event, make_sweeper):
+    store = events.ColumnarEventStore()
+    storage.EventJournal(tmp_path).open(store)
+    sweeper = make_sweeper(store)
+    store.add_many(make_event(event_id) for event_id in store.next_ids(2))
+    store.update(1, {"state": schemas.EventState.FINISHED_WIN})
+    sweeper.sweep(now=time.time() + 1)
+
+    restored = events.ColumnarEventStore()
+    storage.EventJournal(tmp_path).open(restored)
+
+    assert list(restored) == [2]
+
+
+def test_archive_is_restored_from_directory(tmp_path, make_event, make_sweeper):
+    store = events.ColumnarEventStore()
+    storage.EventJournal(tmp_path).open(store)
+    sweeper = make_sweeper(store)
+    sweeper.archive.open(tmp_path)
+    store.add_many(make_event(event_id) for event_id in store.next_ids(2))
+    store.update(1, {"state": schemas.EventState.FINISHED_WIN})
+    sweeper.sweep(now=time.time() + 1)
+    sweeper.archive.close()
+
+    with open(tmp_path / "archive.log", "ab") as file:
+        file.write(b"\x01\x02\x03")
+    restored = archive.EventArchive()
+    restored.open(tmp_path)
+
+    assert list(restored.ids) == [1]
+    assert restored[1].state == schemas.EventState.FINISHED_WIN
+    assert restored[1].coefficient == decimal.Decimal("1.50")
+
+
+async def test_get_archived_event(ac: AsyncClient):
+    response = await ac.post("/event/create", json={})
+    event_id = response.json()["event_id"]
+    await ac.put(
+        "/event/update",
+        json={"event_id": event_id, "state": schemas.EventState.FINISHED_WIN},
+    )
+    sweeper = archive.sweeper
+    sweeper.retention = 0
+    sweeper.rebuild()
+    sweeper.sweep(now=time.time() + 1)
+
+    response = await ac.get(f"/event/{event_id}")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["state"] == schemas.EventState.FINISHED_WIN
+    assert event_id not in events.events
+
+    response = await ac.get("/archive")
+    assert response.json()["archived"] >= 1
+
+
+def test_sweep_writes_archive_before_store(
+    tmp_path, monkeypatch, make_event, make_sweeper
+):
+    store = events.ColumnarEventStore()
+    storage.EventJournal(tmp_path).open(store)
+    sweeper = make_sweeper(store)
+    sweeper.archive.open(tmp_path)
+    store.add_many(make_event(event_id) for event_id in store.next_ids(2))
+    store.update(1, {"state": schemas.EventState.FINISHED_WIN})
+
+    # Сбой сразу после записи архива: событие остается в хранилище
+    def crash(event_ids):
+        raise RuntimeError("crash")
+
+    monkeypatch.setattr(store, "archive", crash)
+    with pytest.raises(RuntimeError):
+        sweeper.sweep(now=time.time() + 1)
+    sweeper.archive.close()
+
+    restored = archive.EventArchive()
+    restored.open(tmp_path)
+
+    assert restored[1].state == schemas.EventState.FINISHED_WIN
+    assert 1 in store
+
+    # Повторный проход после перезапуска дописывает событие еще раз
+    monkeypatch.undo()
+    sweeper.archive = archive.EventArchive()
+    sweeper.archive.open(tmp_path)
+    sweeper.rebuild()
+    sweeper.sweep(now=time.time() + 1)
+    sweeper.archive.close()
+
+    restored = archive.EventArchive()
+    restored.open(tmp_path)
+
+    assert 1 not in store
+    assert list(restored.ids) == [1]
+
+
+def test_table_trims_removed_prefix(make_event):
+    table = events.EventTable()
+    count = 4 * events.TRIM_THRESHOLD
+    table.append([make_event(event_id) for event_id in range(1, count + 1)])
+
+    for event_id in range(1, count):
+        table.remove(event_id)
+
+    assert len(table.positions) <= events.TRIM_THRESHOLD * 2
+    assert list(table.ids) == [count]
+    assert table[count].event_id == count
+    assert 1 not in table
+
+
+async def test_get_events_batch(ac: AsyncClient):
+    hot, archived, deleted = [
+        (await ac.post("/event/create", json={})).json()["event_id"] for _ in range(3)
+    ]
+    await ac.put(
+        "/event/update",
+        json={"event_id": archived, "state": schemas.EventState.FINISHED_LOSE},
+    )
+    await ac.delete(f"/event/delete/{deleted}")
+    sweeper = archive.sweeper
+    sweeper.retention = 0
+    sweeper.rebuild()
+    sweeper.sweep(now=time.time() + 1)
+
+    response = await ac.get(
+        "/event/batch", params={"event_id": [hot, archived, deleted, hot]}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [event["event_id"] for event in response.json()] == [hot, archived]
+    assert response.json()[1]["state"] == schemas.EventState.FINISHED_LOSE
+
+    response = await ac.get(
+        "/event/batch", params={"event_id": list(range(config.EVENT_BATCH_LIMIT + 1))}
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,70 @@
+"""Модуль тестов журнала изменений событий."""
+
+# flake8: noqa
+
+import changes
+import events
+import schemas
+
+
+def test_changes_since_version(make_event):
+    store = events.DictEventStore()
+    change_log = changes.ChangeLog(store)
+    store.add_many([make_event(1), make_event(2)])
+    version = store.version
+
+    store.update(1, {"state": schemas.EventState.FINISHED_WIN})
+    store.delete(2)
+    result = change_log.since(version)
+
+    assert not result.resync
+    assert [change.mutation for change in result.changes] == ["put", "delete"]
+    assert result.changes[0].events[0].state == schemas.EventState.FINISHED_WIN
+    assert result.changes[1].events[0].state == schemas.EventState.DELETED
+
+
+def test_evicted_changes_require_resync(make_event):
+    store = events.DictEventStore()
+    change_log = changes.ChangeLog(store, max_size=2)
+
+    store.add_many([make_event(1), make_event(2)])
+    store.add(make_event(3))
+
+    assert change_log.since(0).resync
+    assert [change.events[0].event_id for change in change_log.since(1).changes] == [3]
+
+
+def test_muted_changes_require_resync(make_event):
+    store = events.DictEventStore()
+    change_log = changes.ChangeLog(store)
+    store.add(make_event(1))
+
+    with store.muted():
+        store.add(make_event(2))
+
+    assert change_log.since(1).resync
+    assert not change_log.since(store.version).resync
+
+
+async def test_stream_starts_with_resync(make_event):
+    store = events.DictEventStore()
+    change_log = changes.ChangeLog(store)
+    store.add(make_event(1))
+
+    message = await anext(change_log.stream(heartbeat=0.01))
+
+    assert message.startswith(f"id: {store.epoch}:1\nevent: resync\n")
+
+
+async def test_stream_resumes_from_version(make_event):
+    store = events.DictEventStore()
+    change_log = changes.ChangeLog(store)
+    store.add(make_event(1))
+    stream = change_log.stream(0, store.epoch, heartbeat=0.01)
+
+    assert (await anext(stream)).startswith(f"id: {store.epoch}:1\nevent: put\n")
+    assert await anext(stream) == ": heartbeat\n\n"
+
+    store.delete(1)
+
+    assert (await anext(stream)).startswith(f"id: {store.epoch}:2\nevent: delete\n")
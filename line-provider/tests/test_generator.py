@@ -0,0 +1,120 @@
+"""Модуль тестов генератора событий."""
+
+# flake8: noqa
+
+import decimal
+from http import HTTPStatus
+
+import pytest
+from httpx import AsyncClient
+
+import changes
+import events
+import generator
+import schemas
+import storage
+
+
+@pytest.fixture(params=["numpy", "random"])
+def sampler(request, monkeypatch):
+    if request.param == "random":
+        monkeypatch.setattr(generator, "numpy", None)
+    elif generator.numpy is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def test_generate_columns_is_reproducible(sampler):
+    first = generator.generate_columns(range(1, 1001), seed=42, now=1000)
+    second = generator.generate_columns(range(1, 1001), seed=42, now=1000)
+    other = generator.generate_columns(range(1, 1001), seed=43, now=1000)
+
+    assert first == second
+    assert first.coefficients != other.coefficients
+
+
+def test_generate_columns_falls_back_to_random(monkeypatch):
+    monkeypatch.setattr(generator, "numpy", None)
+    distribution = generator.Distribution()
+
+    columns = generator.generate_columns(
+        range(1, 101), seed=42, distribution=distribution, now=1000
+    )
+
+    assert columns == generator._generate_python(range(1, 101), 42, distribution, 1000)
+
+
+@pytest.mark.parametrize("coefficient", sorted(generator.COEFFICIENT_DISTRIBUTIONS))
+def test_generate_columns_respects_bounds(sampler, coefficient):
+    distribution = generator.Distribution(
+        coefficient=coefficient,
+        min_coefficient=1.5,
+        max_coefficient=3.0,
+        min_deadline_offset=10,
+        max_deadline_offset=20,
+    )
+    columns = generator.generate_columns(
+        range(1, 10001), seed=1, distribution=distribution, now=1000
+    )
+
+    assert sorted(columns.ids) == list(range(1, 10001))
+    assert 150 <= min(columns.coefficients) <= max(columns.coefficients) <= 300
+    assert 1010 <= min(columns.deadlines) <= max(columns.deadlines) <= 1020
+    assert set(columns.states) == {schemas.EventState.NEW}
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"coefficient": "normal"},
+        {"min_coefficient": 0},
+        {"min_coefficient": 5, "max_coefficient": 2},
+        {"coefficient_sigma": -1},
+        {"min_deadline_offset": 0},
+    ],
+)
+def test_invalid_distribution(params):
+    with pytest.raises(ValueError):
+        generator.Distribution(**params)
+
+
+@pytest.mark.parametrize("backend", sorted(events.STORE_BACKENDS))
+def test_generate_notifies_listeners(tmp_path, backend):
+    store = events.STORE_BACKENDS[backend]()
+    change_log = changes.ChangeLog(store)
+    journal = storage.EventJournal(tmp_path, fsync="always")
+    journal.open(store)
+
+    event_ids = generator.generate(100, seed=7, store=store)
+
+    assert list(store.get_new_ids()) == sorted(
+        event_ids, key=lambda event_id: (store[event_id].deadline, event_id)
+    )
+    assert len(change_log.since(0).changes[0].events) == 100
+    assert journal.records == 100
+    assert all(
+        isinstance(store[event_id].coefficient, decimal.Decimal)
+        for event_id in event_ids
+    )
+
+
+async def test_generate_events_with_seed(ac: AsyncClient):
+    params = {"seed": 5, "min_coefficient": 2, "max_coefficient": 2.5}
+    first = (await ac.post("/event/generate/5", params=params)).json()
+    second = (await ac.post("/event/generate/5", params=params)).json()
+
+    assert [event["event_id"] for event in second] == [
+        event["event_id"] + 5 for event in first
+    ]
+    assert [event["coefficient"] for event in first] == [
+        event["coefficient"] for event in second
+    ]
+    assert all(2 <= float(event["coefficient"]) <= 2.5 for event in first)
+
+
+async def test_generate_events_invalid_distribution(ac: AsyncClient):
+    response = await ac.post(
+        "/event/generate/5", params={"coefficient_distribution": "normal"}
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
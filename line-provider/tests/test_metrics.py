@@ -0,0 +1,101 @@
+"""Модуль тестов метрик."""
+
+# flake8: noqa
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+import metrics
+
+
+def sample(text: str, series: str) -> float | None:
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rpartition(" ")[2])
+    return None
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = metrics.Histogram(
+        "latency_seconds", "Latency", ("route",), buckets=(0.1, 1), registry=registry
+    )
+    child = histogram.labels("/a")
+    for value in (0.05, 0.1, 0.5, 2):
+        child.observe(value)
+
+    text = registry.render().decode()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert sample(text, 'latency_seconds_bucket{route="/a",le="0.1"}') == 2
+    assert sample(text, 'latency_seconds_bucket{route="/a",le="1.0"}') == 3
+    assert sample(text, 'latency_seconds_bucket{route="/a",le="+Inf"}') == 4
+    assert sample(text, 'latency_seconds_count{route="/a"}') == 4
+    assert sample(text, 'latency_seconds_sum{route="/a"}') == pytest.approx(2.65)
+
+
+def test_labels_are_escaped_and_checked():
+    registry = metrics.Registry()
+    counter = metrics.Counter("calls_total", "Calls", ("path",), registry=registry)
+    counter.labels('a"b\\c').inc(2)
+
+    assert 'calls_total{path="a\\"b\\\\c"} 2' in registry.render().decode()
+    with pytest.raises(ValueError):
+        counter.labels()
+
+
+def test_callback_without_value_is_skipped():
+    registry = metrics.Registry()
+    metrics.Callback("latency_max_seconds", "Latency", lambda: None, registry=registry)
+
+    assert sample(registry.render().decode(), "latency_max_seconds") is None
+
+
+def test_metric_without_values_is_abstract():
+    class Summary(metrics.Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Summary("summary", "Summary", registry=metrics.Registry())
+
+
+async def test_instrumented_transport_records_peer_calls():
+    transport = metrics.InstrumentedTransport(
+        "peer", httpx.MockTransport(lambda request: httpx.Response(204))
+    )
+    series = metrics.http_client_request_duration_seconds.labels(
+        "peer", "GET", "/event/{event_id}", "204"
+    )
+    unmatched = metrics.http_client_request_duration_seconds.labels(
+        "peer", "GET", "unmatched", "204"
+    )
+    before, unmatched_before = sum(series.counts), sum(unmatched.counts)
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        for event_id in range(3):
+            await client.get(
+                f"http://peer/event/{event_id}",
+                extensions={"route": "/event/{event_id}"},
+            )
+        await client.get("http://peer/event/3")
+
+    assert sum(series.counts) == before + 3
+    assert sum(unmatched.counts) == unmatched_before + 1
+
+
+async def test_metrics_endpoint_reports_route_latency(ac: AsyncClient):
+    event_id = (await ac.post("/event/generate/1")).json()[0]["event_id"]
+    await ac.get(f"/event/{event_id}")
+
+    response = await ac.get("/metrics")
+    text = response.text
+
+    assert response.headers["content-type"].startswith("text/plain")
+    assert sample(
+        text,
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/event/{event_id}",status="200"}',
+    )
+    assert sample(text, "events_stored") >= 1
+    assert sample(text, "http_requests_in_flight") == 1
@@ -0,0 +1,99 @@
+"""Модуль тестов профилирования запросов."""
+
+# flake8: noqa
+
+import asyncio
+import pstats
+from http import HTTPStatus
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient
+
+import metrics
+import profiling
+
+
+def make_app(tmp_path, **kwargs) -> tuple[FastAPI, profiling.SlowRequests]:
+    buffer = profiling.SlowRequests(threshold=0.01, size=10)
+    app = FastAPI()
+    app.add_middleware(
+        profiling.ProfilingMiddleware,
+        directory=str(tmp_path),
+        buffer=buffer,
+        **kwargs,
+    )
+
+    peer = httpx.AsyncClient(
+        transport=metrics.InstrumentedTransport(
+            "peer", httpx.MockTransport(lambda request: httpx.Response(204))
+        )
+    )
+
+    @app.get("/slow")
+    async def slow() -> dict:
+        await peer.get("http://peer/ping")
+        with profiling.span("sql"):
+            await asyncio.sleep(0.02)
+        return {}
+
+    @app.get("/fast")
+    async def fast() -> dict:
+        return {}
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def messages():
+            await asyncio.sleep(0.02)
+            yield "data: {}\n\n"
+
+        return StreamingResponse(messages(), media_type="text/event-stream")
+
+    return app, buffer
+
+
+async def test_slow_requests_are_broken_down(tmp_path):
+    app, buffer = make_app(tmp_path)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/fast")
+        await client.get("/slow")
+        await client.get("/stream")
+
+    requests = buffer.stats()["requests"]
+
+    assert [request["path"] for request in requests] == ["/slow"]
+    assert requests[0]["status"] == HTTPStatus.OK
+    assert requests[0]["sql"] >= 0.02
+    assert requests[0]["http"] > 0
+    assert requests[0]["profile"] is None
+    assert not list(tmp_path.iterdir())
+
+
+async def test_privileged_header_writes_profile(tmp_path):
+    app, buffer = make_app(tmp_path, token="secret")
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/fast", headers={"X-Profile": "wrong"})
+        await client.get("/fast", headers={"X-Profile": "secret"})
+
+    requests = buffer.stats()["requests"]
+
+    assert buffer.profiled == 1
+    assert len(requests) == 1
+    assert pstats.Stats(requests[0]["profile"]).total_calls > 0
+
+
+async def test_sampled_requests_are_profiled(tmp_path):
+    app, buffer = make_app(tmp_path, sample_rate=1)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/fast")
+        await client.get("/fast")
+
+    assert buffer.profiled == 2
+    assert len(list(tmp_path.glob("*.prof"))) == 2
+
+
+async def test_debug_requests_disabled_by_default(ac: AsyncClient):
+    response = await ac.get("/debug/requests")
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
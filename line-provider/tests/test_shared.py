@@ -0,0 +1,145 @@
+"""Модуль тестов хранилища событий в разделяемой памяти."""
+
+# flake8: noqa
+
+import decimal
+import multiprocessing
+from collections.abc import Callable
+
+import pytest
+
+import changes
+import events
+import schemas
+
+
+def test_changes_are_visible_to_other_store(make_event, open_store):
+    writer = open_store()
+    reader = open_store()
+    change_log = changes.ChangeLog(reader)
+    version = reader.version
+
+    writer.add_many(make_event(event_id) for event_id in writer.next_ids(3))
+    writer.update(1, {"state": schemas.EventState.FINISHED_WIN})
+    writer.delete(2)
+
+    # Строки видны сразу, индекс и журнал — после `sync`
+    assert 3 in reader and 2 not in reader
+    assert reader.get_new_ids() == []
+    reader.sync()
+
+    assert reader.version == writer.version == version + 3
+    assert reader.epoch == writer.epoch
+    assert reader.get_new_ids() == [1, 3]
+    result = change_log.since(version)
+    assert not result.resync
+    assert [change.mutation for change in result.changes] == ["put", "put", "delete"]
+    assert result.changes[2].events[0].state == schemas.EventState.DELETED
+
+
+def test_writer_catches_up_before_mutation(make_event, open_store):
+    first = open_store()
+    second = open_store()
+
+    first.add(make_event(first.next_id(), deadline=2000))
+    second.add(make_event(second.next_id(), deadline=1000))
+
+    assert second.version == 2
+    assert second.get_new_ids(timestamp=0) == [2, 1]
+    first.sync()
+    assert first.version == 2
+    assert first.get_new_ids(timestamp=0) == [2, 1]
+
+
+def allocate_ids(
+    open_store: Callable[..., events.SharedEventStore],
+    number: int,
+    queue: multiprocessing.Queue,
+) -> None:
+    store = open_store()
+    queue.put([store.next_id() for _ in range(number)])
+
+
+def test_id_allocation_is_shared_between_processes(open_store):
+    open_store()
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+
+    processes = [
+        context.Process(target=allocate_ids, args=(open_store, 100, queue))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    allocated = [event_id for _ in processes for event_id in queue.get(timeout=10)]
+    for process in processes:
+        process.join()
+
+    assert sorted(allocated) == list(range(1, 401))
+
+
+def test_ring_overflow_rebuilds_index(make_event, open_store):
+    writer = open_store(ring_size=4)
+    reader = open_store(ring_size=4)
+    change_log = changes.ChangeLog(reader)
+
+    for event_id in writer.next_ids(10):
+        writer.add(make_event(event_id))
+    writer.delete(5)
+    reader.sync()
+
+    assert reader.resyncs == 1
+    assert reader.version == writer.version
+    assert len(reader.get_new_ids()) == len(reader) == 9
+    assert change_log.since(0).resync
+
+
+def test_clear_is_visible_to_other_store(make_event, open_store):
+    writer = open_store()
+    reader = open_store()
+
+    writer.add_many(make_event(event_id) for event_id in writer.next_ids(3))
+    reader.sync()
+    writer.clear()
+    reader.sync()
+
+    assert len(reader) == 0
+    assert reader.get_new_ids() == []
+    assert reader.next_id() == 4
+
+
+def test_capacity_limits_event_ids(make_event, open_store):
+    store = open_store(capacity=2)
+    store.next_ids(2)
+
+    with pytest.raises(ValueError):
+        store.next_id()
+    with pytest.raises(ValueError):
+        store.add(make_event(3))
+    assert store.free_ids == 0
+    assert store.stats()["free_ids"] == 0
+
+
+def test_reader_retries_row_being_written(make_event, open_store):
+    writer = open_store()
+    reader = open_store()
+    writer.add(make_event(writer.next_id()))
+    table = writer.table
+
+    # Писатель завершился посреди записи строки: счетчик остался нечетным
+    table.row_writes[0] += 1
+    table.coefficients[0] = 250
+
+    assert reader[1].coefficient == decimal.Decimal("2.50")
+    assert reader.table.row_writes[0] % 2 == 0
+
+    with table.write_row(0):
+        table.states[0] = schemas.EventState.FINISHED_WIN
+    assert reader.get_fields(1)[3] == schemas.EventState.FINISHED_WIN
+
+
+def test_layout_mismatch_is_rejected(open_store):
+    open_store()
+
+    with pytest.raises(ValueError):
+        open_store(capacity=2000)
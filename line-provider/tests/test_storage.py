@@ -0,0 +1,111 @@
+"""Модуль тестов долговременного хранения событий."""
+
+# flake8: noqa
+
+import asyncio
+
+import pytest
+
+import events
+import schemas
+import storage
+
+
+def dump(store: events.BaseEventStore) -> list[dict]:
+    return sorted(
+        (event.model_dump() for event in store.values()),
+        key=lambda event: event["event_id"],
+    )
+
+
+@pytest.mark.parametrize("backend", sorted(events.STORE_BACKENDS))
+@pytest.mark.parametrize("with_snapshot", [False, True])
+def test_journal_restores_store(tmp_path, backend, with_snapshot, make_event):
+    store_cls = events.STORE_BACKENDS[backend]
+    store = store_cls()
+    journal = storage.EventJournal(tmp_path, fsync="always")
+    journal.open(store)
+
+    store.add_many(make_event(event_id) for event_id in store.next_ids(5))
+    if with_snapshot:
+        journal.snapshot()
+    store.update(2, {"state": schemas.EventState.FINISHED_WIN, "deadline": None})
+    store.delete(3)
+    store.add(make_event(store.next_id()))
+
+    restored = store_cls()
+    storage.EventJournal(tmp_path).open(restored)
+
+    assert dump(restored) == dump(store)
+    assert [e.event_id for e in restored.get_new()] == [
+        e.event_id for e in store.get_new()
+    ]
+
+
+async def test_background_snapshot_keeps_concurrent_changes(tmp_path, make_event):
+    store = events.ColumnarEventStore()
+    journal = storage.EventJournal(tmp_path)
+    journal.open(store)
+    store.add_many(make_event(event_id) for event_id in store.next_ids(5))
+
+    writing = asyncio.create_task(journal.snapshot_async())
+    await asyncio.sleep(0)
+    store.delete(1)
+    await writing
+    await journal.stop()
+
+    restored = events.ColumnarEventStore()
+    storage.EventJournal(tmp_path).open(restored)
+
+    assert dump(restored) == dump(store)
+    assert list(tmp_path.glob("journal.*.log")) == [journal.log_path(2)]
+
+
+def test_journal_keeps_id_sequence_after_clear(tmp_path, make_event):
+    store = events.DictEventStore()
+    storage.EventJournal(tmp_path).open(store)
+
+    store.add_many(make_event(event_id) for event_id in store.next_ids(3))
+    store.clear()
+
+    restored = events.DictEventStore()
+    storage.EventJournal(tmp_path).open(restored)
+
+    assert len(restored) == 0
+    assert restored.next_id() == 4
+
+
+def test_journal_ignores_torn_record(tmp_path, make_event):
+    store = events.DictEventStore()
+    journal = storage.EventJournal(tmp_path)
+    journal.open(store)
+    store.add(make_event(store.next_id()))
+
+    with open(journal.log_path(journal.generation), "ab") as file:
+        file.write(b"\x01\x02\x03")
+
+    restored = events.DictEventStore()
+    storage.EventJournal(tmp_path).open(restored)
+
+    assert dump(restored) == dump(store)
+
+
+def test_journal_survives_crash_before_snapshot_replace(tmp_path, make_event):
+    store = events.ColumnarEventStore()
+    journal = storage.EventJournal(tmp_path, fsync="always")
+    journal.open(store)
+    store.add_many(make_event(event_id) for event_id in store.next_ids(3))
+    journal.snapshot()
+    store.delete(1)
+
+    # Сбой после перехода на новое поколение, но до замены снимка
+    journal._capture()
+    store.add_many(make_event(event_id) for event_id in store.next_ids(2))
+    store.delete(2)
+    journal._sync()
+
+    restored = events.ColumnarEventStore()
+    storage.EventJournal(tmp_path).open(restored)
+
+    assert dump(restored) == dump(store)
+    assert restored.next_id() == store.next_id()